@@ -0,0 +1,139 @@
+##
+# @file   cache.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements a persistent cache of compiled programs. The entries
+#         are keyed by a hash of the source xml, so a program that has been run before
+#         does not have to be parsed and checked again. The optimised programs are
+#         cached separately for every combination of the optimisation options
+
+import hashlib
+import marshal
+import os
+import tempfile
+
+from program import OPCODES, FRAME_NAMES, Symbol, Variable, Label, Instruction
+from values import TYPE_NAMES
+
+FORMAT_VERSION = 3
+MAGIC = b'IPPC'
+
+# identifies the format of the entries, so that entries written by an interpreter with
+# different opcodes or a different python version are never used
+FORMAT_TAG = hashlib.sha256(repr((FORMAT_VERSION, OPCODES, marshal.version)).encode()).digest()[:8]
+
+# the types of the literals (type tags) and of the type arguments
+SYMBOL_TYPES = set(range(len(TYPE_NAMES))) | {'type'}
+
+
+# Returns the path of the cache entry of the given source. The variant names the
+# optimisations the program has gone through, the program as written has none
+def entry_path(cache_dir, source, variant):
+    suffix = '-' + variant if variant else ''
+    return os.path.join(cache_dir, hashlib.sha256(source).hexdigest() + suffix + '.ippc')
+
+
+# Converts a compiled program into a tuple of python builtins that can be marshalled.
+# Shared arguments are stored only once and the instructions refer to them by index
+def encode_program(program):
+    symbols = []
+    indexes = {}
+    instructions = []
+    for instr in program:
+        args = []
+        for arg in instr.args:
+            if id(arg) not in indexes:
+                indexes[id(arg)] = len(symbols)
+                if arg.type == 'var':
+                    symbols.append(('var', arg.frame, arg.name))
+                elif arg.type == 'label':
+                    symbols.append(('label', arg.name))
+                else:
+                    symbols.append((arg.type, arg.value))
+            args.append(indexes[id(arg)])
+        instructions.append((instr.op_id, tuple(args)))
+    return tuple(symbols), tuple(instructions)
+
+
+# The inverse of encode_program, raises an exception if the data are not a valid program
+def decode_program(data):
+    encoded_symbols, encoded_instructions = data
+
+    symbols = []
+    for encoded in encoded_symbols:
+        if encoded[0] == 'var':
+            __, frame, name = encoded
+            FRAME_NAMES[frame] # check the frame kind
+            symbols.append(Variable(frame, name))
+        elif encoded[0] == 'label':
+            symbols.append(Label(encoded[1]))
+        elif encoded[0] in SYMBOL_TYPES:
+            symbols.append(Symbol(*encoded))
+        else:
+            raise ValueError('Invalid symbol in the cache entry')
+
+    program = []
+    for op_id, args in encoded_instructions:
+        if not 0 <= op_id < len(OPCODES):
+            raise ValueError('Invalid opcode in the cache entry')
+        program.append(Instruction(op_id, tuple(symbols[i] for i in args)))
+    return program
+
+
+# Returns the cached compiled program for the given source (bytes), or None if there is
+# no usable entry. Entries that are stale or corrupted are removed. If a report dictionary
+# is given, the counts the optimiser has reported for the program are added to it
+def load_program(cache_dir, source, variant='', report=None):
+    path = entry_path(cache_dir, source, variant)
+    try:
+        with open(path, 'rb') as f:
+            entry = f.read()
+    except OSError:
+        return None
+
+    try:
+        # MAGIC, format tag, hash of the source, hash of the payload, payload
+        header_len = len(MAGIC) + len(FORMAT_TAG) + 64
+        if (entry[:len(MAGIC)] != MAGIC or
+                entry[len(MAGIC):len(MAGIC) + len(FORMAT_TAG)] != FORMAT_TAG):
+            raise ValueError('Stale cache entry')
+        source_hash = entry[header_len - 64:header_len - 32]
+        payload_hash = entry[header_len - 32:header_len]
+        payload = entry[header_len:]
+        if (source_hash != hashlib.sha256(source).digest() or
+                payload_hash != hashlib.sha256(payload).digest()):
+            raise ValueError('Corrupted cache entry')
+        encoded, counts = marshal.loads(payload)
+        program = decode_program(encoded)
+        if report is not None:
+            for name, count in counts:
+                report[name] = report.get(name, 0) + count
+        return program
+
+    except Exception:
+        try: os.remove(path)
+        except OSError: pass
+        return None
+
+
+# Stores a compiled program to the cache along with the report of the optimiser. The
+# cache is only an optimization, so any failures are ignored. The entry is written to
+# a temporary file first, so that a concurrently running interpreter never reads
+# a partially written entry
+def store_program(cache_dir, source, program, variant='', report=None):
+    try:
+        counts = tuple((report or {}).items())
+        payload = marshal.dumps((encode_program(program), counts))
+        entry = (MAGIC + FORMAT_TAG + hashlib.sha256(source).digest() +
+                 hashlib.sha256(payload).digest() + payload)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(entry)
+            os.replace(tmp_path, entry_path(cache_dir, source, variant))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    except Exception:
+        pass
@@ -3,163 +3,156 @@
 # @author Simon Sedlacek, xsedla1h
 # @brief  This module performs the execution of the input program
 
-from xml.etree import ElementTree as ET
-from operations import Operations as op
+from operations import Operations as op, proven_handler
+from program import OPCODES, link_program, split_blocks
+from frames import Frame
+from optimizer import infer_types
 import sys
 
+
+# EXIT is the only instruction that ends the program, so it gets a small wrapper
+def exit_program(data):
+    retcode = op.EXIT(data); sys.exit(retcode)
+
+
+# This table maps each opcode to the method implementing it. The handlers are looked up
+# once for every instruction when the program is loaded, so no opcode comparisons have
+# to be done during the execution itself
+dispatch_table = {
+    'CREATEFRAME': op.CREATEFRAME,
+    'PUSHFRAME': op.PUSHFRAME,
+    'POPFRAME': op.POPFRAME,
+    'DEFVAR': op.DEFVAR,
+    'MOVE': op.MOVE,
+    'CALL': op.CALL,
+    'RETURN': op.RETURN,
+    #####################
+    'PUSHS': op.PUSHS,
+    'POPS': op.POPS,
+    'CLEARS': op.CLEARS,
+    #####################
+    'ADD': op.ADD,
+    'ADDS': op.ADDS,
+    'SUB': op.SUB,
+    'SUBS': op.SUBS,
+    'MUL': op.MUL,
+    'MULS': op.MULS,
+    'IDIV': op.IDIV,
+    'IDIVS': op.IDIVS,
+    'DIV': op.DIV,
+    'DIVS': op.DIVS,
+    'LT': op.LT,
+    'LTS': op.LTS,
+    'GT': op.GT,
+    'GTS': op.GTS,
+    'EQ': op.EQ,
+    'EQS': op.EQS,
+    'AND': op.AND,
+    'ANDS': op.ANDS,
+    'OR': op.OR,
+    'ORS': op.ORS,
+    'NOT': op.NOT,
+    'NOTS': op.NOTS,
+    'INT2CHAR': op.INT2CHAR,
+    'INT2CHARS': op.INT2CHARS,
+    'STRI2INT': op.STRI2INT,
+    'STRI2INTS': op.STRI2INTS,
+    'INT2FLOAT': op.INT2FLOAT,
+    'FLOAT2INT': op.FLOAT2INT,
+    'INT2FLOATS': op.INT2FLOATS,
+    'FLOAT2INTS': op.FLOAT2INTS,
+    #####################
+    'READ': op.READ,
+    'WRITE': op.WRITE,
+    #####################
+    'CONCAT': op.CONCAT,
+    'STRLEN': op.STRLEN,
+    'GETCHAR': op.GETCHAR,
+    'SETCHAR': op.SETCHAR,
+    #####################
+    'TYPE': op.TYPE,
+    #####################
+    'LABEL': op.LABEL,
+    'JUMP': op.JUMP,
+    'JUMPIFEQ': op.JUMPIFEQ,
+    'JUMPIFEQS': op.JUMPIFEQS,
+    'JUMPIFNEQ': op.JUMPIFNEQ,
+    'JUMPIFNEQS': op.JUMPIFNEQS,
+    'EXIT': exit_program,
+    #####################
+    'DPRINT': op.DPRINT,
+    'BREAK': op.BREAK,
+    #####################
+    'LT_JUMPIF': op.LT_JUMPIF,
+    'LT_JUMPIFNOT': op.LT_JUMPIFNOT,
+    'GT_JUMPIF': op.GT_JUMPIF,
+    'GT_JUMPIFNOT': op.GT_JUMPIFNOT,
+    'EQ_JUMPIF': op.EQ_JUMPIF,
+    'EQ_JUMPIFNOT': op.EQ_JUMPIFNOT,
+    'DEFVAR_MOVE': op.DEFVAR_MOVE,
+    'CREATEFRAME_PUSHFRAME': op.CREATEFRAME_PUSHFRAME,
+    'TAILCALL': op.TAILCALL,
+    'TAILCALL_POPFRAME': op.TAILCALL_POPFRAME,
+}
+
+# the same table indexed by the numeric opcode ids of the compiled instructions
+handler_table = [dispatch_table[opcode] for opcode in OPCODES]
+
+
 # This class as an instruction processor and is responsible for the program execution
 class Processor:
-    def __init__(self, program, labels, input_file):
-        self.input_file = input_file # user input file
-        self.program = program
-        self.labels = labels
+    def __init__(self, program, input_file, output):
+        self.input_file = input_file # user input (see streams.py)
+        self.output = output # the sink of the program output (see streams.py)
+        self.program = program # a list of compiled instructions (see program.py)
+
+        # resolve the labels and frame layouts, decode the handlers and split the
+        # program into basic blocks
+        global_layout = link_program(program)
+        for instr in program:
+            instr.handler = handler_table[instr.op_id]
+        self.blocks = split_blocks(program)
 
-        self.data_stack = []
+        # the data stack is kept as two parallel lists of the types and values of the
+        # symbols, so that pushing and popping a symbol does not allocate a tuple
+        self.stack_types = []
+        self.stack_values = []
         self.ip_stack = [] # this list manages the return addresses for function calls
-        self.global_frame = {} # a dictionary of variables in the GF
-        self.local_frame = [] # a list of dictionaries of variables for each LF
+        self.global_frame = Frame(global_layout)
+        self.frame_stack = [] # the stack of local frames
+        self.lf = None # the current LF (the top of the frame stack)
+        self.tf = None # the temporary frame, None if it does not exist
         self.ip = 0
-        self.gf_index = 0
-        self.lf_index = -1
-        self.tf_defined = False # indicates the existence of a temporary frame
+        self.report = {} # what the engine has done to the program, see --optimizer-report
+
 
+    # Replaces the handlers of the instructions whose operand types are proven by the
+    # type inference (see optimizer.py) by check-free ones. The reference engine runs
+    # the program as written, so only the engines executing the optimised program use
+    # them. Returns the proven types
+    def select_proven_handlers(self):
+        proven = infer_types(self.program)
+        selected = 0
+        for instr in self.program:
+            handler = proven_handler(instr, proven[instr.order])
+            if handler is not None:
+                instr.handler = handler
+                selected += 1
+        self.report['check-free handlers'] = selected
+        return proven
 
     def execute_program(self):
-        # main processing loop
+        # main processing loop, the instructions are executed block by block and the IP
+        # always holds the index of the first instruction of the current block
+        blocks = self.blocks
         program_len = len(self.program)
         while self.ip < program_len:
-            self.instr = self.program[self.ip] # load the next instruction
-            try:
-                self.process_instruction()
-            except Exception as e:
-                raise e
-
-    def process_instruction(self):
-        opcode = self.instr.attrib['opcode']
-        try:
-            if opcode == 'CREATEFRAME':
-                op.CREATEFRAME(self)
-            elif opcode == 'PUSHFRAME':
-                op.PUSHFRAME(self)
-            elif opcode == 'POPFRAME':
-                op.POPFRAME(self)
-            elif opcode == 'DEFVAR':
-                op.DEFVAR(self)
-            elif opcode == 'MOVE':
-                op.MOVE(self)
-            elif opcode == 'CALL':
-                op.CALL(self); return
-            elif opcode == 'RETURN':
-                op.RETURN(self); return
-            #####################
-            elif opcode == 'PUSHS':
-                op.PUSHS(self)
-            elif opcode == 'POPS':
-                op.POPS(self)
-            elif opcode == 'CLEARS':
-                op.CLEARS(self)
-            #####################
-            elif opcode == 'ADD':
-                op.ADD(self)
-            elif opcode == 'ADDS':
-                op.ADDS(self)
-            elif opcode == 'SUB':
-                op.SUB(self)
-            elif opcode == 'SUBS':
-                op.SUBS(self)
-            elif opcode == 'MUL':
-                op.MUL(self)
-            elif opcode == 'MULS':
-                op.MULS(self)
-            elif opcode == 'IDIV':
-                op.IDIV(self)
-            elif opcode == 'IDIVS':
-                op.IDIVS(self)
-            elif opcode == 'DIV':
-                op.DIV(self)
-            elif opcode == 'DIVS':
-                op.DIV(self)
-            elif opcode == 'LT':
-                op.LT(self)
-            elif opcode == 'LTS':
-                op.LTS(self)
-            elif opcode == 'GT':
-                op.GT(self)
-            elif opcode == 'GTS':
-                op.GTS(self)
-            elif opcode == 'EQ':
-                op.EQ(self)
-            elif opcode == 'EQS':
-                op.EQS(self)
-            elif opcode == 'AND':
-                op.AND(self)
-            elif opcode == 'ANDS':
-                op.ANDS(self)
-            elif opcode == 'OR':
-                op.OR(self)
-            elif opcode == 'ORS':
-                op.ORS(self)
-            elif opcode == 'NOT':
-                op.NOT(self)
-            elif opcode == 'NOTS':
-                op.NOTS(self)
-            elif opcode == 'INT2CHAR':
-                op.INT2CHAR(self)
-            elif opcode == 'INT2CHARS':
-                op.INT2CHARS(self)
-            elif opcode == 'STRI2INT':
-                op.STRI2INT(self)
-            elif opcode == 'STRI2INTS':
-                op.STRI2INTS(self)
-            elif opcode == 'INT2FLOAT':
-                op.INT2FLOAT(self)
-            elif opcode == 'FLOAT2INT':
-                op.FLOAT2INT(self)
-            elif opcode == 'INT2FLOATS':
-                op.INT2FLOAT(self)
-            elif opcode == 'FLOAT2INTS':
-                op.FLOAT2INT(self)
-            #####################
-            elif opcode == 'READ':
-                op.READ(self)
-            elif opcode == 'WRITE':
-                op.WRITE(self)
-            #####################
-            elif opcode == 'CONCAT':
-                op.CONCAT(self)
-            elif opcode == 'STRLEN':
-                op.STRLEN(self)
-            elif opcode == 'GETCHAR':
-                op.GETCHAR(self)
-            elif opcode == 'SETCHAR':
-                op.SETCHAR(self)
-            #####################
-            elif opcode == 'TYPE':
-                op.TYPE(self)
-            #####################
-            elif opcode == 'LABEL':
-                op.LABEL()
-            elif opcode == 'JUMP':
-                op.JUMP(self); return
-            elif opcode == 'JUMPIFEQ':
-                if op.JUMPIFEQ(self): return
-            elif opcode == 'JUMPIFEQS':
-                if op.JUMPIFEQS(self): return
-            elif opcode == 'JUMPIFNEQ':
-                if op.JUMPIFNEQ(self): return
-            elif opcode == 'JUMPIFNEQS':
-                if op.JUMPIFNEQS(self): return
-            elif opcode == 'EXIT':
-                retcode = op.EXIT(self); sys.exit(retcode)
-            #####################
-            elif opcode == 'DPRINT':
-                op.DPRINT(self)
-            elif opcode == 'BREAK':
-                op.BREAK(self)
-
-            else:
-                raise Exception(32, 'Unknown opcode') # this should not happen...
+            block = blocks[self.ip]
+            jumped = False
+            for instr in block.instructions:
+                self.instr = instr
+                jumped = instr.handler(self)
 
-        except Exception as e:
-            raise e
-        self.ip += 1 # increment the instruction pointer
+            # only the last instruction of a block can jump, it sets the IP itself
+            if not jumped:
+                self.ip = block.end
@@ -0,0 +1,56 @@
+##
+# @file   frames.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements the memory frames (GF, LF, TF) of the interpreter
+
+from values import STRING
+
+
+# marks a slot of a frame whose variable has not been defined (DEFVAR) yet. A defined
+# but uninitialized variable has the type None
+UNDEFINED = 'undefined'
+
+# marks a slot holding a string that is being edited in place by SETCHAR or CONCAT. The
+# value of such a slot is a list of the characters of the string, which is converted
+# back to a python string (flattened) as soon as the string is read by anything else
+STRING_BUFFER = 'string buffer'
+
+
+# A frame stores its variables in two parallel arrays of types and values. The layout
+# maps the variable names to the indexes (slots) in these arrays and is shared among
+# all the frames created by the same CREATEFRAME instruction
+class Frame:
+    __slots__ = ('layout', 'types', 'values')
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.types = [UNDEFINED] * len(layout)
+        self.values = [None] * len(layout)
+
+    # Returns the slot of a variable or None if there is no slot for it. Each variable
+    # remembers the layout it was last looked up in, so the lookup is only done again
+    # if the variable is accessed in a frame with a different layout
+    def lookup(self, var):
+        if var.layout is self.layout:
+            return var.slot
+
+        slot = self.layout.get(var.name)
+        if slot is not None:
+            var.layout = self.layout
+            var.slot = slot
+        return slot
+
+    # Converts the string buffer in a slot back to a python string and returns it
+    def flatten(self, slot):
+        value = self.values[slot] = ''.join(self.values[slot])
+        self.types[slot] = STRING
+        return value
+
+    # Adds a slot for a variable missing in the layout. The layout is shared, so it is
+    # copied before it is extended
+    def add_slot(self, name):
+        self.layout = dict(self.layout)
+        slot = self.layout[name] = len(self.types)
+        self.types.append(UNDEFINED)
+        self.values.append(None)
+        return slot
@@ -4,32 +4,72 @@
 # @author Simon Sedlacek, xsedla1h
 # @brief  This is the main module of the IPPcode20 interpreter
 
-from xml.etree import ElementTree as ET
 import sys
 import os
+import io
 import getopt
 
-from xml_checker import *
+from loader import parse_program
 from execute import Processor
+from threaded import ThreadedProcessor
+from transpiler import CompiledProcessor
+from tracing import TracingProcessor
+from quickening import AdaptiveProcessor
+from cache import load_program, store_program
+from optimizer import optimize_program
+from streams import stdout_sink, open_input, TextInput, ReadAheadInput
 
-NOT_WELL_FORMED = 31
-XML_ERROR = 32 # pretty much all syntax, lexical and other input xml-fomat related errors
+# the available execution engines, selected by the --engine option
+ENGINES = {
+    'reference': Processor,
+    'adaptive': AdaptiveProcessor,
+    'threaded': ThreadedProcessor,
+    'compiled': CompiledProcessor,
+    'tracing': TracingProcessor,
+}
+
+# the description of the options printed by --help
+OPTIONS_HELP = '''
+  --source=file        the xml source of the program (the standard input by default)
+  --input=file         the input of the program (the standard input by default)
+  --engine=name        the execution engine, reference by default:
+                       ''' + ', '.join(ENGINES) + '''
+  --no-optimize        run the program as written, by default every engine runs it
+                       after the optimisation passes
+  --no-superinstructions
+                       do not fuse the common pairs of instructions when optimising
+  --optimizer-report   print what the optimiser has done to the standard error
+  --cache=dir          cache the compiled programs in the given directory
+  --flush=bytes        the number of buffered output bytes that makes the output flush
+  --read-ahead         read the standard input in a background thread'''
 
 # parse the interpret arguments
 argv = sys.argv[1:]
 try:
-    args, __ = getopt.getopt(argv, '', longopts=['help', 'source=', 'input='])
+    args, __ = getopt.getopt(argv, '', longopts=['help', 'source=', 'input=',
+                                             'engine=', 'cache=', 'flush=',
+                                             'read-ahead', 'no-optimize',
+                                             'no-superinstructions',
+                                             'optimizer-report'])
 except:
     sys.stderr.write('Unknown argument passed to the script\n')
     sys.exit(10)
 
 source_file = None # variables holding our input and source filenames
 input_file = None
+engine = 'reference'
+cache_dir = None # the directory with the cached compiled programs
+flush_limit = None # the number of buffered output bytes that makes the output flush
+read_ahead = False # read the standard input in a background thread
+optimize = True # run the optimisation passes (see optimizer.py)
+superinstructions = True # fuse the common pairs of instructions (see optimizer.py)
+optimizer_report = False # print what the optimiser has done to the standard error
 for opt, val in args:
     if opt == '--help':
         if len(args) == 1: # print help
             print('Program načte XML reprezentaci programu a tento program s využitím '
                   'vstupu dle parametrů příkazové řádky interpretuje a generuje výstup.')
+            print(OPTIONS_HELP)
             sys.exit(0)
         else:
             sys.stderr.write('Invalid argument combination passed to the script\n')
@@ -38,6 +78,29 @@ for opt, val in args:
         source_file = val
     elif opt == '--input':
         input_file = val
+    elif opt == '--engine':
+        if val not in ENGINES:
+            sys.stderr.write(f'Unknown engine "{val}"\n')
+            sys.exit(10)
+        engine = val
+    elif opt == '--cache':
+        cache_dir = val
+    elif opt == '--flush':
+        try:
+            flush_limit = int(val)
+            if flush_limit < 0:
+                raise ValueError
+        except ValueError:
+            sys.stderr.write(f'Invalid output flush limit "{val}"\n')
+            sys.exit(10)
+    elif opt == '--read-ahead':
+        read_ahead = True
+    elif opt == '--no-optimize':
+        optimize = False
+    elif opt == '--no-superinstructions':
+        superinstructions = False
+    elif opt == '--optimizer-report':
+        optimizer_report = True
 
 try:
     if source_file == None and input_file == None:
@@ -46,36 +109,59 @@ try:
         sys.exit(10)
     elif source_file == None:
         source_file = sys.stdin
-        input_file = open(input_file)
+        input_file = open_input(input_file)
     elif input_file == None:
-        input_file = sys.stdin
+        input_file = ReadAheadInput(sys.stdin) if read_ahead else TextInput(sys.stdin)
         source_file = open(source_file)
     else:
-        input_file = open(input_file)
+        input_file = open_input(input_file)
         source_file = open(source_file)
 except:
         sys.stderr.write('Could not open input or source file\n')
         sys.exit(11)
 
-# parse the xml and perform basic analysis (well-formed)
-try:
-    program = ET.parse(source_file).getroot()
-except:
-    sys.stderr.write(f'Source file {source_file.name} is not a well-formed XML\n')
-    sys.exit(NOT_WELL_FORMED)
+# every engine runs the optimised program unless --no-optimize is given, the program as
+# written run by the reference engine is what the other engines are checked against
+if not optimize:
+    variant = ''
+else:
+    variant = 'optimized' if superinstructions else 'optimized-nosuper'
 
-# perform the syntax and lexical analysis (plus some semantic checks) of the program
-try:
-    program, labels = check_syntax(program)
-except Exception as e:
-    sys.stderr.write(str(e.args) + '\n')
-    sys.exit(XML_ERROR)
+# the source has to be hashed to look it up in the cache, so read it all at once
+report = {}
+program = None
+xml_source = source_file
+if cache_dir != None:
+    source = source_file.buffer.read()
+    program = load_program(cache_dir, source, variant, report)
+    xml_source = io.BytesIO(source)
+
+if program == None:
+    # parse, check, compile and optimise the xml program
+    try:
+        program = parse_program(xml_source)
+    except Exception as e:
+        retcode, message = e.args
+        sys.stderr.write(f'{source_file.name}: {message}\n')
+        sys.exit(retcode)
+    if optimize:
+        program = optimize_program(program, superinstructions, report)
+
+    if cache_dir != None:
+        store_program(cache_dir, source, program, variant, report)
 
 # now execute the program
-processor = Processor(program, labels, input_file)
+processor = ENGINES[engine](program, input_file, stdout_sink(flush_limit))
+if optimizer_report:
+    report.update(processor.report)
+    for name, count in report.items():
+        sys.stderr.write(f'optimizer: {count} {name}\n')
 try:
     processor.execute_program()
 except Exception as e:
     retcode, message = e.args
     sys.stderr.write(message + '\n')
     sys.exit(retcode)
+finally:
+    # the program may also end by EXIT, which raises SystemExit
+    processor.output.flush()
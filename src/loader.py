@@ -0,0 +1,78 @@
+##
+# @file   loader.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements the loader of the input xml. The source is parsed
+#         incrementally and every instruction is checked and compiled as soon as it has
+#         been read, so the whole xml tree is never held in the memory
+
+from xml.etree import ElementTree as ET
+from operator import itemgetter
+
+from xml_checker import check_root, check_instruction
+from program import compile_instruction
+
+NOT_WELL_FORMED = 31
+XML_ERROR = 32 # pretty much all syntax, lexical and other input xml-fomat related errors
+SEMANTIC_ERROR = 52
+
+
+# Loads, checks and compiles the program from the given xml source (a file name or a
+# file object) and returns the list of its instructions sorted by their order numbers.
+# Raises Exception(retcode, message) if the source is not a valid program
+def parse_program(source):
+    symbols = {}
+    entries = [] # (order, instruction) pairs
+    orders = set()
+    labels = set()
+    error = None # the first error found in the program
+    label_redefined = False
+
+    root = None
+    depth = 0
+    try:
+        for event, element in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                    try: check_root(root)
+                    except Exception as e: error = e
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth != 1:
+                continue # only the instructions (children of the root) are processed
+
+            # the rest of an invalid program is just parsed to check it is well-formed
+            if error is None:
+                try:
+                    order, opcode, operands = check_instruction(element)
+                    if order in orders:
+                        raise Exception('Duplicit or invalid order attribute', order)
+                    orders.add(order)
+
+                    instr = compile_instruction(opcode, operands, symbols)
+                    entries.append((order, instr))
+                    if opcode == 'LABEL':
+                        if instr.args[0].name in labels:
+                            label_redefined = True
+                        labels.add(instr.args[0].name)
+                except Exception as e:
+                    error = e
+                    # the compiled instructions are not needed anymore
+                    entries.clear(); symbols.clear(); orders.clear()
+
+            # the instruction is compiled or skipped, release its element
+            root.remove(element)
+
+    except Exception as e:
+        raise Exception(NOT_WELL_FORMED, f'The source is not a well-formed XML: {e}')
+
+    # the format errors take precedence over the label redefinitions
+    if error is not None:
+        raise Exception(XML_ERROR, str(error.args))
+    if label_redefined:
+        raise Exception(SEMANTIC_ERROR, 'Label redefinition')
+
+    entries.sort(key=itemgetter(0))
+    return [instr for __, instr in entries]
@@ -3,158 +3,206 @@
 # @author Simon Sedlacek, xsedla1h
 # @brief  This module implements some of the instructions of IPPcode20
 
-
-# This function returns the value and type of a variable
-def get_var_type_value(data, identifier):
-    tmp = identifier.split('@'); frame = tmp[0]; name = tmp[1]
-
-    if frame == 'GF':
-        if name in data.global_frame:
-            var = data.global_frame[name]
-        else:
-            raise Exception(54, f'Nonexistent variable "{name}" in GF')
-
-    elif frame == 'LF':
-        if data.lf_index == -1: # cannot access a non-existent LF
+import operator
+
+from program import GF, LF, TF, FRAME_NAMES, OPCODES, OPCODE_IDS
+from frames import Frame, UNDEFINED, STRING_BUFFER
+from values import INT, FLOAT, STRING, BOOL, NIL, TYPE_NAMES, to_text
+
+# This function returns the local or temporary frame in which a variable is stored along
+# with the slot of the variable in that frame. The variable is a pre-resolved Variable
+def get_var_frame_slot(data, var):
+    if var.frame == LF:
+        frame = data.lf
+        if frame is None: # cannot access a non-existent LF
             raise Exception(55, 'Nonexistent LF')
-
-        if name in data.local_frame[data.lf_index]:
-            var = data.local_frame[data.lf_index][name]
-        else:
-            raise Exception(54, f'Nonexistent variable "{name}" in LF')
-
-    elif frame == 'TF':
-        if not data.tf_defined: # cannot access a non-existent TF
+    else:
+        frame = data.tf
+        if frame is None: # cannot access a non-existent TF
             raise Exception(55, 'Nonexistent TF')
 
-        if name in data.local_frame[data.lf_index + 1]:
-            var = data.local_frame[data.lf_index + 1][name]
-        else:
-            raise Exception(54, f'Nonexistent variable "{name}" in TF')
+    slot = frame.lookup(var)
+    if slot is None:
+        raise Exception(54, f'Nonexistent variable "{var.name}" in {FRAME_NAMES[var.frame]}')
+    return frame, slot
 
-    else: raise Exception(32, 'XML: Invalid frame') # this should not happen...
 
-    var_type = var[0]; value = var[1]
-    return var_type, value
+# This function returns the frame and slot of a defined variable of any frame
+def get_defined_var_slot(data, var):
+    if var.frame == GF: # the slots of the GF variables are fixed
+        frame = data.global_frame; slot = var.slot
+    else:
+        frame, slot = get_var_frame_slot(data, var)
 
+    if frame.types[slot] is UNDEFINED:
+        raise Exception(54, f'Nonexistent variable "{var.name}" in {FRAME_NAMES[var.frame]}')
+    return frame, slot
 
-# This function sets the value and type of a variable
-def set_var_type_value(data, destination, var_type, value):
-    tmp = destination.split('@'); frame = tmp[0]; name = tmp[1]
 
-    if frame == 'GF':
-        if name in data.global_frame:
-            data.global_frame[name] = [var_type, value]
-        else:
-            raise Exception(54, f'Nonexistent variable "{name}" in GF')
+# This function returns the value and type of a variable
+def get_var_type_value(data, var):
+    if var.frame == GF: # the slots of the GF variables are fixed
+        frame = data.global_frame; slot = var.slot
+    else:
+        frame, slot = get_var_frame_slot(data, var)
 
-    elif frame == 'LF':
-        if data.lf_index == -1: # cannot access a non-existent LF
-            raise Exception(55, 'Nonexistent LF')
+    var_type = frame.types[slot]
+    if var_type is UNDEFINED:
+        raise Exception(54, f'Nonexistent variable "{var.name}" in {FRAME_NAMES[var.frame]}')
+    elif var_type is STRING_BUFFER:
+        return STRING, frame.flatten(slot)
+    return var_type, frame.values[slot]
 
-        if name in data.local_frame[data.lf_index]:
-            data.local_frame[data.lf_index][name] = [var_type, value]
-        else:
-            raise Exception(54, f'Nonexistent variable "{name}" in LF')
 
-    elif frame == 'TF':
-        if not data.tf_defined: # cannot access a non-existent TF
-            raise Exception(55, 'Nonexistent TF')
-
-        if name in data.local_frame[data.lf_index + 1]:
-            data.local_frame[data.lf_index + 1][name] = [var_type, value]
-        else:
-            raise Exception(54, f'Nonexistent variable "{name}" in TF')
+# This function sets the value and type of a variable
+def set_var_type_value(data, var, var_type, value):
+    if var.frame == GF:
+        frame = data.global_frame; slot = var.slot
+    else:
+        frame, slot = get_var_frame_slot(data, var)
 
-    else: raise Exception(32, 'XML: Invalid frame') # this should not happen...
+    types = frame.types
+    if types[slot] is UNDEFINED:
+        raise Exception(54, f'Nonexistent variable "{var.name}" in {FRAME_NAMES[var.frame]}')
+    types[slot] = var_type
+    frame.values[slot] = value
 
 
 # This function returns the type and value of a symbol
 def get_symbol_type_value(data, symbol):
-    symbol_type = symbol.attrib['type']
-    symbol_value = symbol.text
-
     # if the symbol is a variable, get its type and value
-    if symbol_type == 'var':
-        try: 
-            symbol_type, symbol_value = get_var_type_value(data, symbol_value)
-        except Exception as e:
-            raise e
-
-    return symbol_type, symbol_value
+    if symbol.type == 'var':
+        return get_var_type_value(data, symbol)
+
+    return symbol.type, symbol.value
+
+
+# This function returns the type and value of a symbol just like get_symbol_type_value,
+# but a string buffer is not flattened. The list of its characters is returned instead,
+# which can be indexed and measured just like the string itself
+def get_string_type_value(data, symbol):
+    if symbol.type != 'var':
+        return symbol.type, symbol.value
+
+    frame, slot = get_defined_var_slot(data, symbol)
+    var_type = frame.types[slot]
+    if var_type is STRING_BUFFER:
+        var_type = STRING
+    return var_type, frame.values[slot]
+
+
+# This function makes the string in a slot a string buffer, so that it can be edited in
+# place, and returns the buffer
+def make_string_buffer(frame, slot):
+    if frame.types[slot] is not STRING_BUFFER:
+        frame.types[slot] = STRING_BUFFER
+        frame.values[slot] = list(frame.values[slot])
+    return frame.values[slot]
+
+
+# This function evaluates a relation (LT, GT or EQ) of the last two operands of the
+# current instruction and returns the result as a python bool
+def evaluate_relation(data, relation):
+    op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+    op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
+
+    if op1_type == None or op2_type == None:
+        raise Exception(56, 'Uninitialized symbol')
+    elif relation == 'EQ':
+        if op1_type == op2_type:
+            return op1_value == op2_value
+        elif op1_type == NIL or op2_type == NIL:
+            return False
+    elif op1_type == op2_type and op1_type != NIL:
+        return op1_value < op2_value if relation == 'LT' else op1_value > op2_value
+    raise Exception(53, 'Operands incompatible for comparison')
+
+
+# This function executes a superinstruction of a relation fused with a conditional jump
+# (see optimizer.py). The result of the relation is written to the destination just like
+# by the relation itself and the jump is taken if the result equals jump_if
+def relation_jump(data, relation, jump_if):
+    try:
+        result = evaluate_relation(data, relation)
+        set_var_type_value(data, data.instr.args[0], BOOL, result)
+    except Exception as e:
+        retcode, msg = e.args
+        raise Exception(retcode, f'{relation}: ' + msg)
+
+    label = data.instr.args[3]
+    if label.target is None:
+        raise Exception(52, f'{OPCODES[data.instr.op_id]}: Label "{label.name}" is undefined')
+    if result == jump_if:
+        data.ip = label.target
+        return True
+    return False
+
+
+# the tail call leaving the frame of the caller to the called function (see optimizer.py)
+TAILCALL_POPFRAME = OPCODE_IDS['TAILCALL_POPFRAME']
 
 
 # This class implements some  of the actual instructions of IPPcode20 as static methods.
 # All the operations take an instance of the Processor class as an attribute (data) so that
 # they can perform the desired operation all by themselves and all the the Processor has
-# to do is to call one of these methods
+# to do is to call one of these methods. Operations that transfer the control elsewhere
+# return True, so that the Processor knows not to increment the instruction pointer
 class Operations:
 
     # Frames, variable declaration and initialization, function calls/returns
     @staticmethod
     def CREATEFRAME(data):
-        if data.tf_defined:
-            data.local_frame[data.lf_index + 1] = {} # overwrite the current TF
-        else:
-            data.local_frame.append({}) # create a new empty TF
-            data.tf_defined = True
+        data.tf = Frame(data.instr.layout) # create a new TF, overwriting the current one
 
     @staticmethod
     def PUSHFRAME(data):
-        if data.tf_defined:
-            data.lf_index += 1
-            data.tf_defined = False
+        if data.tf is not None:
+            data.frame_stack.append(data.tf)
+            data.lf = data.tf
+            data.tf = None
         else:
             raise Exception(55, 'PUSHFRAME: TF is not defined')
 
     @staticmethod
     def POPFRAME(data):
-        if data.tf_defined:
-            data.local_frame.pop() # delete the redundant temporary frame
-        if data.lf_index == -1:
+        if data.lf is None:
             raise Exception(55, 'POPFRAME: No available LF')
-        data.lf_index -= 1
-        data.tf_defined = True
+        data.tf = data.frame_stack.pop()
+        data.lf = data.frame_stack[-1] if data.frame_stack else None
 
     @staticmethod
     def DEFVAR(data):
-        var = data.instr[0].text.split('@'); frame = var[0]; name = var[1]
-
-        if frame == 'GF':
-            if name in data.global_frame:
-                raise Exception(52, 'DEFVAR: Variable already defined in GF')
-            else:
-                data.global_frame[name] = [None, None] # [type=None, value=None]
+        var = data.instr.args[0]
 
-        elif frame == 'LF':
-            if data.lf_index == -1:
+        if var.frame == GF:
+            frame = data.global_frame
+        elif var.frame == LF:
+            frame = data.lf
+            if frame is None:
                 raise Exception(55, 'DEFVAR: LF does not exist')
-            if name in data.local_frame[data.lf_index]:
-                raise Exception(52, 'DEFVAR: Variable already defined in LF')
-            else:
-                data.local_frame[data.lf_index][name] = [None, None]
-
-        elif frame == 'TF':
-            if not data.tf_defined:
+        else:
+            frame = data.tf
+            if frame is None:
                 raise Exception(55, 'DEFVAR: TF is undefined')
-            if name in data.local_frame[data.lf_index + 1]:
-                raise Exception(52, 'DEFVAR: Variable already defined in TF')
-            else:
-                data.local_frame[data.lf_index + 1][name] = [None, None]
 
-        else: raise Exception(32, 'XML: Invalid frame') # this should not happen...
+        slot = frame.lookup(var)
+        if slot is None:
+            slot = frame.add_slot(var.name) # not known in advance, extend the frame
+        elif frame.types[slot] is not UNDEFINED:
+            raise Exception(52, f'DEFVAR: Variable already defined in {FRAME_NAMES[var.frame]}')
+        frame.types[slot] = None # type=None, value=None
 
     @staticmethod
     def MOVE(data):
         try:
             # just check if the destination exists
-            get_var_type_value(data, data.instr[0].text)
+            get_var_type_value(data, data.instr.args[0])
 
             # get the source symbol type and value and write them to the destination
-            src_type, src_value = get_symbol_type_value(data, data.instr[1])
+            src_type, src_value = get_symbol_type_value(data, data.instr.args[1])
             if src_type == None:
                 raise Exception(56, 'Uninitialized symbol')
-            set_var_type_value(data, data.instr[0].text, src_type, src_value)
+            set_var_type_value(data, data.instr.args[0], src_type, src_value)
 
         except Exception as e:
             retcode, msg = e.args
@@ -162,14 +210,13 @@ class Operations:
 
     @staticmethod
     def CALL(data):
-        data.ip_stack.append(data.ip + 1) # store the IP value
-
-        label = data.instr[0].text
-        if label in data.labels:
-            data.ip = data.labels[label] # get the label position
+        label = data.instr.args[0]
+        if label.target is None:
+            raise Exception(52, f'CALL: Label "{label.name}" is undefined')
 
-        else:
-            raise Exception(52, f'CALL: Label "{label}" is undefined')
+        data.ip_stack.append(data.instr.order + 1) # store the return address
+        data.ip = label.target # jump to the label position
+        return True
 
     @staticmethod
     def RETURN(data):
@@ -177,13 +224,14 @@ class Operations:
             data.ip = data.ip_stack.pop()
         except:
             raise Exception(56, 'RETURN: Return address stack was empty')
+        return True
 
     # Stack
     @staticmethod
     def PUSHS(data):
         try:
             # get the symbol type and value
-            src_type, src_value = get_symbol_type_value(data, data.instr[0])
+            src_type, src_value = get_symbol_type_value(data, data.instr.args[0])
             if src_type == None:
                 raise Exception(56, 'Uninitialized symbol')
         except Exception as e:
@@ -191,17 +239,18 @@ class Operations:
             raise Exception(retcode, 'PUSHS: ' + msg)
 
         # ... and push them onto the data stack
-        data.data_stack.append((src_type, src_value))
+        data.stack_types.append(src_type)
+        data.stack_values.append(src_value)
 
     @staticmethod
     def POPS(data):
-        try:
-            src_type, src_value = data.data_stack.pop()
-        except:
+        if not data.stack_types:
             raise Exception(56, 'POPS: Data stack was empty')
+        src_type = data.stack_types.pop()
+        src_value = data.stack_values.pop()
 
         try:
-            set_var_type_value(data, data.instr[0].text, src_type, src_value)
+            set_var_type_value(data, data.instr.args[0], src_type, src_value)
         except Exception as e:
             retcode, msg = e.args
             raise Exception(retcode, 'POPS: ' + msg)
@@ -209,21 +258,22 @@ class Operations:
     @staticmethod
     def CLEARS(data):
         # clear the data stack
-        data.data_stack.clear()
+        data.stack_types.clear()
+        data.stack_values.clear()
 
     # Arithmethic, relation, boolean and conversion operations
     @staticmethod
     def ADD(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types
-            if ((op1_type == 'int' and op2_type == 'int') or
-                    (op1_type == 'float' and op2_type == 'float')):
+            if ((op1_type == INT and op2_type == INT) or
+                    (op1_type == FLOAT and op2_type == FLOAT)):
                 # write the result of the operation
-                set_var_type_value(data, data.instr[0].text, op1_type,
+                set_var_type_value(data, data.instr.args[0], op1_type,
                         op1_value + op2_value) 
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
@@ -237,18 +287,19 @@ class Operations:
     @staticmethod
     def ADDS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types
-            if ((op1_type == 'int' and op2_type == 'int') or
-                    (op1_type == 'float' and op2_type == 'float')):
-                # ... and push the result of the operation onto the data stack
-                data.data_stack.append((op1_type, op1_value + op2_value))
+            if ((op1_type == INT and op2_type == INT) or
+                    (op1_type == FLOAT and op2_type == FLOAT)):
+                # ... and store the result of the operation on the top of the stack
+                values[-1] = op1_value + op2_value
             elif op1_type == None or op2_type == None: # this should probably not happen..
                 raise Exception(56, 'Uninitialized symbol')
             else:
@@ -262,14 +313,14 @@ class Operations:
     def SUB(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types
-            if ((op1_type == 'int' and op2_type == 'int') or
-                    (op1_type == 'float' and op2_type == 'float')):
+            if ((op1_type == INT and op2_type == INT) or
+                    (op1_type == FLOAT and op2_type == FLOAT)):
                 # write the result of the operation
-                set_var_type_value(data, data.instr[0].text, op1_type,
+                set_var_type_value(data, data.instr.args[0], op1_type,
                         op1_value - op2_value) 
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
@@ -283,18 +334,19 @@ class Operations:
     @staticmethod
     def SUBS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types
-            if ((op1_type == 'int' and op2_type == 'int') or
-                    (op1_type == 'float' and op2_type == 'float')):
-                # ... and push the result of the operation onto the data stack
-                data.data_stack.append((op1_type, op1_value - op2_value))
+            if ((op1_type == INT and op2_type == INT) or
+                    (op1_type == FLOAT and op2_type == FLOAT)):
+                # ... and store the result of the operation on the top of the stack
+                values[-1] = op1_value - op2_value
             elif op1_type == None or op2_type == None: # this should probably not happen..
                 raise Exception(56, 'Uninitialized symbol')
             else:
@@ -308,14 +360,14 @@ class Operations:
     def MUL(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types
-            if ((op1_type == 'int' and op2_type == 'int') or
-                    (op1_type == 'float' and op2_type == 'float')):
+            if ((op1_type == INT and op2_type == INT) or
+                    (op1_type == FLOAT and op2_type == FLOAT)):
                 # write the result of the operation
-                set_var_type_value(data, data.instr[0].text, op1_type,
+                set_var_type_value(data, data.instr.args[0], op1_type,
                         op1_value * op2_value) 
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
@@ -329,18 +381,19 @@ class Operations:
     @staticmethod
     def MULS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types
-            if ((op1_type == 'int' and op2_type == 'int') or
-                    (op1_type == 'float' and op2_type == 'float')):
-                # ... and push the result of the operation onto the data stack
-                data.data_stack.append((op1_type, op1_value * op2_value))
+            if ((op1_type == INT and op2_type == INT) or
+                    (op1_type == FLOAT and op2_type == FLOAT)):
+                # ... and store the result of the operation on the top of the stack
+                values[-1] = op1_value * op2_value
             elif op1_type == None or op2_type == None: # this should probably not happen..
                 raise Exception(56, 'Uninitialized symbol')
             else:
@@ -354,15 +407,15 @@ class Operations:
     def IDIV(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
-            if op1_type == 'int' and op2_type == 'int':
+            if op1_type == INT and op2_type == INT:
                 if op2_value == 0:
                     raise Exception(57, 'Division by zero')
                 # write the result of the operation
-                set_var_type_value(data, data.instr[0].text, 'int',
+                set_var_type_value(data, data.instr.args[0], INT,
                         op1_value // op2_value) 
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
@@ -376,17 +429,20 @@ class Operations:
     @staticmethod
     def IDIVS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types
-            if op1_type == 'int' and op2_type == 'int':
-                # ... and push the result of the operation onto the data stack
-                data.data_stack.append((op1_type, op1_value // op2_value))
+            if op1_type == INT and op2_type == INT:
+                if op2_value == 0:
+                    raise Exception(57, 'Division by zero')
+                # ... and store the result of the operation on the top of the stack
+                values[-1] = op1_value // op2_value
             elif op1_type == None or op2_type == None: # this should probably not happen..
                 raise Exception(56, 'Uninitialized symbol')
             else:
@@ -400,15 +456,15 @@ class Operations:
     def DIV(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
-            if op1_type == 'float' and op2_type == 'float':
+            if op1_type == FLOAT and op2_type == FLOAT:
                 if op2_value == 0:
                     raise Exception(57, 'Division by zero')
                 # write the result of the operation
-                set_var_type_value(data, data.instr[0].text, 'float',
+                set_var_type_value(data, data.instr.args[0], FLOAT,
                         op1_value / op2_value) 
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
@@ -422,19 +478,20 @@ class Operations:
     @staticmethod
     def DIVS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types and other constraints
-            if op1_type == 'float' and op2_type == 'float':
+            if op1_type == FLOAT and op2_type == FLOAT:
                 if op2_value == 0:
                     raise Exception(57, 'Division by zero')
                 # write the result of the operation
-                data.data_stack.append((op1_type, op1_value / op2_value))
+                values[-1] = op1_value / op2_value
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
@@ -448,24 +505,18 @@ class Operations:
     def LT(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
-            elif op1_type == op2_type and op1_type != 'nil':
-                # perform the comparison
-                if op1_type in ['int', 'string', 'float']:
-                    result = 'true' if op1_value < op2_value else 'false'
-                elif op1_type == 'bool':
-                    if op1_value == 'false' and op2_value == 'true': result = 'true'
-                    else: result = 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+            elif op1_type == op2_type and op1_type != NIL:
+                # perform the comparison, the bools compare as false < true
+                result = op1_value < op2_value
 
                 # write the result of the operation
-                set_var_type_value(data, data.instr[0].text, 'bool', result)
+                set_var_type_value(data, data.instr.args[0], BOOL, result)
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
@@ -476,28 +527,23 @@ class Operations:
     @staticmethod
     def LTS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
-            elif op1_type == op2_type and op1_type != 'nil':
-                # perform the comparison
-                if op1_type in ['int', 'string', 'float']:
-                    result = 'true' if op1_value < op2_value else 'false'
-                elif op1_type == 'bool':
-                    if op1_value == 'false' and op2_value == 'true': result = 'true'
-                    else: result = 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+            elif op1_type == op2_type and op1_type != NIL:
+                # perform the comparison, the bools compare as false < true
+                result = op1_value < op2_value
 
-                # push the result back onto the stack
-                data.data_stack.append(('bool', result))
+                # replace the operand on the top of the stack with the result
+                types[-1] = BOOL; values[-1] = result
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
@@ -509,24 +555,18 @@ class Operations:
     def GT(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
-            elif op1_type == op2_type and op1_type != 'nil':
-                # perform the comparison
-                if op1_type in ['int', 'string', 'float']:
-                    result = 'true' if op1_value > op2_value else 'false'
-                elif op1_type == 'bool':
-                    if op1_value == 'true' and op2_value == 'false': result = 'true'
-                    else: result = 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+            elif op1_type == op2_type and op1_type != NIL:
+                # perform the comparison, the bools compare as false < true
+                result = op1_value > op2_value
 
                 # write the result of the operation
-                set_var_type_value(data, data.instr[0].text, 'bool', result)
+                set_var_type_value(data, data.instr.args[0], BOOL, result)
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
@@ -537,28 +577,23 @@ class Operations:
     @staticmethod
     def GTS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
-            elif op1_type == op2_type and op1_type != 'nil':
-                # perform the comparison
-                if op1_type in ['int', 'string', 'float']:
-                    result = 'true' if op1_value > op2_value else 'false'
-                elif op1_type == 'bool':
-                    if op1_value == 'true' and op2_value == 'false': result = 'true'
-                    else: result = 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+            elif op1_type == op2_type and op1_type != NIL:
+                # perform the comparison, the bools compare as false < true
+                result = op1_value > op2_value
 
-                # push the result back onto the stack
-                data.data_stack.append(('bool', result))
+                # replace the operand on the top of the stack with the result
+                types[-1] = BOOL; values[-1] = result
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
@@ -570,8 +605,8 @@ class Operations:
     def EQ(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
@@ -579,18 +614,15 @@ class Operations:
             if op1_type == op2_type:
 
                 # perform the comparison
-                if op1_type in ['int', 'string', 'bool', 'nil', 'float']:
-                    result = 'true' if op1_value == op2_value else 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+                result = op1_value == op2_value
 
-            elif op1_type == 'nil' or op2_type == 'nil':
-                result = 'false'
+            elif op1_type == NIL or op2_type == NIL:
+                result = False
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
             # write the result of the operation
-            set_var_type_value(data, data.instr[0].text, 'bool', result)
+            set_var_type_value(data, data.instr.args[0], BOOL, result)
 
         except Exception as e:
             retcode, msg = e.args
@@ -599,12 +631,13 @@ class Operations:
     @staticmethod
     def EQS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
@@ -612,18 +645,15 @@ class Operations:
             if op1_type == op2_type:
 
                 # perform the comparison
-                if op1_type in ['int', 'string', 'bool', 'nil', 'float']:
-                    result = 'true' if op1_value == op2_value else 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+                result = op1_value == op2_value
 
-            elif op1_type == 'nil' or op2_type == 'nil':
-                result = 'false'
+            elif op1_type == NIL or op2_type == NIL:
+                result = False
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
-            # push the result back onto the stack
-            data.data_stack.append(('bool', result))
+            # replace the operand on the top of the stack with the result
+            types[-1] = BOOL; values[-1] = result
 
         except Exception as e:
             retcode, msg = e.args
@@ -633,22 +663,21 @@ class Operations:
     def AND(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
-            if op1_type == 'bool' and  op2_type == 'bool':
+            if op1_type == BOOL and  op2_type == BOOL:
 
                 # perform the operation
-                if op1_value == 'true' and op2_value == 'true': result = 'true'
-                else: result = 'false'
+                result = op1_value and op2_value
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
                 raise Exception(53, 'Operands incompatible for logical operation')
 
             # write the result of the operation
-            set_var_type_value(data, data.instr[0].text, 'bool', result)
+            set_var_type_value(data, data.instr.args[0], BOOL, result)
 
         except Exception as e:
             retcode, msg = e.args
@@ -657,26 +686,26 @@ class Operations:
     @staticmethod
     def ANDS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types and other constraints
-            if op1_type == 'bool' and  op2_type == 'bool':
+            if op1_type == BOOL and  op2_type == BOOL:
 
                 # perform the operation
-                if op1_value == 'true' and op2_value == 'true': result = 'true'
-                else: result = 'false'
+                result = op1_value and op2_value
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
                 raise Exception(53, 'Operands incompatible for logical operation')
 
-            # push the result back onto the stack
-            data.data_stack.append(('bool', result))
+            # replace the operand on the top of the stack with the result
+            types[-1] = BOOL; values[-1] = result
 
         except Exception as e:
             retcode, msg = e.args
@@ -686,22 +715,21 @@ class Operations:
     def OR(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
-            if op1_type == 'bool' and  op2_type == 'bool':
+            if op1_type == BOOL and  op2_type == BOOL:
 
                 # perform the operation
-                if op1_value == 'true' or op2_value == 'true': result = 'true'
-                else: result = 'false'
+                result = op1_value or op2_value
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
                 raise Exception(53, 'Operands incompatible for logical operation')
 
             # write the result of the operation
-            set_var_type_value(data, data.instr[0].text, 'bool', result)
+            set_var_type_value(data, data.instr.args[0], BOOL, result)
 
         except Exception as e:
             retcode, msg = e.args
@@ -710,26 +738,26 @@ class Operations:
     @staticmethod
     def ORS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check operand types and other constraints
-            if op1_type == 'bool' and  op2_type == 'bool':
+            if op1_type == BOOL and  op2_type == BOOL:
 
                 # perform the operation
-                if op1_value == 'true' or op2_value == 'true': result = 'true'
-                else: result = 'false'
+                result = op1_value or op2_value
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
                 raise Exception(53, 'Operands incompatible for logical operation')
 
-            # push the result back onto the stack
-            data.data_stack.append(('bool', result))
+            # replace the operand on the top of the stack with the result
+            types[-1] = BOOL; values[-1] = result
 
         except Exception as e:
             retcode, msg = e.args
@@ -739,20 +767,20 @@ class Operations:
     def NOT(data):
         try:
             # get the operand type and value
-            op_type, op_value = get_symbol_type_value(data, data.instr[1])
+            op_type, op_value = get_symbol_type_value(data, data.instr.args[1])
 
             # check operand types and other constraints
-            if op_type == 'bool':
+            if op_type == BOOL:
 
                 # perform the operation
-                result = 'false' if op_value == 'true' else 'true'
+                result = not op_value
             elif op_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
                 raise Exception(53, 'Operands incompatible for logical operation')
 
             # write the result of the operation
-            set_var_type_value(data, data.instr[0].text, 'bool', result)
+            set_var_type_value(data, data.instr.args[0], BOOL, result)
 
         except Exception as e:
             retcode, msg = e.args
@@ -762,21 +790,23 @@ class Operations:
     def NOTS(data):
         try:
             # get the operand type and value
-            try: op_type, op_value = data.data_stack.pop()
-            except: raise Exception(56, 'Empty data stack')
+            types = data.stack_types; values = data.stack_values
+            if not types:
+                raise Exception(56, 'Empty data stack')
+            op_type = types[-1]; op_value = values[-1]
 
             # check operand types and other constraints
-            if op_type == 'bool':
+            if op_type == BOOL:
 
                 # perform the operation
-                result = 'false' if op_value == 'true' else 'true'
+                result = not op_value
             elif op_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
                 raise Exception(53, 'Operands incompatible for logical operation')
 
-            # push the result back onto the stack
-            data.data_stack.append(('bool', result))
+            # replace the operand on the top of the stack with the result
+            types[-1] = BOOL; values[-1] = result
 
         except Exception as e:
             retcode, msg = e.args
@@ -786,10 +816,10 @@ class Operations:
     def INT2CHAR(data):
         try:
             # get the operand type and value
-            op_type, op_value = get_symbol_type_value(data, data.instr[1])
+            op_type, op_value = get_symbol_type_value(data, data.instr.args[1])
 
             # check operand types and other constraints
-            if op_type == 'int':
+            if op_type == INT:
                 try: char = chr(op_value)
                 except: raise Exception(58, 'Invalid ordinal value')
             elif op_type == None:
@@ -798,7 +828,7 @@ class Operations:
                 raise Exception(53, 'Second operand has to be an integer')
 
             # write the result of the operation
-            set_var_type_value(data, data.instr[0].text, 'string', char)
+            set_var_type_value(data, data.instr.args[0], STRING, char)
 
         except Exception as e:
             retcode, msg = e.args
@@ -808,11 +838,13 @@ class Operations:
     def INT2CHARS(data):
         try:
             # get the operand type and value
-            try: op_type, op_value = data.data_stack.pop()
-            except: raise Exception(56, 'Empty data stack')
+            types = data.stack_types; values = data.stack_values
+            if not types:
+                raise Exception(56, 'Empty data stack')
+            op_type = types[-1]; op_value = values[-1]
 
             # check operand types and other constraints
-            if op_type == 'int':
+            if op_type == INT:
                 try: char = chr(op_value)
                 except: raise Exception(58, 'Invalid ordinal value')
             elif op_type == None:
@@ -820,8 +852,8 @@ class Operations:
             else:
                 raise Exception(53, 'Second operand has to be an integer')
 
-            # push the result back onto the stack
-            data.data_stack.append(('string', char))
+            # replace the operand on the top of the stack with the result
+            types[-1] = STRING; values[-1] = char
 
         except Exception as e:
             retcode, msg = e.args
@@ -831,17 +863,17 @@ class Operations:
     def STRI2INT(data):
         try:
             # get the value and type of the operands
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_string_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check the operand types and store the char present on the specified position
-            if op1_type == 'string' and op2_type == 'int':
+            if op1_type == STRING and op2_type == INT:
                 limit = len(op1_value)
 
                 if not (0 <= op2_value < limit):
                     raise Exception(58, 'Index out of range')
 
-                set_var_type_value(data, data.instr[0].text, 'int',
+                set_var_type_value(data, data.instr.args[0], INT,
                         ord(op1_value[op2_value]))
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
@@ -855,22 +887,23 @@ class Operations:
     @staticmethod
     def STRI2INTS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values, the result replaces the first operand
+            # on the top of the stack
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types[-1]; op1_value = values[-1]
 
             # check the operand types and store the char present on the specified position
-            if op1_type == 'string' and op2_type == 'int':
+            if op1_type == STRING and op2_type == INT:
                 limit = len(op1_value)
 
                 if not (0 <= op2_value < limit):
                     raise Exception(58, 'Index out of range')
 
-                # push the result back onto the stack
-                data.data_stack.append(('int', ord(op1_value[op2_value])))
+                # replace the operand on the top of the stack with the result
+                types[-1] = INT; values[-1] = ord(op1_value[op2_value])
 
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
@@ -885,10 +918,10 @@ class Operations:
     def INT2FLOAT(data):
         try:
             # get the operand type and value
-            op_type, op_value = get_symbol_type_value(data, data.instr[1])
+            op_type, op_value = get_symbol_type_value(data, data.instr.args[1])
 
             # check operand types and other constraints
-            if op_type == 'int':
+            if op_type == INT:
                 try: result = float(op_value)
                 except: raise Exception(58, 'Could not convert int to float')
             elif op_type == None:
@@ -897,7 +930,7 @@ class Operations:
                 raise Exception(53, 'Second operand has to be an integer')
 
             # write the result of the operation
-            set_var_type_value(data, data.instr[0].text, 'float', result)
+            set_var_type_value(data, data.instr.args[0], FLOAT, result)
 
         except Exception as e:
             retcode, msg = e.args
@@ -907,11 +940,13 @@ class Operations:
     def INT2FLOATS(data):
         try:
             # get the operand type and value
-            try: op_type, op_value = data.data_stack.pop()
-            except: raise Exception(56, 'Empty data stack')
+            types = data.stack_types; values = data.stack_values
+            if not types:
+                raise Exception(56, 'Empty data stack')
+            op_type = types[-1]; op_value = values[-1]
 
             # check operand types and other constraints
-            if op_type == 'int':
+            if op_type == INT:
                 try: result = float(op_value)
                 except: raise Exception(58, 'Could not convert int to float')
             elif op_type == None:
@@ -919,8 +954,8 @@ class Operations:
             else:
                 raise Exception(53, 'Second operand has to be an integer')
 
-            # push the result back onto the stack
-            data.data_stack.append(('float', result))
+            # replace the operand on the top of the stack with the result
+            types[-1] = FLOAT; values[-1] = result
 
         except Exception as e:
             retcode, msg = e.args
@@ -930,10 +965,10 @@ class Operations:
     def FLOAT2INT(data):
         try:
             # get the operand type and value
-            op_type, op_value = get_symbol_type_value(data, data.instr[1])
+            op_type, op_value = get_symbol_type_value(data, data.instr.args[1])
 
             # check operand types and other constraints
-            if op_type == 'float':
+            if op_type == FLOAT:
                 try: result = int(op_value)
                 except: raise Exception(58, 'Could not convert float to int')
             elif op_type == None:
@@ -942,7 +977,7 @@ class Operations:
                 raise Exception(53, 'Second operand has to be a float')
 
             # write the result of the operation
-            set_var_type_value(data, data.instr[0].text, 'int', result)
+            set_var_type_value(data, data.instr.args[0], INT, result)
 
         except Exception as e:
             retcode, msg = e.args
@@ -952,11 +987,13 @@ class Operations:
     def FLOAT2INTS(data):
         try:
             # get the operand type and value
-            try: op_type, op_value = data.data_stack.pop()
-            except: raise Exception(56, 'Empty data stack')
+            types = data.stack_types; values = data.stack_values
+            if not types:
+                raise Exception(56, 'Empty data stack')
+            op_type = types[-1]; op_value = values[-1]
 
             # check operand types and other constraints
-            if op_type == 'float':
+            if op_type == FLOAT:
                 try: result = int(op_value)
                 except: raise Exception(58, 'Could not convert float to int')
             elif op_type == None:
@@ -964,8 +1001,8 @@ class Operations:
             else:
                 raise Exception(53, 'Second operand has to be a float')
 
-            # push the result back onto the stack
-            data.data_stack.append(('int', result))
+            # replace the operand on the top of the stack with the result
+            types[-1] = INT; values[-1] = result
 
         except Exception as e:
             retcode, msg = e.args
@@ -976,29 +1013,24 @@ class Operations:
     def READ(data):
         try:
             # get the value and type of the operands
-            op_type, op_value = get_symbol_type_value(data, data.instr[1])
+            op_type, op_value = get_symbol_type_value(data, data.instr.args[1])
 
-            # check the operand types and store the char present on the specified position
-            if op_type == 'type' and op_value in ['int', 'string', 'bool', 'float']:
-                read = data.input_file.readline() # read one line of input
-                if read == '':
-                    op_value = 'nil'
-                    read = 'nil'
+            # check the operand types, the value of a type operand is a type tag
+            if op_type == 'type' and op_value in (INT, STRING, BOOL, FLOAT):
+                read = data.input_file.read_line() # read one line of input
+                if read == None:
+                    op_value = NIL
                 else:
-                    if read[-1] == '\n': read = read[:-1] # cut the trailing newline
-                    if op_value == 'int':
+                    if op_value == INT:
                         try: read = int(read)
-                        except: read = 'nil'; op_value = 'nil'
-                    elif op_value == 'string':
-                        read = str(read)
-                    elif op_value == 'float':
+                        except: read = None; op_value = NIL
+                    elif op_value == FLOAT:
                         try: read = float.fromhex(read)
-                        except: read = 'nil'; op_value = 'nil'
-                    else: # bool
-                        if read.casefold() == 'true': read = 'true'
-                        else: read = 'false'
+                        except: read = None; op_value = NIL
+                    elif op_value == BOOL:
+                        read = read.casefold() == 'true'
 
-                set_var_type_value(data, data.instr[0].text, op_value, read)
+                set_var_type_value(data, data.instr.args[0], op_value, read)
             else:
                 raise Exception(53, 'Invalid operand type')
 
@@ -1010,20 +1042,12 @@ class Operations:
     def WRITE(data):
         try:
             # get the value and type of the symbol
-            op_type, op_value = get_symbol_type_value(data, data.instr[0])
-            if op_type == 'nil':
-                op_value = ''
-            elif op_type in ['int', 'string', 'bool']:
-                pass
-            elif op_type == 'float': # convert floats back to hexa
-                op_value = float.hex(op_value)
-            elif op_type == None:
+            op_type, op_value = get_symbol_type_value(data, data.instr.args[0])
+            if op_type == None:
                 raise Exception(56, 'Uninitialized symbol')
-            else:
-                raise Exception(53, 'Invalid operand type')
-            
-            # print out the symbol value
-            print(op_value, end='')
+
+            # print out the text form of the symbol value (floats in hexa)
+            data.output.write(to_text(op_type, op_value))
 
         except Exception as e:
             retcode, msg = e.args
@@ -1033,14 +1057,25 @@ class Operations:
     @staticmethod
     def CONCAT(data):
         try:
-            # get the value and type of the symbol
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            dst = data.instr.args[0]
+            if dst is data.instr.args[1]:
+                # appending to a variable, the string is extended in place
+                frame, slot = get_defined_var_slot(data, dst)
+                op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
+                op1_type = frame.types[slot]
+                if op1_type is STRING_BUFFER:
+                    op1_type = STRING
+            else:
+                # get the value and type of the symbol
+                op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+                op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # concatenate the strings
-            if op1_type == 'string' and op2_type == 'string':
-                set_var_type_value(data, data.instr[0].text, 'string',
-                        op1_value + op2_value)
+            if op1_type == STRING and op2_type == STRING:
+                if dst is data.instr.args[1]:
+                    make_string_buffer(frame, slot).extend(op2_value)
+                else:
+                    set_var_type_value(data, dst, STRING, op1_value + op2_value)
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
@@ -1054,11 +1089,11 @@ class Operations:
     def STRLEN(data):
         try:
             # get the value and type of the symbol
-            op_type, op_value = get_symbol_type_value(data, data.instr[1])
+            op_type, op_value = get_string_type_value(data, data.instr.args[1])
 
             # store the string length
-            if op_type == 'string':
-                set_var_type_value(data, data.instr[0].text, 'int', len(op_value))
+            if op_type == STRING:
+                set_var_type_value(data, data.instr.args[0], INT, len(op_value))
             elif op_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
@@ -1072,17 +1107,17 @@ class Operations:
     def GETCHAR(data):
         try:
             # get the value and type of the operands
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_string_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check the operand types and store the char present on the specified position
-            if op1_type == 'string' and op2_type == 'int':
+            if op1_type == STRING and op2_type == INT:
                 limit = len(op1_value)
 
                 if not (0 <= op2_value < limit):
                     raise Exception(58, 'Index out of range')
 
-                set_var_type_value(data, data.instr[0].text, 'string',
+                set_var_type_value(data, data.instr.args[0], STRING,
                         op1_value[op2_value])
             elif op1_type == None or op2_type == None:
                 raise Exception(56, 'Uninitialized symbol')
@@ -1096,21 +1131,23 @@ class Operations:
     @staticmethod
     def SETCHAR(data):
         try:
-            # get the value and type of the operands
-            var_type, var_value = get_var_type_value(data, data.instr[0].text)
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            # get the value and type of the operands, the string is edited in place
+            frame, slot = get_defined_var_slot(data, data.instr.args[0])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
+            var_type = frame.types[slot]
+            if var_type is STRING_BUFFER:
+                var_type = STRING
 
             # check the operand types and store the char present on the specified position
-            if var_type == 'string' and op1_type == 'int' and op2_type == 'string':
-                limit = len(var_value)
+            if var_type == STRING and op1_type == INT and op2_type == STRING:
+                limit = len(frame.values[slot])
 
                 # check the constraints
                 if not (0 <= op1_value < limit) or len(op2_value) == 0:
                     raise Exception(58, 'Index out of range')
 
-                var_value = var_value[:op1_value] + op2_value[0] + var_value[op1_value+1:]
-                set_var_type_value(data, data.instr[0].text, 'string', var_value)
+                make_string_buffer(frame, slot)[op1_value] = op2_value[0]
             elif op1_type == None or op2_type == None or var_type == None:
                 raise Exception(56, 'Uninitialized symbol')
             else:
@@ -1124,18 +1161,15 @@ class Operations:
     @staticmethod
     def TYPE(data):
         try:
-            op_type, op_value = get_symbol_type_value(data, data.instr[1])
-            if op_type == None or op_value == None:
+            op_type, op_value = get_symbol_type_value(data, data.instr.args[1])
+            if op_type == None:
                 op_value = ''
-                op_type = 'string'
-            elif op_type in ['int', 'string', 'bool', 'nil', 'float']:
-                op_value = op_type
-                op_type = 'string'
             else:
-                raise Exception(53, 'Invalid operand type')
+                op_value = TYPE_NAMES[op_type]
+            op_type = STRING
 
             # write the type to the variable
-            set_var_type_value(data, data.instr[0].text, op_type, op_value)
+            set_var_type_value(data, data.instr.args[0], op_type, op_value)
             
         except Exception as e:
             retcode, msg = e.args
@@ -1143,23 +1177,23 @@ class Operations:
 
     # Program flow control
     @staticmethod
-    def LABEL():
+    def LABEL(data):
         pass
 
     @staticmethod
     def JUMP(data):
-        label = data.instr[0].text
-        if label in data.labels:
-            data.ip = data.labels[label] # get the label position
-        else:
-            raise Exception(52, f'JUMP: Label "{label}" is undefined')
+        label = data.instr.args[0]
+        if label.target is None:
+            raise Exception(52, f'JUMP: Label "{label.name}" is undefined')
+        data.ip = label.target # jump to the label position
+        return True
 
     @staticmethod
     def JUMPIFEQ(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
@@ -1167,24 +1201,21 @@ class Operations:
             elif op1_type == op2_type:
 
                 # perform the comparison
-                if op1_type in ['int', 'string', 'bool', 'nil', 'float']:
-                    result = 'true' if op1_value == op2_value else 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+                result = op1_value == op2_value
 
-            elif op1_type == 'nil' or op2_type == 'nil':
-                result = 'false'
+            elif op1_type == NIL or op2_type == NIL:
+                result = False
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
             # test the label existence
-            label = data.instr[0].text
-            if label not in data.labels:
-                raise Exception(52, f'Label "{label}" is undefined')
+            label = data.instr.args[0]
+            if label.target is None:
+                raise Exception(52, f'Label "{label.name}" is undefined')
 
             # perform the jump
-            if result == 'true':
-                data.ip = data.labels[label] # get the label position
+            if result:
+                data.ip = label.target # get the label position
                 return True
             else:
                 return False # let the processor know the jump will take place
@@ -1196,12 +1227,12 @@ class Operations:
     @staticmethod
     def JUMPIFEQS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types.pop(); op1_value = values.pop()
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
@@ -1209,24 +1240,21 @@ class Operations:
             elif op1_type == op2_type:
 
                 # perform the comparison
-                if op1_type in ['int', 'string', 'bool', 'nil', 'float']:
-                    result = 'true' if op1_value == op2_value else 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+                result = op1_value == op2_value
 
-            elif op1_type == 'nil' or op2_type == 'nil':
-                result = 'false'
+            elif op1_type == NIL or op2_type == NIL:
+                result = False
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
             # test the label existence
-            label = data.instr[0].text
-            if label not in data.labels:
-                raise Exception(52, f'Label "{label}" is undefined')
+            label = data.instr.args[0]
+            if label.target is None:
+                raise Exception(52, f'Label "{label.name}" is undefined')
 
             # perform the jump
-            if result == 'true':
-                data.ip = data.labels[label] # get the label position
+            if result:
+                data.ip = label.target # get the label position
                 return True
             else:
                 return False # let the processor know the jump will take place
@@ -1239,8 +1267,8 @@ class Operations:
     def JUMPIFNEQ(data):
         try:
             # get the operand types and values
-            op1_type, op1_value = get_symbol_type_value(data, data.instr[1])
-            op2_type, op2_value = get_symbol_type_value(data, data.instr[2])
+            op1_type, op1_value = get_symbol_type_value(data, data.instr.args[1])
+            op2_type, op2_value = get_symbol_type_value(data, data.instr.args[2])
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
@@ -1248,24 +1276,21 @@ class Operations:
             if op1_type == op2_type:
 
                 # perform the comparison
-                if op1_type in ['int', 'string', 'bool', 'nil', 'float']:
-                    result = 'true' if op1_value == op2_value else 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+                result = op1_value == op2_value
 
-            elif op1_type == 'nil' or op2_type == 'nil':
-                result = 'false'
+            elif op1_type == NIL or op2_type == NIL:
+                result = False
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
             # test the label existence
-            label = data.instr[0].text
-            if label not in data.labels:
-                raise Exception(52, f'Label "{label}" is undefined')
+            label = data.instr.args[0]
+            if label.target is None:
+                raise Exception(52, f'Label "{label.name}" is undefined')
 
             # perform the jump
-            if result == 'false':
-                data.ip = data.labels[label] # get the label position
+            if not result:
+                data.ip = label.target # get the label position
                 return True
             else:
                 return False # let the processor know the jump will take place
@@ -1277,12 +1302,12 @@ class Operations:
     @staticmethod
     def JUMPIFNEQS(data):
         try:
-            try:
-                # get the operand types and values
-                op2_type, op2_value = data.data_stack.pop()
-                op1_type, op1_value = data.data_stack.pop()
-            except:
+            # get the operand types and values
+            types = data.stack_types; values = data.stack_values
+            if len(types) < 2:
                 raise Exception(56, 'Empty data stack')
+            op2_type = types.pop(); op2_value = values.pop()
+            op1_type = types.pop(); op1_value = values.pop()
 
             # check operand types and other constraints
             if op1_type == None or op2_type == None:
@@ -1290,24 +1315,21 @@ class Operations:
             if op1_type == op2_type:
 
                 # perform the comparison
-                if op1_type in ['int', 'string', 'bool', 'nil', 'float']:
-                    result = 'true' if op1_value == op2_value else 'false'
-                else:
-                    raise Exception(53, 'Operands incompatible for comparison')
+                result = op1_value == op2_value
 
-            elif op1_type == 'nil' or op2_type == 'nil':
-                result = 'false'
+            elif op1_type == NIL or op2_type == NIL:
+                result = False
             else:
                 raise Exception(53, 'Operands incompatible for comparison')
 
             # test the label existence
-            label = data.instr[0].text
-            if label not in data.labels:
-                raise Exception(52, f'Label "{label}" is undefined')
+            label = data.instr.args[0]
+            if label.target is None:
+                raise Exception(52, f'Label "{label.name}" is undefined')
 
             # perform the jump
-            if result == 'false':
-                data.ip = data.labels[label] # get the label position
+            if not result:
+                data.ip = label.target # get the label position
                 return True
             else:
                 return False # let the processor know the jump will take place
@@ -1319,10 +1341,10 @@ class Operations:
     @staticmethod
     def EXIT(data):
         try:
-            op_type, retcode = get_symbol_type_value(data, data.instr[0])
+            op_type, retcode = get_symbol_type_value(data, data.instr.args[0])
             if op_type == None:
                 raise Exception(56, 'Uninitialized symbol')
-            elif op_type != 'int':
+            elif op_type != INT:
                 raise Exception(53, 'Invalid return code type')
             elif retcode < 0 or retcode > 49 or not isinstance(retcode, int):
                 raise Exception(57, 'Invalid return code')
@@ -1340,3 +1362,185 @@ class Operations:
     @staticmethod
     def BREAK(data):
         pass
+
+    # Superinstructions (see optimizer.py)
+    @staticmethod
+    def LT_JUMPIF(data):
+        return relation_jump(data, 'LT', True)
+
+    @staticmethod
+    def LT_JUMPIFNOT(data):
+        return relation_jump(data, 'LT', False)
+
+    @staticmethod
+    def GT_JUMPIF(data):
+        return relation_jump(data, 'GT', True)
+
+    @staticmethod
+    def GT_JUMPIFNOT(data):
+        return relation_jump(data, 'GT', False)
+
+    @staticmethod
+    def EQ_JUMPIF(data):
+        return relation_jump(data, 'EQ', True)
+
+    @staticmethod
+    def EQ_JUMPIFNOT(data):
+        return relation_jump(data, 'EQ', False)
+
+    @staticmethod
+    def DEFVAR_MOVE(data):
+        Operations.DEFVAR(data)
+        try:
+            # the variable has just been defined, so only the source has to be read
+            src_type, src_value = get_symbol_type_value(data, data.instr.args[1])
+            if src_type == None:
+                raise Exception(56, 'Uninitialized symbol')
+            set_var_type_value(data, data.instr.args[0], src_type, src_value)
+
+        except Exception as e:
+            retcode, msg = e.args
+            raise Exception(retcode, 'MOVE: ' + msg)
+
+    @staticmethod
+    def CREATEFRAME_PUSHFRAME(data):
+        # the new frame becomes the LF right away and the TF is left undefined
+        frame = Frame(data.instr.layout)
+        data.frame_stack.append(frame)
+        data.lf = frame
+        data.tf = None
+
+    @staticmethod
+    def TAILCALL(data):
+        # CALL; RETURN - the called function returns straight to our return address
+        label = data.instr.args[0]
+        if label.target is None:
+            raise Exception(52, f'CALL: Label "{label.name}" is undefined')
+        data.ip = label.target
+        return True
+
+    @staticmethod
+    def TAILCALL_POPFRAME(data):
+        # CALL; POPFRAME; RETURN - the POPFRAME and RETURN stay after the instruction. If
+        # we have been called by the same sequence, returning to it would only pop our LF
+        # and return again, where the TF is overwritten by the next POPFRAME. So our LF is
+        # dropped and the called function reuses its slot and our return address. The
+        # optimiser makes sure that our LF cannot be read by anything else
+        label = data.instr.args[0]
+        if label.target is None:
+            raise Exception(52, f'CALL: Label "{label.name}" is undefined')
+
+        ip_stack = data.ip_stack
+        if ip_stack and data.lf is not None and \
+                data.program[ip_stack[-1] - 1].op_id == TAILCALL_POPFRAME:
+            data.frame_stack.pop()
+            data.lf = data.frame_stack[-1] if data.frame_stack else None
+        else:
+            ip_stack.append(data.instr.order + 1)
+        data.ip = label.target
+        return True
+
+
+# The check-free handlers of the instructions whose operand types have been proven by the
+# type inference (see optimizer.infer_types). A variable with a proven type exists and
+# holds a value of that type, so it is read straight from its slot and only the
+# destination has to be checked
+
+# the instructions with check-free handlers and the operations they perform
+PROVEN_OPERATIONS = {OPCODE_IDS[opcode]: operation for opcode, operation in (
+    ('ADD', operator.add), ('SUB', operator.sub), ('MUL', operator.mul),
+    ('LT', operator.lt), ('GT', operator.gt), ('EQ', operator.eq))}
+ARITHMETIC = {OPCODE_IDS['ADD'], OPCODE_IDS['SUB'], OPCODE_IDS['MUL']}
+EQUALITIES = {OPCODE_IDS['EQ'], OPCODE_IDS['EQ_JUMPIF'], OPCODE_IDS['EQ_JUMPIFNOT']}
+
+# the relations fused with a conditional jump, their operations and the results on which
+# they jump
+PROVEN_RELATION_JUMPS = {OPCODE_IDS[relation + suffix]: (relation, operation, jump_if)
+                         for relation, operation in (('LT', operator.lt),
+                             ('GT', operator.gt), ('EQ', operator.eq))
+                         for suffix, jump_if in (('_JUMPIF', True), ('_JUMPIFNOT', False))}
+
+
+# This function returns the value of a literal or of a variable with a proven type
+def get_proven_value(data, symbol):
+    if symbol.type != 'var':
+        return symbol.value
+    if symbol.frame == GF:
+        frame = data.global_frame; slot = symbol.slot
+    else:
+        frame = data.lf if symbol.frame == LF else data.tf
+        slot = frame.lookup(symbol)
+    if frame.types[slot] is STRING_BUFFER:
+        return frame.flatten(slot)
+    return frame.values[slot]
+
+
+# This function returns the type of the result of an instruction that can run without
+# checking the types of its operands given their proven types (see optimizer.infer_types),
+# or None if some operand does not have a proven type or the operation would fail for
+# the proven types
+def proven_result_tag(instr, types):
+    op_id = instr.op_id
+    if types is None or (op_id not in PROVEN_OPERATIONS and op_id not in
+                         PROVEN_RELATION_JUMPS):
+        return None
+    args = instr.args
+    tag1, tag2 = (arg.type if arg.type != 'var' else types[n + 1]
+                  for n, arg in enumerate(args[1:3]))
+    if tag1 is None or tag2 is None:
+        return None
+
+    if op_id in ARITHMETIC:
+        if tag1 != tag2 or tag1 not in (INT, FLOAT):
+            return None
+        return tag1
+    elif op_id in EQUALITIES:
+        # nil can be compared with anything, it only equals nil
+        if tag1 != tag2 and tag1 != NIL and tag2 != NIL:
+            return None
+    elif tag1 != tag2 or tag1 == NIL:
+        return None
+
+    if op_id in PROVEN_RELATION_JUMPS and args[3].target is None:
+        return None # the generic handler reports the undefined label
+    return BOOL
+
+
+# This function returns the check-free handler of an instruction given the proven types
+# of its operands, or None if the instruction has to check them (see proven_result_tag)
+def proven_handler(instr, types):
+    result_tag = proven_result_tag(instr, types)
+    if result_tag is None:
+        return None
+    if instr.op_id in PROVEN_OPERATIONS:
+        return make_proven_operation(instr.opcode, PROVEN_OPERATIONS[instr.op_id],
+                                     result_tag)
+    return make_proven_relation_jump(*PROVEN_RELATION_JUMPS[instr.op_id])
+
+
+def make_proven_operation(opcode, operation, result_tag):
+    def run(data):
+        args = data.instr.args
+        result = operation(get_proven_value(data, args[1]), get_proven_value(data, args[2]))
+        try:
+            set_var_type_value(data, args[0], result_tag, result)
+        except Exception as e:
+            retcode, msg = e.args
+            raise Exception(retcode, f'{opcode}: ' + msg)
+    return run
+
+
+def make_proven_relation_jump(relation, operation, jump_if):
+    def run(data):
+        args = data.instr.args
+        result = operation(get_proven_value(data, args[1]), get_proven_value(data, args[2]))
+        try:
+            set_var_type_value(data, args[0], BOOL, result)
+        except Exception as e:
+            retcode, msg = e.args
+            raise Exception(retcode, f'{relation}: ' + msg)
+        if result == jump_if:
+            data.ip = args[3].target
+            return True
+        return False
+    return run
@@ -0,0 +1,788 @@
+##
+# @file   optimizer.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements the optimisation passes over the compiled program. The
+#         passes run before the program is linked and they rewrite its instructions
+#         without changing the observable behaviour, the error codes included
+
+from program import Symbol, Instruction, OPCODES, OPCODE_IDS, CONTROL_OPCODES, GF
+from values import INT, FLOAT, STRING, BOOL, NIL, TYPE_NAMES
+from xml_checker import SIGNATURES
+
+# the stack instructions with two operands and their three-address counterparts
+BINARY_STACK_OPERATIONS = {OPCODE_IDS[stack_op]: OPCODE_IDS[op] for stack_op, op in (
+    ('ADDS', 'ADD'), ('SUBS', 'SUB'), ('MULS', 'MUL'), ('IDIVS', 'IDIV'),
+    ('DIVS', 'DIV'), ('LTS', 'LT'), ('GTS', 'GT'), ('EQS', 'EQ'), ('ANDS', 'AND'),
+    ('ORS', 'OR'), ('STRI2INTS', 'STRI2INT'))}
+
+# the stack instructions with a single operand and their three-address counterparts
+UNARY_STACK_OPERATIONS = {OPCODE_IDS[stack_op]: OPCODE_IDS[op] for stack_op, op in (
+    ('NOTS', 'NOT'), ('INT2CHARS', 'INT2CHAR'), ('INT2FLOATS', 'INT2FLOAT'),
+    ('FLOAT2INTS', 'FLOAT2INT'))}
+
+# the stack conditional jumps and their three-address counterparts
+STACK_JUMPS = {OPCODE_IDS['JUMPIFEQS']: OPCODE_IDS['JUMPIFEQ'],
+               OPCODE_IDS['JUMPIFNEQS']: OPCODE_IDS['JUMPIFNEQ']}
+
+PUSHS = OPCODE_IDS['PUSHS']
+POPS = OPCODE_IDS['POPS']
+MOVE = OPCODE_IDS['MOVE']
+LABEL = OPCODE_IDS['LABEL']
+
+# the instructions transferring the control elsewhere
+CONTROL = {OPCODE_IDS[opcode] for opcode in CONTROL_OPCODES}
+
+# the instructions after which the LF and TF may hold other variables
+FRAME_CHANGES = {OPCODE_IDS[opcode] for opcode in ('CREATEFRAME', 'PUSHFRAME', 'POPFRAME',
+    'CALL', 'RETURN', 'CREATEFRAME_PUSHFRAME', 'TAILCALL', 'TAILCALL_POPFRAME')}
+
+
+# the superinstructions of the relations fused with a jump taken if the result is true
+# and with a jump taken if the result is false
+RELATION_JUMPS = {OPCODE_IDS[relation]: (OPCODE_IDS[relation + '_JUMPIF'],
+                                         OPCODE_IDS[relation + '_JUMPIFNOT'])
+                  for relation in ('LT', 'GT', 'EQ')}
+
+JUMPIFEQ = OPCODE_IDS['JUMPIFEQ']
+JUMPIFNEQ = OPCODE_IDS['JUMPIFNEQ']
+JUMP = OPCODE_IDS['JUMP']
+CALL = OPCODE_IDS['CALL']
+RETURN = OPCODE_IDS['RETURN']
+EXIT = OPCODE_IDS['EXIT']
+DEFVAR = OPCODE_IDS['DEFVAR']
+CREATEFRAME = OPCODE_IDS['CREATEFRAME']
+PUSHFRAME = OPCODE_IDS['PUSHFRAME']
+POPFRAME = OPCODE_IDS['POPFRAME']
+CREATEFRAME_PUSHFRAME = OPCODE_IDS['CREATEFRAME_PUSHFRAME']
+TAILCALL = OPCODE_IDS['TAILCALL']
+TAILCALL_POPFRAME = OPCODE_IDS['TAILCALL_POPFRAME']
+
+
+# Runs the optimisation passes over a compiled program and returns the optimised program.
+# The superinstructions can be turned off for debugging. If a report dictionary is given,
+# the passes count what they have done in it
+def optimize_program(program, superinstructions=True, report=None):
+    if report is None:
+        report = {}
+    program = inline_calls(program, report)
+    program = convert_stack_sequences(program)
+    program = fold_constants(program, report)
+    program = eliminate_tail_calls(program, report)
+    if superinstructions:
+        program = fuse_superinstructions(program)
+    return program
+
+
+def var_key(symbol):
+    return (symbol.frame, symbol.name)
+
+
+# This class tracks the variables that are known to exist at a point of a basic block -
+# every variable accessed by an instruction that has been executed exists (or the
+# instruction would have ended the program). The variables of the GF accessed in the
+# entry block, which always runs first, are known in the whole program
+class KnownVariables:
+    def __init__(self, program):
+        self.known = set()
+        self.globals = set()
+        for instr in program:
+            # a label starts the next block, where only the globals would be known
+            if instr.op_id == LABEL:
+                break
+            self.update(instr)
+            if instr.op_id in CONTROL:
+                break
+        self.globals = {key for key in self.known if key[0] == GF}
+        self.known.clear()
+
+    def __contains__(self, symbol):
+        return symbol.type == 'var' and var_key(symbol) in self.known
+
+    def update(self, instr):
+        if instr.op_id == LABEL:
+            self.known = set(self.globals)
+        elif instr.op_id in FRAME_CHANGES:
+            # only the GF variables survive
+            self.known = {key for key in self.known if key[0] == GF}
+        else:
+            self.known.update(var_key(arg) for arg in instr.args if arg.type == 'var')
+
+
+# Tests whether a three-address instruction reading op1 and then op2 fails with the same
+# error as PUSHS op1; PUSHS op2. PUSHS fails on an uninitialized variable right away,
+# while the three-address instructions read both operands first, so reading op2 must not
+# fail if op1 may be uninitialized
+def same_read_errors(op1, op2, known):
+    return (op1.type != 'var' or op2.type != 'var' or op2 in known or
+            var_key(op1) == var_key(op2))
+
+
+# Rewrites the balanced sequences of stack instructions into three-address instructions:
+#
+#   PUSHS a; PUSHS b; <op>S; POPS x   ->   <op> x a b
+#   PUSHS a; <op>S; POPS x            ->   <op> x a
+#   PUSHS a; PUSHS b; JUMPIF<op>S l   ->   JUMPIF<op> l a b
+#   PUSHS a; POPS x                   ->   MOVE x a
+#
+# A sequence never contains a label, so it cannot be entered in the middle, and it leaves
+# the data stack as it was. The three-address instructions check their operands in the
+# same order as the stack instructions, apart from the cases tested before the rewrite
+def convert_stack_sequences(program):
+    if all(instr.op_id != PUSHS for instr in program):
+        return program
+    optimized = []
+    known = KnownVariables(program)
+    pos = 0
+    while pos < len(program):
+        instr, length = match_stack_sequence(program, pos, known)
+        if instr is None:
+            instr = program[pos]; length = 1
+        optimized.append(instr)
+        known.update(instr)
+        pos += length
+    return optimized
+
+
+# Returns the three-address instruction replacing the stack sequence starting at pos and
+# the length of the sequence, or (None, 0) if there is no such sequence
+def match_stack_sequence(program, pos, known):
+    ops = [instr.op_id for instr in program[pos:pos + 4]]
+    if not ops or ops[0] != PUSHS:
+        return None, 0
+    a = program[pos].args[0]
+
+    if len(ops) >= 3 and ops[1] == PUSHS:
+        b = program[pos + 1].args[0]
+        if not same_read_errors(a, b, known):
+            return None, 0
+        if ops[2] in STACK_JUMPS:
+            label = program[pos + 2].args[0]
+            return Instruction(STACK_JUMPS[ops[2]], (label, a, b)), 3
+        if len(ops) == 4 and ops[2] in BINARY_STACK_OPERATIONS and ops[3] == POPS:
+            x = program[pos + 3].args[0]
+            return Instruction(BINARY_STACK_OPERATIONS[ops[2]], (x, a, b)), 4
+
+    elif len(ops) >= 3 and ops[1] in UNARY_STACK_OPERATIONS and ops[2] == POPS:
+        x = program[pos + 2].args[0]
+        return Instruction(UNARY_STACK_OPERATIONS[ops[1]], (x, a)), 3
+
+    elif len(ops) >= 2 and ops[1] == POPS:
+        # MOVE checks the destination before reading the source
+        x = program[pos + 1].args[0]
+        if a.type != 'var' or x in known or var_key(a) == var_key(x):
+            return Instruction(MOVE, (x, a)), 2
+
+    return None, 0
+
+
+# Replaces the common pairs of instructions by superinstructions doing the work of both
+# of them in a single dispatch:
+#
+#   LT x a b; JUMPIFEQ l x bool@true     ->   LT_JUMPIF x a b l
+#   LT x a b; JUMPIFNEQ l x bool@true    ->   LT_JUMPIFNOT x a b l
+#   DEFVAR x; MOVE x a                   ->   DEFVAR_MOVE x a
+#   CREATEFRAME; PUSHFRAME               ->   CREATEFRAME_PUSHFRAME
+#
+# and the same for GT, EQ and the comparisons with bool@false or with the operands of the
+# jump swapped. The result of the relation is still written to x, the jump just does not
+# have to read it back. The second instruction of a pair is never a label, so the pair
+# is always executed as a whole. The jumps to undefined labels are not fused, so the
+# errors of a fused relation jump always come from the relation
+def fuse_superinstructions(program):
+    labels = label_positions(program)
+    optimized = []
+    pos = 0
+    while pos < len(program):
+        instr = program[pos]
+        if pos + 1 < len(program):
+            fused = fuse_pair(instr, program[pos + 1], labels)
+            if fused is not None:
+                instr = fused
+                pos += 1
+        optimized.append(instr)
+        pos += 1
+    return optimized
+
+
+# Returns the superinstruction replacing a pair of instructions or None
+def fuse_pair(first, second, labels):
+    if first.op_id in RELATION_JUMPS and second.op_id in (JUMPIFEQ, JUMPIFNEQ):
+        label, op1, op2 = second.args
+        if label.name not in labels:
+            return None
+        dst = first.args[0]
+        if op2.type == 'var' and op1.type != 'var':
+            op1, op2 = op2, op1
+        if op1.type != 'var' or var_key(op1) != var_key(dst) or op2.type != BOOL:
+            return None
+        # the value of x the jump is taken for
+        jump_if = op2.value if second.op_id == JUMPIFEQ else not op2.value
+        jump, jump_not = RELATION_JUMPS[first.op_id]
+        return Instruction(jump if jump_if else jump_not, first.args + (label,))
+
+    if first.op_id == DEFVAR and second.op_id == MOVE:
+        if var_key(first.args[0]) == var_key(second.args[0]):
+            return Instruction(OPCODE_IDS['DEFVAR_MOVE'], second.args)
+
+    if first.op_id == CREATEFRAME and second.op_id == PUSHFRAME:
+        return Instruction(OPCODE_IDS['CREATEFRAME_PUSHFRAME'], ())
+
+    return None
+
+
+# the positions of the symbol operands (the operands that are read) of every instruction
+# and whether the first operand of the instruction is a variable written by it
+SYMBOL_OPERANDS = [tuple(index for index, kind in enumerate(SIGNATURES.get(opcode, ()))
+                         if kind == 'symb') for opcode in OPCODES]
+WRITES_VARIABLE = [SIGNATURES.get(opcode, ('',))[:1] == ('var',) for opcode in OPCODES]
+
+# the number of times the constant folding and the dead code elimination are repeated at
+# most, every round may uncover more constants and unreachable code for the next one
+FOLDING_ROUNDS = 4
+
+
+# Propagates the constants through the variables, folds the instructions with constant
+# operands and removes the unreachable code and the labels nobody refers to. The number
+# of the removed instructions is added to the report
+def fold_constants(program, report):
+    length = len(program)
+    for __ in range(FOLDING_ROUNDS):
+        optimized = propagate_constants(program)
+        optimized = remove_unused_labels(remove_jumps_to_next(
+                remove_unreachable_code(optimized)))
+        changed = [id(instr) for instr in optimized] != [id(instr) for instr in program]
+        program = optimized
+        if not changed:
+            break
+    report['removed instructions'] = report.get('removed instructions', 0) + \
+            length - len(program)
+    return program
+
+
+# Builds the control flow graph of an unlinked program. Returns the positions of the
+# starts of its basic blocks, followed by the length of the program, and the successors
+# of every block as (block index, reset) pairs. Reset is True if nothing is known about
+# the variables when the successor is entered - a RETURN continues after some CALL, so
+# the instruction following every CALL is entered with nothing known. The first block is
+# the entry block
+def build_flow_graph(program):
+    labels = label_positions(program)
+    starts = [0]
+    for pos, instr in enumerate(program):
+        if instr.op_id == LABEL and pos != starts[-1]:
+            starts.append(pos)
+        elif instr.op_id in CONTROL:
+            starts.append(pos + 1)
+    if starts[-1] != len(program):
+        starts.append(len(program))
+    block_at = {start: index for index, start in enumerate(starts)}
+    blocks = len(starts) - 1
+
+    successors = []
+    for index in range(blocks):
+        last = program[starts[index + 1] - 1]
+        fallthrough = index + 1 if index + 1 < blocks else None
+        if last.op_id not in CONTROL:
+            successors.append(((fallthrough, False),) if fallthrough is not None else ())
+            continue
+
+        edges = []
+        # the label is the first operand of the jumps and the last one of the fused jumps
+        label = next((arg for arg in last.args if arg.type == 'label'), None)
+        if label is not None and label.name in labels:
+            edges.append((block_at[labels[label.name]], False))
+        if fallthrough is not None:
+            if last.op_id in (CALL, TAILCALL_POPFRAME):
+                edges.append((fallthrough, True))
+            elif last.op_id not in (JUMP, RETURN, EXIT, TAILCALL):
+                edges.append((fallthrough, False))
+        successors.append(tuple(edges))
+    return starts, successors
+
+
+# Returns the positions of the labels of an unlinked program
+def label_positions(program):
+    return {instr.args[0].name: pos for pos, instr in enumerate(program)
+            if instr.op_id == LABEL}
+
+
+# Returns a key comparing two literals by their type and value, 0.0 and -0.0 differ
+def literal_key(symbol):
+    return (symbol.type, symbol.value.hex() if symbol.type == FLOAT else symbol.value)
+
+
+# Finds the constant values of the variables at the beginning of every basic block by an
+# iterative dataflow analysis and rewrites the instructions using them. A variable is
+# constant at a point if all the paths leading there assign the same literal to it, so
+# it also surely exists there. The states map the variable keys to literals, None means
+# the block has not been reached yet. A block is rewritten whenever its state changes,
+# so the last rewrite of every block is done with its final state
+def propagate_constants(program):
+    if not program:
+        return program
+    starts, successors = build_flow_graph(program)
+    labels = label_positions(program)
+    entry_states = [None] * len(successors)
+    entry_states[0] = {}
+
+    optimized = list(program)
+    pending = [0]
+    while pending:
+        block = pending.pop()
+        state = dict(entry_states[block])
+        for pos in range(starts[block], starts[block + 1]):
+            optimized[pos] = rewrite_instruction(program[pos], state, labels)
+
+        for successor, reset in successors[block]:
+            incoming = {} if reset else state
+            known = entry_states[successor]
+            if known is None:
+                merged = dict(incoming)
+            else:
+                merged = {key: symbol for key, symbol in known.items()
+                          if key in incoming and
+                          literal_key(incoming[key]) == literal_key(symbol)}
+            if known is None or len(merged) != len(known):
+                entry_states[successor] = merged
+                pending.append(successor)
+
+    # the blocks that have not been reached are left as they are and removed later
+    return [instr for instr in optimized if instr is not None]
+
+
+# Rewrites an instruction using the constant values of the variables in the state and
+# updates the state by the effects of the instruction. Returns the new instruction or
+# None if the instruction can be removed (a conditional jump never taken)
+def rewrite_instruction(instr, state, labels):
+    op_id = instr.op_id
+    if op_id in FRAME_CHANGES:
+        # the LF and TF variables are not the same anymore
+        for key in [key for key in state if key[0] != GF]:
+            del state[key]
+        return instr
+
+    # replace the constant variables read by the instruction by their values
+    args = instr.args
+    if state:
+        replaced = None
+        for index in SYMBOL_OPERANDS[op_id]:
+            arg = args[index]
+            if arg.type == 'var':
+                literal = state.get((arg.frame, arg.name))
+                if literal is not None:
+                    if replaced is None:
+                        replaced = list(args)
+                    replaced[index] = literal
+        if replaced is not None:
+            args = tuple(replaced)
+            instr = Instruction(op_id, args)
+
+    if op_id == JUMPIFEQ or op_id == JUMPIFNEQ:
+        return fold_conditional_jump(instr, labels)
+    if not WRITES_VARIABLE[op_id]:
+        return instr
+
+    # the instruction writes its first operand
+    dst = var_key(args[0])
+    state.pop(dst, None)
+    if op_id == MOVE:
+        if args[1].type != 'var':
+            state[dst] = args[1]
+    elif all(arg.type != 'var' for arg in args[1:]):
+        result = fold_operation(instr.opcode, args[1:])
+        if result is not None:
+            # the result is written just like by MOVE, which checks the destination first
+            # and so fails the same way as the original instruction
+            literal = Symbol(*result)
+            state[dst] = literal
+            return Instruction(MOVE, (args[0], literal))
+    return instr
+
+
+# Folds a conditional jump with constant operands into a JUMP or removes it. The jump has
+# to be kept if the comparison fails or if its label is undefined
+def fold_conditional_jump(instr, labels):
+    label, op1, op2 = instr.args
+    if op1.type == 'var' or op2.type == 'var' or label.name not in labels:
+        return instr
+    result = fold_operation('EQ', (op1, op2))
+    if result is None:
+        return instr
+    if result[1] == (instr.op_id == JUMPIFEQ):
+        return Instruction(JUMP, (label,))
+    return None
+
+
+# Evaluates an operation with constant operands and returns the (type, value) of the
+# result, or None if the operation would fail at runtime or cannot be evaluated here
+def fold_operation(opcode, operands):
+    folding = FOLDINGS.get(opcode)
+    if folding is None:
+        return None
+    return folding(*operands)
+
+
+# This class implements the evaluation of the operations with constant operands. Each
+# method takes the literal operands and returns the (type, value) of the result, or None
+# if the operation cannot be evaluated here
+class Folding:
+
+    @staticmethod
+    def fold_add(a, b):
+        if a.type == b.type and a.type in (INT, FLOAT):
+            return a.type, a.value + b.value
+
+    @staticmethod
+    def fold_sub(a, b):
+        if a.type == b.type and a.type in (INT, FLOAT):
+            return a.type, a.value - b.value
+
+    @staticmethod
+    def fold_mul(a, b):
+        if a.type == b.type and a.type in (INT, FLOAT):
+            return a.type, a.value * b.value
+
+    @staticmethod
+    def fold_idiv(a, b):
+        if a.type == b.type == INT and b.value != 0:
+            return INT, a.value // b.value
+
+    @staticmethod
+    def fold_div(a, b):
+        if a.type == b.type == FLOAT and b.value != 0:
+            return FLOAT, a.value / b.value
+
+    @staticmethod
+    def fold_lt(a, b):
+        if a.type == b.type and a.type != NIL:
+            return BOOL, a.value < b.value
+
+    @staticmethod
+    def fold_gt(a, b):
+        if a.type == b.type and a.type != NIL:
+            return BOOL, a.value > b.value
+
+    @staticmethod
+    def fold_eq(a, b):
+        if a.type == b.type:
+            return BOOL, a.value == b.value
+        if a.type == NIL or b.type == NIL:
+            return BOOL, False
+
+    @staticmethod
+    def fold_and(a, b):
+        if a.type == b.type == BOOL:
+            return BOOL, a.value and b.value
+
+    @staticmethod
+    def fold_or(a, b):
+        if a.type == b.type == BOOL:
+            return BOOL, a.value or b.value
+
+    @staticmethod
+    def fold_not(a):
+        if a.type == BOOL:
+            return BOOL, not a.value
+
+    @staticmethod
+    def fold_concat(a, b):
+        if a.type == b.type == STRING:
+            return STRING, a.value + b.value
+
+    @staticmethod
+    def fold_strlen(a):
+        if a.type == STRING:
+            return INT, len(a.value)
+
+    @staticmethod
+    def fold_type(a):
+        return STRING, TYPE_NAMES[a.type]
+
+    @staticmethod
+    def fold_int2float(a):
+        if a.type == INT and abs(a.value) < 2 ** 53:
+            return FLOAT, float(a.value)
+
+
+# the evaluation of each foldable operation
+FOLDINGS = {
+    'ADD': Folding.fold_add,
+    'SUB': Folding.fold_sub,
+    'MUL': Folding.fold_mul,
+    'IDIV': Folding.fold_idiv,
+    'DIV': Folding.fold_div,
+    'LT': Folding.fold_lt,
+    'GT': Folding.fold_gt,
+    'EQ': Folding.fold_eq,
+    'AND': Folding.fold_and,
+    'OR': Folding.fold_or,
+    'NOT': Folding.fold_not,
+    'CONCAT': Folding.fold_concat,
+    'STRLEN': Folding.fold_strlen,
+    'TYPE': Folding.fold_type,
+    'INT2FLOAT': Folding.fold_int2float,
+}
+
+
+# Removes the basic blocks that cannot be reached from the entry block
+def remove_unreachable_code(program):
+    if not program:
+        return program
+    starts, successors = build_flow_graph(program)
+    reachable = [False] * len(successors)
+    reachable[0] = True
+    pending = [0]
+    while pending:
+        for successor, __ in successors[pending.pop()]:
+            if not reachable[successor]:
+                reachable[successor] = True
+                pending.append(successor)
+
+    if all(reachable):
+        return program
+    return [program[pos] for block, start in enumerate(starts[:-1]) if reachable[block]
+            for pos in range(start, starts[block + 1])]
+
+
+# Removes the JUMPs to a label right behind them
+def remove_jumps_to_next(program):
+    return [instr for pos, instr in enumerate(program) if instr.op_id != JUMP or
+            pos + 1 == len(program) or program[pos + 1].op_id != LABEL or
+            program[pos + 1].args[0].name != instr.args[0].name]
+
+
+# Removes the labels no instruction refers to. The loader has already rejected the
+# programs defining a label more than once
+def remove_unused_labels(program):
+    used = set()
+    for instr in program:
+        if instr.op_id != LABEL:
+            used.update(arg.name for arg in instr.args if arg.type == 'label')
+    return [instr for instr in program if instr.op_id != LABEL or
+            instr.args[0].name in used]
+
+
+# the maximum number of instructions of a function inlined at its call sites
+MAX_INLINED_BODY = 16
+
+# the number of times the inlining is repeated at most, a function calling only inlined
+# functions can be inlined in the next round
+INLINING_ROUNDS = 4
+
+
+# Replaces the calls of small functions by copies of their bodies. Only the functions
+# running straight from their label to a RETURN are inlined - without any labels, jumps
+# or calls in between - so they are not recursive and their copies do not redefine any
+# labels. The body works with the frames just like when it is called, CALL and RETURN
+# only push and pop the return address. The number of inlined calls is added to the
+# report
+def inline_calls(program, report):
+    inlined = 0
+    for __ in range(INLINING_ROUNDS):
+        program, count = inline_leaf_calls(program)
+        inlined += count
+        if not count:
+            break
+    report['inlined calls'] = report.get('inlined calls', 0) + inlined
+    return program
+
+
+# A single round of the inlining, returns the program and the number of inlined calls
+def inline_leaf_calls(program):
+    bodies = {}
+    for pos, instr in enumerate(program):
+        if instr.op_id != LABEL:
+            continue
+        body = function_body(program, pos + 1)
+        if body is not None:
+            bodies[instr.args[0].name] = body
+
+    optimized = []
+    inlined = 0
+    for instr in program:
+        if instr.op_id == CALL:
+            name = instr.args[0].name
+            if name in bodies:
+                # every copy is a new instruction, so that it is linked on its own
+                optimized += [Instruction(body_instr.op_id, body_instr.args)
+                              for body_instr in bodies[name]]
+                inlined += 1
+                continue
+        optimized.append(instr)
+
+    return (optimized if inlined else program), inlined
+
+
+# Returns the instructions of a function starting at the position up to its RETURN, or
+# None if the function cannot be inlined
+def function_body(program, start):
+    for pos in range(start, min(start + MAX_INLINED_BODY + 1, len(program))):
+        op_id = program[pos].op_id
+        if op_id == RETURN:
+            return program[start:pos]
+        if op_id == LABEL or op_id in CONTROL:
+            return None
+    return None
+
+
+# Replaces the calls followed by a return of the caller by tail calls:
+#
+#   CALL f; RETURN             ->   TAILCALL f
+#   CALL f; POPFRAME; RETURN   ->   TAILCALL_POPFRAME f; POPFRAME; RETURN
+#
+# TAILCALL jumps to f without pushing a return address, so f returns straight to the
+# return address of the caller. The return address pushed by CALL would only lead to
+# the RETURN, which returns there anyway. TAILCALL_POPFRAME keeps the POPFRAME and RETURN
+# to return to, but when the caller has been called by the same sequence, it drops its
+# LF and reuses the return address of the caller (see operations.py). Nothing may read
+# the dropped LF, so this is only done if the whole program follows the calling
+# convention checked by follows_frame_convention. Either way, deep tail recursion runs in
+# a constant space. The number of the tail calls is added to the report
+def eliminate_tail_calls(program, report):
+    frames = follows_frame_convention(program)
+    optimized = []
+    eliminated = 0
+    pos = 0
+    while pos < len(program):
+        instr = program[pos]
+        following = [next_instr.op_id for next_instr in program[pos + 1:pos + 3]]
+        if instr.op_id == CALL and following[:1] == [RETURN]:
+            # nothing else reaches the RETURN, there is no label before it
+            optimized.append(Instruction(TAILCALL, instr.args))
+            eliminated += 1
+            pos += 2
+            continue
+        if instr.op_id == CALL and frames and following == [POPFRAME, RETURN]:
+            instr = Instruction(TAILCALL_POPFRAME, instr.args)
+            eliminated += 1
+        optimized.append(instr)
+        pos += 1
+
+    report['eliminated tail calls'] = report.get('eliminated tail calls', 0) + eliminated
+    return optimized if eliminated else program
+
+
+# Returns whether the LFs of a program are pushed and popped together with the return
+# addresses - every called function is entered only by CALL and starts by PUSHFRAME,
+# and every RETURN follows a POPFRAME and the other way round. The only other frames
+# allowed are the ones pushed and popped again by a sequence without any labels or jumps
+# in between, like an inlined function. Every LF below the current one is then only
+# popped by the RETURN to the CALL that has pushed it with the current one
+def follows_frame_convention(program):
+    labels = label_positions(program)
+    called = set()
+    jumped = set()
+    for instr in program:
+        if instr.op_id != LABEL:
+            targets = called if instr.op_id == CALL else jumped
+            targets.update(arg.name for arg in instr.args if arg.type == 'label')
+
+    entries = set()
+    for name in called:
+        pos = labels.get(name)
+        if pos is None or name in jumped:
+            return False
+        # the function can neither be entered by falling through its label
+        if pos == 0 or program[pos - 1].op_id not in (JUMP, RETURN, EXIT):
+            return False
+        if pos + 1 == len(program) or program[pos + 1].op_id != PUSHFRAME:
+            return False
+        entries.add(pos + 1)
+
+    inlined = False # inside a frame pushed by a sequence
+    for pos, instr in enumerate(program):
+        op_id = instr.op_id
+        returns = pos + 1 < len(program) and program[pos + 1].op_id == RETURN
+        if inlined:
+            if op_id == POPFRAME and not returns:
+                inlined = False
+            elif op_id in (LABEL, PUSHFRAME, POPFRAME, CREATEFRAME_PUSHFRAME) or \
+                    op_id in CONTROL:
+                return False
+        elif op_id == CREATEFRAME_PUSHFRAME or (op_id == PUSHFRAME and pos not in entries):
+            inlined = True
+        elif op_id == POPFRAME and not returns:
+            return False
+        elif op_id == RETURN and (pos == 0 or program[pos - 1].op_id != POPFRAME):
+            return False
+    return not inlined
+
+
+# the types of the results of the instructions writing a variable. The result of MOVE is
+# the type of its source, the result of ADD, SUB and MUL is the type of their operands
+RESULT_TYPES = {OPCODE_IDS[opcode]: tag for opcodes, tag in (
+    (('IDIV', 'STRI2INT', 'FLOAT2INT', 'STRLEN'), INT),
+    (('DIV', 'INT2FLOAT'), FLOAT),
+    (('INT2CHAR', 'CONCAT', 'GETCHAR', 'SETCHAR', 'TYPE'), STRING),
+    (('LT', 'GT', 'EQ', 'AND', 'OR', 'NOT', 'LT_JUMPIF', 'LT_JUMPIFNOT', 'GT_JUMPIF',
+      'GT_JUMPIFNOT', 'EQ_JUMPIF', 'EQ_JUMPIFNOT'), BOOL))
+    for opcode in opcodes}
+SAME_TYPES = {OPCODE_IDS[opcode] for opcode in ('MOVE', 'DEFVAR_MOVE', 'ADD', 'SUB', 'MUL')}
+DEFVAR_MOVE = OPCODE_IDS['DEFVAR_MOVE']
+
+
+# Infers the types of the variables at every instruction of a program, the program may
+# be already linked. Returns a list with the proven types of the operands of every
+# instruction - a tuple with the type tag of every variable operand known to hold a value
+# of that type when the instruction is executed and None for the other operands - or
+# None for the instructions that cannot be reached. A variable only has a proven type
+# if it has been written on all the paths to the instruction, so reading it can raise
+# neither error 53 nor error 56 and its type does not have to be checked
+def infer_types(program):
+    proven = [None] * len(program)
+    if not program:
+        return proven
+    starts, successors = build_flow_graph(program)
+    entry_states = [None] * len(successors)
+    entry_states[0] = {}
+
+    pending = [0]
+    while pending:
+        block = pending.pop()
+        state = dict(entry_states[block])
+        for pos in range(starts[block], starts[block + 1]):
+            proven[pos] = infer_instruction(program[pos], state)
+
+        for successor, reset in successors[block]:
+            incoming = {} if reset else state
+            known = entry_states[successor]
+            if known is None:
+                merged = dict(incoming)
+            else:
+                merged = {key: tag for key, tag in known.items()
+                          if incoming.get(key) == tag}
+            if known is None or len(merged) != len(known):
+                entry_states[successor] = merged
+                pending.append(successor)
+    return proven
+
+
+# Returns the proven types of the operands of an instruction and updates the state (the
+# types of the variables) by the effects of the instruction. The instructions that fail
+# end the program, so the state after an instruction assumes it has succeeded
+def infer_instruction(instr, state):
+    op_id = instr.op_id
+    args = instr.args
+    if op_id == DEFVAR_MOVE: # the variable is defined before the source is read
+        state.pop(var_key(args[0]), None)
+    types = tuple(state.get(var_key(arg)) if arg.type == 'var' else None for arg in args)
+
+    if op_id in FRAME_CHANGES:
+        # the LF and TF variables are not the same anymore
+        for key in [key for key in state if key[0] != GF]:
+            del state[key]
+    elif op_id == DEFVAR:
+        state.pop(var_key(args[0]), None)
+    elif WRITES_VARIABLE[op_id] or op_id in RESULT_TYPES or op_id == DEFVAR_MOVE:
+        dst = var_key(args[0])
+        tag = RESULT_TYPES.get(op_id)
+        if op_id in SAME_TYPES:
+            # the type of the source, the operands of the arithmetic have the same type
+            tag = next((arg.type if arg.type != 'var' else types[index]
+                        for index, arg in enumerate(args) if index > 0 and
+                        (arg.type != 'var' or types[index] is not None)), None)
+        if tag is None:
+            state.pop(dst, None)
+        else:
+            state[dst] = tag
+    return types
@@ -0,0 +1,240 @@
+##
+# @file   program.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module compiles the validated xml program into a compact list of
+#         pre-decoded instructions that is then executed by the Processor
+
+import sys
+
+from values import TYPE_TAGS
+
+# All the opcodes of IPPcode20 (including the STACK and FLOAT extensions). The index of
+# an opcode in this tuple is used as its numeric id
+OPCODES = (
+    'CREATEFRAME', 'PUSHFRAME', 'POPFRAME', 'DEFVAR', 'MOVE', 'CALL', 'RETURN',
+    'PUSHS', 'POPS', 'CLEARS',
+    'ADD', 'ADDS', 'SUB', 'SUBS', 'MUL', 'MULS', 'IDIV', 'IDIVS', 'DIV', 'DIVS',
+    'LT', 'LTS', 'GT', 'GTS', 'EQ', 'EQS', 'AND', 'ANDS', 'OR', 'ORS', 'NOT', 'NOTS',
+    'INT2CHAR', 'INT2CHARS', 'STRI2INT', 'STRI2INTS', 'INT2FLOAT', 'FLOAT2INT',
+    'INT2FLOATS', 'FLOAT2INTS',
+    'READ', 'WRITE',
+    'CONCAT', 'STRLEN', 'GETCHAR', 'SETCHAR',
+    'TYPE',
+    'LABEL', 'JUMP', 'JUMPIFEQ', 'JUMPIFEQS', 'JUMPIFNEQ', 'JUMPIFNEQS', 'EXIT',
+    'DPRINT', 'BREAK',
+    # the superinstructions replacing common sequences of instructions (see optimizer.py),
+    # they cannot appear in the source
+    'LT_JUMPIF', 'LT_JUMPIFNOT', 'GT_JUMPIF', 'GT_JUMPIFNOT', 'EQ_JUMPIF', 'EQ_JUMPIFNOT',
+    'DEFVAR_MOVE', 'CREATEFRAME_PUSHFRAME', 'TAILCALL', 'TAILCALL_POPFRAME',
+)
+OPCODE_IDS = {opcode: op_id for op_id, opcode in enumerate(OPCODES)}
+
+# the opcodes the errors of the fused relation jumps are reported with, the jump itself
+# cannot fail (see optimizer.fuse_superinstructions)
+SOURCE_OPCODES = {relation + suffix: relation for relation in ('LT', 'GT', 'EQ')
+                  for suffix in ('_JUMPIF', '_JUMPIFNOT')}
+
+# the instructions that may transfer the control elsewhere
+CONTROL_OPCODES = ('CALL', 'RETURN', 'JUMP', 'JUMPIFEQ', 'JUMPIFEQS', 'JUMPIFNEQ',
+    'JUMPIFNEQS', 'EXIT', 'LT_JUMPIF', 'LT_JUMPIFNOT', 'GT_JUMPIF', 'GT_JUMPIFNOT',
+    'EQ_JUMPIF', 'EQ_JUMPIFNOT', 'TAILCALL', 'TAILCALL_POPFRAME')
+
+# frame kinds of the variables
+GF, LF, TF = 0, 1, 2
+FRAME_NAMES = ('GF', 'LF', 'TF')
+
+
+# A single instruction argument - a literal or a type. The type of a literal is its type
+# tag and its value is already converted to its python representation (see values.py),
+# the value of a type is the tag of the type
+class Symbol:
+    __slots__ = ('type', 'value')
+
+    def __init__(self, symbol_type, value):
+        self.type = symbol_type
+        self.value = value
+
+
+# A variable argument resolved to its frame kind and an interned name, so that nothing
+# has to be parsed when the variable is accessed. The slot is the index of the variable
+# in the frame with the given layout (see frames.py)
+class Variable:
+    __slots__ = ('frame', 'name', 'slot', 'layout')
+    type = 'var'
+
+    def __init__(self, frame, name):
+        self.frame = frame
+        self.name = sys.intern(name)
+        self.slot = None
+        self.layout = None
+
+
+# A label argument. The target is the index of the LABEL instruction defining the label,
+# or None if the label is undefined
+class Label:
+    __slots__ = ('name', 'target')
+    type = 'label'
+
+    def __init__(self, name):
+        self.name = name
+        self.target = None
+
+
+# A single decoded instruction of the program. The order is the index of the instruction
+# in the program and the handler is the function executing it (see execute.py)
+class Instruction:
+    __slots__ = ('op_id', 'args', 'layout', 'order', 'handler')
+
+    def __init__(self, op_id, args):
+        self.op_id = op_id
+        self.args = args
+        self.layout = None # the layout of the frames created by CREATEFRAME
+        self.order = None
+        self.handler = None
+
+    @property
+    def opcode(self):
+        return OPCODES[self.op_id]
+
+
+# A basic block - a sequence of instructions that is always executed from the beginning
+# to the end. Only the last instruction of a block may transfer the control elsewhere,
+# otherwise the execution continues with the block starting at the index end
+class Block:
+    __slots__ = ('instructions', 'end')
+
+    def __init__(self, instructions, end):
+        self.instructions = instructions
+        self.end = end
+
+
+# Converts a checked instruction (see xml_checker.check_instruction) into an Instruction.
+# Identical arguments are shared among the instructions through the symbols dictionary,
+# so that the compiled program stays small even for very long inputs
+def compile_instruction(opcode, operands, symbols):
+    args = []
+    for operand in operands:
+        key = operand
+        if operand[0] == 'float':
+            key = ('float', operand[1].hex()) # 0.0 and -0.0 are equal, but not the same
+        symbol = symbols.get(key)
+        if symbol is None:
+            if operand[0] == 'var':
+                frame, name = operand[1].split('@', 1)
+                symbol = Variable(FRAME_NAMES.index(frame), name)
+            elif operand[0] == 'label':
+                symbol = Label(operand[1])
+            elif operand[0] == 'type':
+                symbol = Symbol('type', TYPE_TAGS[operand[1]])
+            else:
+                symbol = Symbol(TYPE_TAGS[operand[0]], operand[1])
+            symbols[key] = symbol
+        args.append(symbol)
+
+    return Instruction(OPCODE_IDS[opcode], tuple(args))
+
+
+# Prepares a compiled program for the execution - numbers the instructions, resolves the
+# label targets and precomputes the frame layouts. Returns the layout of the global frame
+def link_program(program):
+    labels = {}
+    for order, instr in enumerate(program):
+        instr.order = order
+        if instr.op_id == OPCODE_IDS['LABEL']:
+            labels[instr.args[0].name] = order
+
+    for instr in program:
+        for arg in instr.args:
+            if arg.type == 'label':
+                arg.target = labels.get(arg.name)
+
+    assign_frame_layouts(program)
+    return assign_global_slots(program)
+
+
+# Assigns a fixed slot to every variable of the global frame and returns the layout of
+# the global frame
+def assign_global_slots(program):
+    layout = {}
+    for instr in program:
+        for arg in instr.args:
+            if arg.type == 'var' and arg.frame == GF:
+                arg.slot = layout.setdefault(arg.name, len(layout))
+                arg.layout = layout
+    return layout
+
+
+# The longest stretch of code searched for the variables of a new frame
+LAYOUT_SCAN_LIMIT = 256
+
+
+# Precomputes the layout of the frames created by each CREATEFRAME instruction from the
+# DEFVARs that follow it - first the TF variables, then the LF variables defined after
+# the frame is pushed (possibly at the beginning of a called function). Variables defined
+# elsewhere are added to the frame at runtime, so the layout does not have to be complete.
+# Equal layouts are shared, so that the variables can cache their slots across frames
+def assign_frame_layouts(program):
+    layouts = {}
+    for ip, instr in enumerate(program):
+        if instr.opcode not in ('CREATEFRAME', 'CREATEFRAME_PUSHFRAME'):
+            continue
+
+        names = []
+        # the new frame is a TF until it is pushed
+        frame = LF if instr.opcode == 'CREATEFRAME_PUSHFRAME' else TF
+        followed_call = False
+        pos = ip + 1
+        end = min(pos + LAYOUT_SCAN_LIMIT, len(program))
+        while pos < end:
+            opcode = program[pos].opcode
+            if opcode in ('DEFVAR', 'DEFVAR_MOVE'):
+                var = program[pos].args[0]
+                if var.frame == frame and var.name not in names:
+                    names.append(var.name)
+            elif opcode == 'PUSHFRAME' and frame == TF:
+                frame = LF
+            elif opcode in ('CALL', 'TAILCALL', 'TAILCALL_POPFRAME') and not followed_call:
+                # continue in the called function
+                pos = program[pos].args[0].target
+                if pos is None:
+                    break
+                followed_call = True
+                end = min(pos + LAYOUT_SCAN_LIMIT, len(program))
+            elif opcode in ('CREATEFRAME', 'PUSHFRAME', 'POPFRAME', 'CALL', 'RETURN',
+                    'JUMP', 'EXIT', 'CREATEFRAME_PUSHFRAME', 'TAILCALL',
+                    'TAILCALL_POPFRAME'):
+                break
+            pos += 1
+
+        key = tuple(names)
+        if key not in layouts:
+            layouts[key] = {name: slot for slot, name in enumerate(names)}
+        instr.layout = layouts[key]
+
+
+# Splits a linked program into basic blocks. The returned list is indexed by the position
+# of the first instruction of each block, the other items are None. LABELs do nothing,
+# so they are left out of the blocks
+def split_blocks(program):
+    control = {OPCODE_IDS[opcode] for opcode in CONTROL_OPCODES}
+    label = OPCODE_IDS['LABEL']
+
+    blocks = [None] * (len(program) + 1)
+    start = 0
+    instructions = []
+    for order, instr in enumerate(program):
+        if instr.op_id == label and order != start:
+            # a label starts a new block
+            blocks[start] = Block(instructions, order)
+            start = order; instructions = []
+
+        if instr.op_id != label:
+            instructions.append(instr)
+
+        if instr.op_id in control:
+            # a jump ends the current block
+            blocks[start] = Block(instructions, order + 1)
+            start = order + 1; instructions = []
+
+    blocks[start] = Block(instructions, len(program))
+    return blocks
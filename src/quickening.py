@@ -0,0 +1,221 @@
+##
+# @file   quickening.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements the runtime specialisation (quickening) of the
+#         arithmetic, relation and conditional jump instructions, used by the adaptive
+#         and tracing engines
+
+from execute import Processor, handler_table
+from program import GF, LF, OPCODE_IDS
+from frames import UNDEFINED
+from values import INT, FLOAT, STRING, BOOL, NIL
+
+# the number of executions with the same operand types after which an instruction is
+# specialised, the number doubles every time the specialisation has to be undone
+WARMUP = 8
+
+# the number of times an instruction may lose its specialisation before it is left with
+# its generic handler for good
+MAX_DEOPTIMIZATIONS = 4
+
+# the operand types each instruction can be specialised for, both operands have to be of
+# the same type
+SPECIALIZABLE = {OPCODE_IDS[opcode]: tags for opcodes, tags in (
+    (('ADD', 'SUB', 'MUL'), {INT, FLOAT}),
+    (('LT', 'GT', 'LT_JUMPIF', 'LT_JUMPIFNOT', 'GT_JUMPIF', 'GT_JUMPIFNOT'),
+     {INT, FLOAT, STRING, BOOL}),
+    (('EQ', 'JUMPIFEQ', 'JUMPIFNEQ', 'EQ_JUMPIF', 'EQ_JUMPIFNOT'),
+     {INT, FLOAT, STRING, BOOL, NIL}))
+    for opcode in opcodes}
+
+# the python expressions computing the results of the specialised instructions
+EXPRESSIONS = {OPCODE_IDS[opcode]: expression for opcode, expression in (
+    ('ADD', '{} + {}'), ('SUB', '{} - {}'), ('MUL', '{} * {}'),
+    ('LT', '{} < {}'), ('GT', '{} > {}'), ('EQ', '{} == {}'),
+    ('JUMPIFEQ', '{} == {}'), ('JUMPIFNEQ', '{} != {}'),
+    ('LT_JUMPIF', '{} < {}'), ('LT_JUMPIFNOT', '{} < {}'),
+    ('GT_JUMPIF', '{} > {}'), ('GT_JUMPIFNOT', '{} > {}'),
+    ('EQ_JUMPIF', '{} == {}'), ('EQ_JUMPIFNOT', '{} == {}'))}
+
+ARITHMETIC = {OPCODE_IDS['ADD'], OPCODE_IDS['SUB'], OPCODE_IDS['MUL']}
+CONDITIONAL_JUMPS = {OPCODE_IDS['JUMPIFEQ'], OPCODE_IDS['JUMPIFNEQ']}
+
+# the relations fused with a conditional jump (see optimizer.py) and the results on
+# which they jump
+RELATION_JUMPS = {OPCODE_IDS[relation + suffix]: jump_if
+                  for relation in ('LT', 'GT', 'EQ')
+                  for suffix, jump_if in (('_JUMPIF', True), ('_JUMPIFNOT', False))}
+
+# the kinds of the operands of a specialised instruction
+LITERAL = 'literal'
+LABEL = 'label'
+FRAME_KINDS = {GF: 'GF', LF: 'LF'} # and TF for anything else
+
+# the names of the type tags in the generated code
+TAG_NAMES = ('INT', 'FLOAT', 'STRING', 'BOOL', 'NIL')
+
+# the generated handler factories, shared by all the instructions with the same opcode,
+# operand types and operand kinds
+factories = {}
+
+
+# This processor executes the program just like the reference Processor, but the
+# instructions whose operand types are proven get check-free handlers and the ones
+# whose operands keep the same types get specialised handlers while the program runs
+class AdaptiveProcessor(Processor):
+    def __init__(self, program, input_file, output):
+        super().__init__(program, input_file, output)
+        self.select_proven_handlers()
+
+    def execute_program(self):
+        quicken_program(self.program)
+        super().execute_program()
+
+
+# Replaces the handlers of the instructions that can be specialised by adaptive ones,
+# the instructions that already have check-free handlers are left alone
+def quicken_program(program):
+    for instr in program:
+        if instr.op_id in SPECIALIZABLE and instr.handler is handler_table[instr.op_id]:
+            instr.handler = make_adaptive(instr, instr.handler, WARMUP, 0)
+
+
+# Returns the type of a symbol without reading or checking anything else, or None if the
+# symbol cannot be read. A defined but uninitialized variable has the type None as well
+def peek_type(data, symbol):
+    if symbol.type != 'var':
+        return symbol.type
+    if symbol.frame == GF:
+        return data.global_frame.types[symbol.slot]
+
+    frame = data.lf if symbol.frame == LF else data.tf
+    if frame is None:
+        return None
+    slot = frame.layout.get(symbol.name)
+    return None if slot is None else frame.types[slot]
+
+
+# Returns the adaptive handler of an instruction. The handler executes the instruction by
+# its generic handler and watches the types of its operands. Once the types have been the
+# same for the given number of executions, the instruction gets a specialised handler
+def make_adaptive(instr, generic, warmup, deoptimizations):
+    args = instr.args
+    tags = SPECIALIZABLE[instr.op_id]
+    observed = None
+    count = 0
+
+    # called by the specialised handler when its guard fails
+    def deoptimize(data):
+        if deoptimizations < MAX_DEOPTIMIZATIONS:
+            instr.handler = make_adaptive(instr, generic, warmup * 2, deoptimizations + 1)
+        else:
+            instr.handler = generic
+        return generic(data)
+
+    def adaptive(data):
+        nonlocal observed, count
+        op1_type = peek_type(data, args[1])
+        if op1_type not in tags or op1_type != peek_type(data, args[2]):
+            observed = None
+        elif op1_type != observed:
+            observed = op1_type
+            count = 1
+        else:
+            count += 1
+            if count >= warmup:
+                instr.handler = specialize(data, instr, observed, deoptimize) or generic
+        return generic(data)
+    return adaptive
+
+
+# Returns the specialised handler of an instruction for the given type of its operands,
+# or None if the instruction cannot be specialised. The variables of the LF and TF are
+# bound to their slots in the current frames, the handler only stays valid as long as
+# the frames have the same layouts
+def specialize(data, instr, tag, fallback):
+    kinds = []
+    params = []
+    for arg in instr.args:
+        if arg.type == 'label':
+            if arg.target is None:
+                return None # the generic handler reports the undefined label
+            kinds.append(LABEL)
+            params.append(arg.target)
+        elif arg.type != 'var':
+            kinds.append(LITERAL)
+            params.append(arg.value)
+        elif arg.frame == GF:
+            kinds.append('GF')
+            params.append(arg.slot)
+        else:
+            frame = data.lf if arg.frame == LF else data.tf
+            slot = None if frame is None else frame.layout.get(arg.name)
+            if slot is None:
+                return None
+            kinds.append(FRAME_KINDS.get(arg.frame, 'TF'))
+            params += [frame.layout, slot]
+
+    key = (instr.op_id, tag, tuple(kinds))
+    factory = factories.get(key)
+    if factory is None:
+        factory = factories[key] = generate_factory(*key)
+    return factory(data, fallback, *params)
+
+
+# Generates the factory of the specialised handlers of an instruction. The handler checks
+# that the variables exist and hold the expected types and executes the operation
+# directly in the frame slots, anything else is left to the fallback
+def generate_factory(op_id, tag, kinds):
+    params = []
+    lines = []
+    guards = []
+    types = []
+    values = []
+    for n, kind in enumerate(kinds):
+        if kind == LITERAL or kind == LABEL:
+            params.append(f'c{n}')
+            types.append(None); values.append(f'c{n}')
+            continue
+
+        if kind == 'GF':
+            params.append(f's{n}')
+            types.append(f'gt[s{n}]'); values.append(f'gv[s{n}]')
+        else:
+            params += [f'l{n}', f's{n}']
+            lines.append(f'f{n} = data.{kind.lower()}')
+            guards += [f'f{n} is not None', f'f{n}.layout is l{n}']
+            types.append(f'f{n}.types[s{n}]'); values.append(f'f{n}.values[s{n}]')
+
+        # the first operand is the destination, the other ones are read
+        if n == 0:
+            guards.append(f'{types[n]} is not UNDEFINED')
+        else:
+            guards.append(f'{types[n]} == {TAG_NAMES[tag]}')
+
+    expression = EXPRESSIONS[op_id].format(values[1], values[2])
+    if op_id in CONDITIONAL_JUMPS:
+        body = [f'if {expression}:', '    data.ip = c0', '    return True', 'return False']
+    elif op_id in RELATION_JUMPS:
+        # the result is written to the destination before the jump
+        body = [f'result = {expression}', f'{types[0]} = BOOL', f'{values[0]} = result',
+                f'if {"" if RELATION_JUMPS[op_id] else "not "}result:',
+                '    data.ip = c3', '    return True', 'return False']
+    else:
+        result_tag = tag if op_id in ARITHMETIC else BOOL
+        body = [f'{types[0]} = {TAG_NAMES[result_tag]}', f'{values[0]} = {expression}',
+                'return']
+
+    source = [f'def make(data, fallback, {", ".join(params)}):',
+              '    gt = data.global_frame.types',
+              '    gv = data.global_frame.values',
+              '    def run(data):']
+    source += ['        ' + line for line in lines]
+    source.append(f'        if {" and ".join(guards) if guards else "True"}:')
+    source += ['            ' + line for line in body]
+    source.append('        return fallback(data)')
+    source.append('    return run')
+
+    namespace = {'UNDEFINED': UNDEFINED, 'INT': INT, 'FLOAT': FLOAT, 'STRING': STRING,
+                 'BOOL': BOOL, 'NIL': NIL}
+    exec(compile('\n'.join(source), '<quickening>', 'exec'), namespace)
+    return namespace['make']
@@ -0,0 +1,202 @@
+##
+# @file   streams.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements the input and output streams of the interpreted program
+
+import codecs
+import io
+import locale
+import mmap
+import os
+import queue
+import stat
+import sys
+import threading
+
+# the default number of buffered bytes that makes the output sink flush
+DEFAULT_FLUSH_LIMIT = 64 * 1024
+
+
+# Collects the output of the program as encoded chunks and writes them to the target
+# binary stream in large blocks once there are at least limit bytes buffered. A limit
+# of 0 makes every write go straight to the target
+class OutputSink:
+    __slots__ = ('target', 'encoding', 'errors', 'limit', 'chunks', 'size')
+
+    def __init__(self, target, encoding='utf-8', errors='strict',
+            limit=DEFAULT_FLUSH_LIMIT):
+        self.target = target
+        self.encoding = encoding
+        self.errors = errors
+        self.limit = limit
+        self.chunks = []
+        self.size = 0
+
+    def write(self, text):
+        chunk = text.encode(self.encoding, self.errors)
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.size >= self.limit:
+            self.flush()
+
+    def flush(self):
+        if self.chunks:
+            self.target.write(b''.join(self.chunks))
+            self.chunks.clear()
+            self.size = 0
+        self.target.flush()
+
+
+# Returns an output sink writing to the standard output. An interactive terminal gets
+# every write immediately unless the limit is given explicitly
+def stdout_sink(limit=None):
+    if limit == None:
+        limit = 0 if sys.stdout.isatty() else DEFAULT_FLUSH_LIMIT
+    sys.stdout.flush() # anything printed so far goes first
+    return OutputSink(sys.stdout.buffer, sys.stdout.encoding, sys.stdout.errors, limit)
+
+
+# The input of the program read from a text file object, e.g. the standard input
+class TextInput:
+    __slots__ = ('file',)
+
+    def __init__(self, file):
+        self.file = file
+
+    # Returns the next line of the input without the newline, or None at the end of
+    # the input
+    def read_line(self):
+        line = self.file.readline()
+        if line == '':
+            return None
+        return line[:-1] if line[-1] == '\n' else line
+
+
+# the size of the blocks read by ReadAheadInput and the maximum number of blocks of lines
+# it keeps ahead of the program
+READ_AHEAD_BLOCK_SIZE = 64 * 1024
+READ_AHEAD_BLOCKS = 64
+
+# whether the standard input turns '\r\n' and a lone '\r' into '\n' (see ReadAheadInput)
+STDIN_TRANSLATES_NEWLINES = sys.platform == 'win32'
+
+
+# The input of the program read from a text file object by a background thread. The
+# thread reads whatever input is available, decodes it and splits it into lines, and
+# keeps a bounded queue of these blocks of lines ahead of the program. READ then only
+# waits for the input if the queue is empty, so a slow producer of the input does not
+# block the execution while there are lines available
+class ReadAheadInput:
+    __slots__ = ('queue', 'lines', 'finished')
+
+    def __init__(self, file, limit=READ_AHEAD_BLOCKS):
+        self.queue = queue.Queue(limit)
+        self.lines = iter(()) # the remaining lines of the current block
+        self.finished = False # the end of the input has been reached
+        threading.Thread(target=self.read_ahead, args=(file,), daemon=True).start()
+
+    # The body of the background thread. The end of the input is marked by None and an
+    # error is passed to the program, which raises it on the next READ
+    def read_ahead(self, file):
+        try:
+            # the same newline translation as in the standard input, python only
+            # translates the newlines of the standard input on windows
+            decoder = io.IncrementalNewlineDecoder(
+                    codecs.getincrementaldecoder(file.encoding)(file.errors),
+                    STDIN_TRANSLATES_NEWLINES)
+            fd = file.fileno()
+            pending = '' # the beginning of an incomplete line
+            while True:
+                data = os.read(fd, READ_AHEAD_BLOCK_SIZE)
+                lines = (pending + decoder.decode(data, not data)).split('\n')
+                pending = lines.pop()
+                if not data:
+                    if pending:
+                        lines.append(pending)
+                    self.queue.put(lines)
+                    self.queue.put(None)
+                    return
+                if lines:
+                    self.queue.put(lines)
+        except Exception as e:
+            self.queue.put(e)
+
+    def read_line(self):
+        line = next(self.lines, None)
+        while line == None and not self.finished:
+            block = self.queue.get()
+            if block == None or isinstance(block, Exception):
+                self.finished = True
+                if block != None:
+                    raise block
+            else:
+                self.lines = iter(block)
+                line = next(self.lines, None)
+        return line
+
+
+# the size of the pieces of a mapped input file that are decoded at once
+INPUT_CHUNK_SIZE = 256 * 1024
+
+
+# The input of the program read from a memory mapped file. The file is decoded by large
+# chunks ending at a newline, which are split into lines at once, so a line is never
+# read and decoded on its own. Just like in a text file, '\r\n' and a lone '\r' end a
+# line too
+class MappedInput:
+    __slots__ = ('map', 'view', 'size', 'pos', 'encoding', 'lines')
+
+    def __init__(self, file_map, encoding):
+        self.map = file_map
+        self.view = memoryview(file_map)
+        self.size = len(file_map)
+        self.pos = 0 # the position of the next chunk
+        self.encoding = encoding
+        self.lines = iter(()) # the remaining lines of the current chunk
+
+    def read_line(self):
+        line = next(self.lines, None)
+        if line == None and self.read_chunk():
+            line = next(self.lines)
+        return line
+
+    # Splits the next chunk of the file into lines, returns False at the end of the file
+    def read_chunk(self):
+        pos = self.pos
+        if pos >= self.size:
+            return False
+
+        end = self.size
+        if pos + INPUT_CHUNK_SIZE < end:
+            # end the chunk after its last newline, or after the first newline behind
+            # it if the chunk is a part of a single long line
+            newline = self.map.rfind(b'\n', pos, pos + INPUT_CHUNK_SIZE)
+            if newline < 0:
+                newline = self.map.find(b'\n', pos + INPUT_CHUNK_SIZE)
+            if newline >= 0:
+                end = newline + 1
+
+        text = str(self.view[pos:end], self.encoding)
+        self.pos = end
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        lines = text.split('\n')
+        if lines[-1] == '':
+            lines.pop() # the chunk ends with a newline
+        self.lines = iter(lines)
+        return True
+
+
+# Opens the input file of the program. Regular files are memory mapped if their encoding
+# keeps the newlines as they are, anything else is read as a text file
+def open_input(path):
+    encoding = locale.getpreferredencoding(False)
+    file = open(path, 'rb')
+    if stat.S_ISREG(os.fstat(file.fileno()).st_mode) and '\n'.encode(encoding) == b'\n':
+        try:
+            file_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            file.close() # the mapping stays valid
+            return MappedInput(file_map, encoding)
+        except (OSError, ValueError):
+            pass # e.g. an empty file, which cannot be mapped
+    return TextInput(io.TextIOWrapper(file, encoding))
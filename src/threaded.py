@@ -0,0 +1,498 @@
+##
+# @file   threaded.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements an alternative execution engine, which compiles every
+#         instruction into a python closure with its operands already bound to it
+
+import operator
+
+from execute import Processor
+from operations import get_var_type_value, set_var_type_value, get_string_type_value
+from operations import get_proven_value, proven_result_tag, PROVEN_OPERATIONS
+from operations import PROVEN_RELATION_JUMPS
+from program import GF, SOURCE_OPCODES
+from frames import UNDEFINED, STRING_BUFFER
+from values import INT, FLOAT, STRING, BOOL, NIL, to_text
+
+
+# Returns a function returning the type and value of a symbol. If buffered is True, string
+# buffers are returned as they are (see get_string_type_value)
+def make_getter(data, symbol, buffered=False):
+    if symbol.type != 'var':
+        const = (symbol.type, symbol.value)
+        return lambda: const
+
+    get_var = get_string_type_value if buffered else get_var_type_value
+    if symbol.frame != GF:
+        return lambda: get_var(data, symbol)
+
+    # the slots of the GF variables are fixed, so they can be accessed directly
+    types = data.global_frame.types; values = data.global_frame.values
+    slot = symbol.slot
+    def get_global():
+        var_type = types[slot]
+        if var_type is UNDEFINED or var_type is STRING_BUFFER:
+            return get_var(data, symbol)
+        return var_type, values[slot]
+    return get_global
+
+
+# Returns a function returning the value of a literal or of a variable with the given
+# proven type, nothing has to be checked (see optimizer.infer_types)
+def make_proven_getter(data, symbol, tag):
+    if symbol.type != 'var':
+        const = symbol.value
+        return lambda: const
+    if symbol.frame != GF:
+        return lambda: get_proven_value(data, symbol)
+
+    frame = data.global_frame
+    types = frame.types; values = frame.values
+    slot = symbol.slot
+    if tag != STRING:
+        return lambda: values[slot]
+    def get_global():
+        if types[slot] is STRING_BUFFER:
+            return frame.flatten(slot)
+        return values[slot]
+    return get_global
+
+
+# Returns a function setting the type and value of a variable
+def make_setter(data, var):
+    if var.frame != GF:
+        return lambda var_type, value: set_var_type_value(data, var, var_type, value)
+
+    types = data.global_frame.types; values = data.global_frame.values
+    slot = var.slot
+    def set_global(var_type, value):
+        if types[slot] is UNDEFINED:
+            raise Exception(54, f'Nonexistent variable "{var.name}" in GF')
+        types[slot] = var_type
+        values[slot] = value
+    return set_global
+
+
+# The builders below create the closures of the most common instructions. A closure
+# returns None to continue with the next instruction or the index of the instruction to
+# jump to. The error messages are prefixed with the opcode by the processor. A builder
+# returns None if the instruction is better left to its generic closure
+
+def build_move(data, instr):
+    get_dst = make_getter(data, instr.args[0])
+    set_dst = make_setter(data, instr.args[0])
+    get_src = make_getter(data, instr.args[1])
+    def run():
+        get_dst() # just check if the destination exists
+        src_type, src_value = get_src()
+        if src_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        set_dst(src_type, src_value)
+    return run
+
+
+def build_arithmetic(operation):
+    def build(data, instr):
+        set_dst = make_setter(data, instr.args[0])
+        get_op1 = make_getter(data, instr.args[1])
+        get_op2 = make_getter(data, instr.args[2])
+        def run():
+            op1_type, op1_value = get_op1()
+            op2_type, op2_value = get_op2()
+            if ((op1_type == INT and op2_type == INT) or
+                    (op1_type == FLOAT and op2_type == FLOAT)):
+                set_dst(op1_type, operation(op1_value, op2_value))
+            elif op1_type == None or op2_type == None:
+                raise Exception(56, 'Uninitialized symbol')
+            else:
+                raise Exception(53, 'Both operands must be of type "int" or "float"')
+        return run
+    return build
+
+
+def build_idiv(data, instr):
+    set_dst = make_setter(data, instr.args[0])
+    get_op1 = make_getter(data, instr.args[1])
+    get_op2 = make_getter(data, instr.args[2])
+    def run():
+        op1_type, op1_value = get_op1()
+        op2_type, op2_value = get_op2()
+        if op1_type == INT and op2_type == INT:
+            if op2_value == 0:
+                raise Exception(57, 'Division by zero')
+            set_dst(INT, op1_value // op2_value)
+        elif op1_type == None or op2_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        else:
+            raise Exception(53, 'Both operands must be of type "int"')
+    return run
+
+
+# Returns a function evaluating LT or GT of two symbols as a python bool, the values of
+# all the types but nil compare natively (false < true)
+def make_ordering(operation, get_op1, get_op2):
+    def compare():
+        op1_type, op1_value = get_op1()
+        op2_type, op2_value = get_op2()
+        if op1_type == None or op2_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        elif op1_type == op2_type and op1_type != NIL:
+            return operation(op1_value, op2_value)
+        raise Exception(53, 'Operands incompatible for comparison')
+    return compare
+
+
+# LT and GT
+def build_relation(operation):
+    def build(data, instr):
+        set_dst = make_setter(data, instr.args[0])
+        compare = make_ordering(operation, make_getter(data, instr.args[1]),
+                make_getter(data, instr.args[2]))
+        def run():
+            set_dst(BOOL, compare())
+        return run
+    return build
+
+
+# Returns a function evaluating the equality of two symbols as a python bool
+def make_equality(get_op1, get_op2):
+    def equal():
+        op1_type, op1_value = get_op1()
+        op2_type, op2_value = get_op2()
+        if op1_type == None or op2_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        elif op1_type == op2_type:
+            return op1_value == op2_value
+        elif op1_type == NIL or op2_type == NIL:
+            return False
+        raise Exception(53, 'Operands incompatible for comparison')
+    return equal
+
+
+def build_eq(data, instr):
+    set_dst = make_setter(data, instr.args[0])
+    equal = make_equality(make_getter(data, instr.args[1]), make_getter(data, instr.args[2]))
+    def run():
+        set_dst(BOOL, equal())
+    return run
+
+
+def build_logic(operation):
+    def build(data, instr):
+        set_dst = make_setter(data, instr.args[0])
+        get_op1 = make_getter(data, instr.args[1])
+        get_op2 = make_getter(data, instr.args[2])
+        def run():
+            op1_type, op1_value = get_op1()
+            op2_type, op2_value = get_op2()
+            if op1_type == BOOL and op2_type == BOOL:
+                set_dst(BOOL, operation(op1_value, op2_value))
+            elif op1_type == None or op2_type == None:
+                raise Exception(56, 'Uninitialized symbol')
+            else:
+                raise Exception(53, 'Operands incompatible for logical operation')
+        return run
+    return build
+
+
+def build_not(data, instr):
+    set_dst = make_setter(data, instr.args[0])
+    get_op = make_getter(data, instr.args[1])
+    def run():
+        op_type, op_value = get_op()
+        if op_type == BOOL:
+            set_dst(BOOL, not op_value)
+        elif op_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        else:
+            raise Exception(53, 'Operands incompatible for logical operation')
+    return run
+
+
+def build_pushs(data, instr):
+    get_src = make_getter(data, instr.args[0])
+    types = data.stack_types; values = data.stack_values
+    def run():
+        src_type, src_value = get_src()
+        if src_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        types.append(src_type)
+        values.append(src_value)
+    return run
+
+
+def build_pops(data, instr):
+    set_dst = make_setter(data, instr.args[0])
+    types = data.stack_types; values = data.stack_values
+    def run():
+        if not types:
+            raise Exception(56, 'Data stack was empty')
+        set_dst(types.pop(), values.pop())
+    return run
+
+
+# ADDS, SUBS and MULS. The result replaces the first operand on the top of the stack,
+# so a run of int operations only checks the type tags and never rewrites them
+def build_stack_arithmetic(operation):
+    def build(data, instr):
+        types = data.stack_types; values = data.stack_values
+        def run():
+            if len(types) < 2:
+                raise Exception(56, 'Empty data stack')
+            op2_type = types.pop()
+            op1_type = types[-1]
+            if ((op1_type == INT and op2_type == INT) or
+                    (op1_type == FLOAT and op2_type == FLOAT)):
+                op2_value = values.pop()
+                values[-1] = operation(values[-1], op2_value)
+            elif op1_type == None or op2_type == None:
+                raise Exception(56, 'Uninitialized symbol')
+            else:
+                raise Exception(53, 'Both operands must be of type "int" or "float"')
+        return run
+    return build
+
+
+# LTS and GTS, the result replaces the first operand on the top of the stack
+def build_stack_relation(operation):
+    def build(data, instr):
+        types = data.stack_types; values = data.stack_values
+        def run():
+            if len(types) < 2:
+                raise Exception(56, 'Empty data stack')
+            op2_type = types.pop()
+            op1_type = types[-1]
+            if op1_type == op2_type and op1_type != NIL:
+                op2_value = values.pop()
+                types[-1] = BOOL
+                values[-1] = operation(values[-1], op2_value)
+            elif op1_type == None or op2_type == None:
+                raise Exception(56, 'Uninitialized symbol')
+            else:
+                raise Exception(53, 'Operands incompatible for comparison')
+        return run
+    return build
+
+
+def build_write(data, instr):
+    get_op = make_getter(data, instr.args[0])
+    write = data.output.write
+    def run():
+        op_type, op_value = get_op()
+        if op_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        write(to_text(op_type, op_value))
+    return run
+
+
+def build_concat(data, instr):
+    if instr.args[0] is instr.args[1]:
+        return None # the generic handler appends to the variable in place
+    set_dst = make_setter(data, instr.args[0])
+    get_op1 = make_getter(data, instr.args[1])
+    get_op2 = make_getter(data, instr.args[2])
+    def run():
+        op1_type, op1_value = get_op1()
+        op2_type, op2_value = get_op2()
+        if op1_type == STRING and op2_type == STRING:
+            set_dst(STRING, op1_value + op2_value)
+        elif op1_type == None or op2_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        else:
+            raise Exception(53, 'Invalid operand type')
+    return run
+
+
+def build_strlen(data, instr):
+    set_dst = make_setter(data, instr.args[0])
+    get_op = make_getter(data, instr.args[1], buffered=True)
+    def run():
+        op_type, op_value = get_op()
+        if op_type == STRING:
+            set_dst(INT, len(op_value))
+        elif op_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        else:
+            raise Exception(53, 'Invalid operand type')
+    return run
+
+
+def build_getchar(data, instr):
+    set_dst = make_setter(data, instr.args[0])
+    get_op1 = make_getter(data, instr.args[1], buffered=True)
+    get_op2 = make_getter(data, instr.args[2])
+    def run():
+        op1_type, op1_value = get_op1()
+        op2_type, op2_value = get_op2()
+        if op1_type == STRING and op2_type == INT:
+            if not (0 <= op2_value < len(op1_value)):
+                raise Exception(58, 'Index out of range')
+            set_dst(STRING, op1_value[op2_value])
+        elif op1_type == None or op2_type == None:
+            raise Exception(56, 'Uninitialized symbol')
+        else:
+            raise Exception(53, 'Invalid operand type')
+    return run
+
+
+def build_label(data, instr):
+    return lambda: None
+
+
+def build_jump(data, instr):
+    label = instr.args[0]
+    def run():
+        if label.target is None:
+            raise Exception(52, f'Label "{label.name}" is undefined')
+        return label.target
+    return run
+
+
+# JUMPIFEQ and JUMPIFNEQ
+def build_conditional_jump(jump_if_equal):
+    def build(data, instr):
+        label = instr.args[0]
+        equal = make_equality(make_getter(data, instr.args[1]),
+                make_getter(data, instr.args[2]))
+        def run():
+            result = equal()
+            if label.target is None:
+                raise Exception(52, f'Label "{label.name}" is undefined')
+            if result == jump_if_equal:
+                return label.target
+        return run
+    return build
+
+
+# LT, GT and EQ fused with a conditional jump taken if the result equals jump_if (see
+# optimizer.py), the result is still written to the destination
+def build_relation_jump(operation, jump_if):
+    def build(data, instr):
+        set_dst = make_setter(data, instr.args[0])
+        get_op1 = make_getter(data, instr.args[1])
+        get_op2 = make_getter(data, instr.args[2])
+        if operation is operator.eq:
+            relation = make_equality(get_op1, get_op2)
+        else:
+            relation = make_ordering(operation, get_op1, get_op2)
+        label = instr.args[3]
+        def run():
+            result = relation()
+            set_dst(BOOL, result)
+            if label.target is None:
+                raise Exception(52, f'Label "{label.name}" is undefined')
+            if result == jump_if:
+                return label.target
+        return run
+    return build
+
+
+# The arithmetic, relations and relation jumps whose operands have proven types, with the
+# given type of the result (see operations.proven_result_tag)
+def build_proven(data, instr, types, result_tag):
+    args = instr.args
+    set_dst = make_setter(data, args[0])
+    get_op1, get_op2 = (make_proven_getter(data, arg, types[n] if arg.type == 'var'
+                                           else arg.type)
+                        for n, arg in enumerate(args[1:3], 1))
+    if instr.op_id in PROVEN_OPERATIONS:
+        operation = PROVEN_OPERATIONS[instr.op_id]
+        def run():
+            set_dst(result_tag, operation(get_op1(), get_op2()))
+        return run
+
+    __, operation, jump_if = PROVEN_RELATION_JUMPS[instr.op_id]
+    label = instr.args[3]
+    def run():
+        result = operation(get_op1(), get_op2())
+        set_dst(BOOL, result)
+        if result == jump_if:
+            return label.target
+    return run
+
+
+# Any other instruction is executed by its handler from the Operations class
+def build_generic(data, instr):
+    handler = instr.handler
+    def run():
+        data.instr = instr
+        if handler(data):
+            return data.ip
+    return run
+
+
+builders = {
+    'MOVE': build_move,
+    'ADD': build_arithmetic(operator.add),
+    'SUB': build_arithmetic(operator.sub),
+    'MUL': build_arithmetic(operator.mul),
+    'IDIV': build_idiv,
+    'LT': build_relation(operator.lt),
+    'GT': build_relation(operator.gt),
+    'EQ': build_eq,
+    'AND': build_logic(operator.and_),
+    'OR': build_logic(operator.or_),
+    'NOT': build_not,
+    'PUSHS': build_pushs,
+    'POPS': build_pops,
+    'ADDS': build_stack_arithmetic(operator.add),
+    'SUBS': build_stack_arithmetic(operator.sub),
+    'MULS': build_stack_arithmetic(operator.mul),
+    'LTS': build_stack_relation(operator.lt),
+    'GTS': build_stack_relation(operator.gt),
+    'WRITE': build_write,
+    'CONCAT': build_concat,
+    'STRLEN': build_strlen,
+    'GETCHAR': build_getchar,
+    'LABEL': build_label,
+    'JUMP': build_jump,
+    'JUMPIFEQ': build_conditional_jump(True),
+    'JUMPIFNEQ': build_conditional_jump(False),
+    'LT_JUMPIF': build_relation_jump(operator.lt, True),
+    'LT_JUMPIFNOT': build_relation_jump(operator.lt, False),
+    'GT_JUMPIF': build_relation_jump(operator.gt, True),
+    'GT_JUMPIFNOT': build_relation_jump(operator.gt, False),
+    'EQ_JUMPIF': build_relation_jump(operator.eq, True),
+    'EQ_JUMPIFNOT': build_relation_jump(operator.eq, False),
+}
+
+
+# This processor runs the program as a list of closures. The frames, stacks and the
+# instructions without a specialised closure are shared with the reference Processor.
+# The instructions whose operand types are proven get closures checking none of them
+class ThreadedProcessor(Processor):
+    def __init__(self, program, input_file, output):
+        super().__init__(program, input_file, output)
+        proven = self.select_proven_handlers()
+
+        self.code = []
+        self.prefixes = [] # the opcodes prefixed to the errors of the closures
+        for instr in program:
+            types = proven[instr.order]
+            result_tag = proven_result_tag(instr, types)
+            if result_tag is not None:
+                run = build_proven(self, instr, types, result_tag)
+            else:
+                builder = builders.get(instr.opcode)
+                run = None if builder is None else builder(self, instr)
+            if run is None:
+                self.code.append(build_generic(self, instr))
+                self.prefixes.append(None) # the handlers prefix their errors themselves
+            else:
+                self.code.append(run)
+                self.prefixes.append(SOURCE_OPCODES.get(instr.opcode, instr.opcode))
+
+    def execute_program(self):
+        code = self.code
+        program_len = len(code)
+        ip = 0
+        try:
+            while ip < program_len:
+                target = code[ip]()
+                ip = ip + 1 if target is None else target
+
+        except Exception as e:
+            if self.prefixes[ip] is None:
+                raise e
+            retcode, msg = e.args
+            raise Exception(retcode, f'{self.prefixes[ip]}: {msg}')
@@ -0,0 +1,225 @@
+##
+# @file   tracing.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements an execution engine, which interprets the program just
+#         like the reference Processor, but compiles its hot loops into python functions
+#         specialised on the operand types seen while they were recorded
+
+from execute import Processor
+from program import Instruction, Block, OPCODE_IDS, GF
+from frames import STRING_BUFFER
+from values import STRING
+from transpiler import Transpiler, CONTROL_HANDLERS, TAG_NAMES, execute_source, prefix_error
+from optimizer import FRAME_CHANGES, var_key
+from quickening import quicken_program, peek_type, SPECIALIZABLE
+
+# the number of backward jumps to a label after which the loop starting at it is traced
+HOT_LOOP = 50
+
+# the maximum number of basic blocks of a trace, the longer loops stay interpreted
+MAX_TRACE_BLOCKS = 32
+
+# the instructions ending a block that cannot be traced, the targets of their jumps are
+# not known until they are executed
+UNTRACEABLE = {OPCODE_IDS[opcode] for opcode in CONTROL_HANDLERS}
+
+# the operands whose types are recorded - the operands read by the instructions the
+# adaptive engine specialises (see quickening.py)
+TRACED_OPERANDS = (1, 2)
+
+
+# This class generates the source code of a trace - the basic blocks of a loop in the
+# order they have been executed in. The code of the blocks is placed one after another
+# in an endless loop, the jumps along the trace fall through to the next block and the
+# other ones return the index of the instruction to continue with, which ends the trace.
+# Every block starts by the guards checking the types of the variables its code has been
+# specialised for, a failed guard ends the trace before the block, or returns None if
+# the block is the first one of the trace
+class TraceTranspiler(Transpiler):
+    def __init__(self, program, blocks, proven, path, guards):
+        super().__init__(program, blocks, proven)
+        self.path = path
+        self.guards = guards # the (variable, type tag) pairs checked by each block
+        self.next = None # the start of the block following the current one on the trace
+        self.end = None # the end of the current block
+
+    def jump(self, target, indent, condition=None):
+        if target != self.next:
+            super().jump(target, indent, condition)
+        elif condition is not None and self.end != self.next:
+            # the guard of the trace, the jump not taken leaves it
+            self.emit(f'if not ({condition}): return {self.end}', indent)
+
+    def generate(self):
+        self.owner = None
+        self.emit('def make_trace(data):', 0)
+        self.emit_bindings(1)
+        self.emit('def trace():', 1)
+        self.emit('while True:', 2)
+        for index, start in enumerate(self.path):
+            block = self.blocks[start]
+            self.next = self.path[(index + 1) % len(self.path)]
+            self.end = block.end
+            exit = start if index else None
+            for var, tag in self.guards[start]:
+                self.emit(f'if not ({self.type_guard(var, tag)}): return {exit}', 3)
+            # the blocks ending without a jump always fall through to the next one
+            self.emit_block(block, 3)
+        self.emit('return trace', 1)
+        return '\n'.join(self.lines) + '\n'
+
+    # returns the condition checking that a variable holds a value of the type
+    def type_guard(self, var, tag):
+        if var.frame == GF:
+            type_expr = f'gt[{var.slot}]'
+        else:
+            type_expr = f'{self.constant(peek_type)}(data, {self.constant(var)})'
+        if tag == STRING:
+            return f'{type_expr} == STRING or {type_expr} is STRING_BUFFER'
+        return f'{type_expr} == {TAG_NAMES[tag]}'
+
+
+# This processor counts the backward jumps of the program. Once a loop gets hot, the
+# blocks executed by its next iteration are recorded and compiled into a trace, which
+# replaces the first block of the loop and runs until the execution leaves the trace
+class TracingProcessor(Processor):
+    def __init__(self, program, input_file, output):
+        super().__init__(program, input_file, output)
+        self.hotness = [0] * (len(program) + 1) # the backward jumps to each instruction
+        self.traced = set() # the starts of the blocks replaced by traces
+        self.proven = self.select_proven_handlers() # the proven types (see optimizer.py)
+
+    def execute_program(self):
+        quicken_program(self.program)
+
+        blocks = self.blocks
+        hotness = self.hotness
+        program_len = len(self.program)
+        while self.ip < program_len:
+            start = self.ip
+            block = blocks[start]
+            jumped = False
+            for instr in block.instructions:
+                self.instr = instr
+                jumped = instr.handler(self)
+
+            if not jumped:
+                self.ip = block.end
+            elif self.ip <= start:
+                # a backward jump closes a loop
+                hotness[self.ip] += 1
+                if hotness[self.ip] == HOT_LOOP:
+                    self.record_trace(self.ip)
+
+    # Executes the blocks of a single iteration of the loop starting at the header and
+    # compiles them into a trace. The recording is given up if the iteration leaves the
+    # loop or runs into a block that cannot be traced, the loop then stays interpreted
+    def record_trace(self, header):
+        blocks = self.blocks
+        program_len = len(self.program)
+        path = []
+        observed = {} # the operand types by (instruction index, operand index)
+        while len(path) < MAX_TRACE_BLOCKS:
+            start = self.ip
+            block = blocks[start]
+            if start in self.traced or (block.instructions and
+                    block.instructions[-1].op_id in UNTRACEABLE):
+                return
+            path.append(start)
+
+            jumped = False
+            for instr in block.instructions:
+                if instr.op_id in SPECIALIZABLE:
+                    self.observe(instr, observed)
+                self.instr = instr
+                jumped = instr.handler(self)
+            if not jumped:
+                self.ip = block.end
+
+            if self.ip == header:
+                return self.compile_trace(path, observed)
+            if self.ip >= program_len:
+                return
+
+    # Records the types of the operands of an instruction about to be executed. An operand
+    # whose type differs between the executions of the instruction gets the type None
+    def observe(self, instr, observed):
+        for n in TRACED_OPERANDS:
+            tag = peek_type(self, instr.args[n])
+            if tag is STRING_BUFFER:
+                tag = STRING
+            key = (instr.order, n)
+            if observed.get(key, tag) != tag:
+                tag = None
+            observed[key] = tag
+
+    # Returns the proven types (see optimizer.infer_types) extended by the recorded types
+    # of the operands of the trace and the guards of its blocks checking them. A recorded
+    # type can only be guarded at the start of the block if the variable is not written
+    # before it is read in the block, and LF and TF variables only until the frames change
+    def specialize(self, path, observed):
+        proven = list(self.proven)
+        guards = {}
+        for start in path:
+            if start in guards:
+                continue
+            guarded = {}
+            written = set()
+            frames_changed = False
+            for instr in self.blocks[start].instructions:
+                types = proven[instr.order]
+                if instr.op_id in SPECIALIZABLE and types is not None:
+                    types = list(types)
+                    for n in TRACED_OPERANDS:
+                        arg = instr.args[n]
+                        tag = observed.get((instr.order, n))
+                        if arg.type != 'var' or types[n] is not None or \
+                                tag not in SPECIALIZABLE[instr.op_id]:
+                            continue
+                        key = var_key(arg)
+                        if key in written or (arg.frame != GF and frames_changed) or \
+                                guarded.get(key, (arg, tag))[1] != tag:
+                            continue
+                        types[n] = tag
+                        guarded[key] = (arg, tag)
+                    proven[instr.order] = tuple(types)
+
+                if instr.op_id in FRAME_CHANGES:
+                    frames_changed = True
+                if instr.args and instr.args[0].type == 'var':
+                    written.add(var_key(instr.args[0]))
+            guards[start] = list(guarded.values())
+        return proven, guards
+
+    def compile_trace(self, path, observed):
+        proven, guards = self.specialize(path, observed)
+        transpiler = TraceTranspiler(self.program, self.blocks, proven, path, guards)
+        source = transpiler.generate()
+        filename = f'<trace {path[0]}>'
+        owners = transpiler.owners
+        trace = execute_source(source, filename, transpiler.constants)['make_trace'](self)
+
+        # the trace is executed as the only instruction of the first block of the loop,
+        # the original block is executed if the guards of the trace fail right away
+        header = self.blocks[path[0]]
+        def run_trace(data):
+            try:
+                ip = trace()
+            except Exception as e:
+                raise prefix_error(e, filename, owners)
+            if ip is not None:
+                data.ip = ip
+                return True
+
+            jumped = False
+            for instr in header.instructions:
+                data.instr = instr
+                jumped = instr.handler(data)
+            if not jumped:
+                data.ip = header.end
+            return True
+
+        instr = Instruction(OPCODE_IDS['LABEL'], ())
+        instr.handler = run_trace
+        self.blocks[path[0]] = Block([instr], self.blocks[path[0]].end)
+        self.traced.add(path[0])
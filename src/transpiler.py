@@ -0,0 +1,547 @@
+##
+# @file   transpiler.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module translates the whole program into python source code, which is
+#         compiled into a single code object and executed instead of being interpreted
+
+from execute import Processor
+from optimizer import infer_types
+from operations import get_var_type_value, set_var_type_value, get_string_type_value
+from program import GF, SOURCE_OPCODES
+from frames import UNDEFINED, STRING_BUFFER
+from values import INT, FLOAT, STRING, BOOL, NIL, TYPE_NAMES, to_text
+
+# the file name of the generated code, used to find the failing instruction on an error
+FILENAME = '<IPPcode20>'
+
+# the instructions whose handlers may transfer the control elsewhere
+CONTROL_HANDLERS = {'CALL', 'RETURN', 'JUMPIFEQS', 'JUMPIFNEQS', 'EXIT', 'TAILCALL',
+                    'TAILCALL_POPFRAME'}
+
+
+# the names of the type tags (indexed by the tags) in the generated code
+TAG_NAMES = ('INT', 'FLOAT', 'STRING', 'BOOL', 'NIL')
+
+
+# Helpers for building python conditions about the symbol types. A type expression is
+# either a name of a type tag of a literal, known at the compile time, or a name of
+# a variable
+def is_type(type_expr, tag):
+    if type_expr in TAG_NAMES:
+        return 'True' if type_expr == TAG_NAMES[tag] else 'False'
+    return f'{type_expr} == {TAG_NAMES[tag]}'
+
+def is_not_type(type_expr, tag):
+    if type_expr in TAG_NAMES:
+        return 'False' if type_expr == TAG_NAMES[tag] else 'True'
+    return f'{type_expr} != {TAG_NAMES[tag]}'
+
+def is_none(type_expr):
+    return 'False' if type_expr in TAG_NAMES else f'{type_expr} is None'
+
+def same_types(type1, type2):
+    if type1 in TAG_NAMES and type2 in TAG_NAMES:
+        return 'True' if type1 == type2 else 'False'
+    return f'{type1} == {type2}'
+
+def all_of(*conditions):
+    if 'False' in conditions:
+        return 'False'
+    conditions = [c for c in conditions if c != 'True']
+    return ' and '.join(f'({c})' for c in conditions) if conditions else 'True'
+
+def any_of(*conditions):
+    if 'True' in conditions:
+        return 'True'
+    conditions = [c for c in conditions if c != 'False']
+    return ' or '.join(f'({c})' for c in conditions) if conditions else 'False'
+
+
+# This class generates the source code of a program. Every basic block becomes a nested
+# function returning the index of the next block, the variables of the GF are accessed
+# directly in its slot arrays and the literals are inlined as constants
+class Transpiler:
+    def __init__(self, program, blocks, proven=None):
+        self.program = program
+        self.blocks = blocks
+        self.lines = []
+        self.owners = [] # the opcode (error prefix) of the instruction of each line
+        self.owner = None
+        self.constants = {}
+        # the proven types of the operands of the instructions (see optimizer.py)
+        self.proven = infer_types(program) if proven is None else proven
+        self.instr = None # the instruction being translated and its proven types
+        self.types = None
+        self.removed_checks = 0
+
+    def emit(self, line, indent):
+        self.lines.append('    ' * indent + line)
+        self.owners.append(self.owner)
+
+    # binds a python object to a name accessible from the generated code
+    def constant(self, value):
+        name = f'k{len(self.constants)}'
+        self.constants[name] = value
+        return name
+
+    def literal(self, symbol):
+        if symbol.type == FLOAT:
+            return self.constant(symbol.value)
+        return repr(symbol.value)
+
+    def nonexistent(self, var):
+        return f'Nonexistent variable "{var.name}" in GF'
+
+    # returns the type of a variable operand of the current instruction if it has been
+    # proven by the type inference, the checks of a proven type are left out
+    def proven_type(self, symbol):
+        if self.types is None:
+            return None
+        for arg, tag in zip(self.instr.args, self.types):
+            if arg is symbol and tag is not None:
+                self.removed_checks += 1
+                return tag
+        return None
+
+    # emits the code reading a symbol, returns the expressions of its type and value. If
+    # buffered is True, string buffers are read as they are (see get_string_type_value)
+    def read(self, symbol, n, indent, buffered=False):
+        if symbol.type != 'var':
+            return TAG_NAMES[symbol.type], self.literal(symbol)
+
+        tag = self.proven_type(symbol)
+        if symbol.frame == GF:
+            self.emit(f't{n} = gt[{symbol.slot}]', indent)
+            self.emit(f'if t{n} is UNDEFINED: raise Exception(54, '
+                      f'{self.nonexistent(symbol)!r})', indent)
+            if buffered:
+                self.emit(f'elif t{n} is STRING_BUFFER: t{n} = STRING', indent)
+            elif tag is None or tag == STRING: # the buffer is flattened in its slot
+                self.emit(f'elif t{n} is STRING_BUFFER: '
+                          f't{n} = get_var(data, {self.constant(symbol)})[0]', indent)
+            return f't{n}' if tag is None else TAG_NAMES[tag], f'gv[{symbol.slot}]'
+
+        get_var = 'get_string' if buffered else 'get_var'
+        self.emit(f't{n}, v{n} = {get_var}(data, {self.constant(symbol)})', indent)
+        return f't{n}' if tag is None else TAG_NAMES[tag], f'v{n}'
+
+    # emits the code checking that a variable exists
+    def check_exists(self, var, indent):
+        if var.frame == GF:
+            self.emit(f'if gt[{var.slot}] is UNDEFINED: raise Exception(54, '
+                      f'{self.nonexistent(var)!r})', indent)
+        else:
+            self.emit(f'get_var(data, {self.constant(var)})', indent)
+
+    # emits the code writing the type and value to a variable
+    def write(self, var, type_expr, value_expr, indent):
+        if var.frame == GF:
+            self.check_exists(var, indent)
+            self.emit(f'gt[{var.slot}] = {type_expr}', indent)
+            self.emit(f'gv[{var.slot}] = {value_expr}', indent)
+        else:
+            self.emit(f'set_var(data, {self.constant(var)}, {type_expr}, {value_expr})',
+                      indent)
+
+    # emits the code transferring the control to the instruction at the target index,
+    # either always or if the condition holds
+    def jump(self, target, indent, condition=None):
+        if condition is None:
+            self.emit(f'return {target}', indent)
+        else:
+            self.emit(f'if {condition}: return {target}', indent)
+
+    def raise_error(self, retcode, message, indent):
+        self.emit(f'raise Exception({retcode}, {message!r})', indent)
+
+    # emits the names of the processor state the generated code works with
+    def emit_bindings(self, indent):
+        self.emit('gt = data.global_frame.types', indent)
+        self.emit('gv = data.global_frame.values', indent)
+        self.emit('st = data.stack_types', indent)
+        self.emit('sv = data.stack_values', indent)
+        self.emit('write = data.output.write', indent)
+
+    def generate(self):
+        self.owner = None
+        self.emit('def make_blocks(data):', 0)
+        self.emit_bindings(1)
+        self.emit(f'table = [None] * {len(self.blocks)}', 1)
+
+        for start, block in enumerate(self.blocks):
+            if block is None:
+                continue
+            self.owner = None
+            self.emit(f'def block_{start}():', 1)
+            self.emit_block(block, 2)
+            self.jump(block.end, 2)
+            self.emit(f'table[{start}] = block_{start}', 1)
+
+        self.emit('return table', 1)
+        return '\n'.join(self.lines) + '\n'
+
+    # emits the code of the instructions of a basic block
+    def emit_block(self, block, indent):
+        for instr in block.instructions:
+            self.owner = SOURCE_OPCODES.get(instr.opcode, instr.opcode)
+            self.instr = instr
+            self.types = self.proven[instr.order]
+            emitter = getattr(self, 'emit_' + instr.opcode, None)
+            if emitter is None:
+                self.owner = None
+                self.emit_generic(instr, indent)
+            else:
+                emitter(instr, indent)
+        self.owner = None
+
+    # Any other instruction is executed by its handler from the Operations class
+    def emit_generic(self, instr, indent):
+        self.emit(f'data.instr = {self.constant(instr)}', indent)
+        call = f'{self.constant(instr.handler)}(data)'
+        if instr.opcode in CONTROL_HANDLERS:
+            self.emit(f'if {call}: return data.ip', indent)
+        else:
+            self.emit(call, indent)
+
+    def emit_LABEL(self, instr, indent):
+        pass
+
+    def emit_DEFVAR(self, instr, indent):
+        var = instr.args[0]
+        if var.frame != GF:
+            self.owner = None
+            return self.emit_generic(instr, indent)
+        self.emit(f'if gt[{var.slot}] is not UNDEFINED: raise Exception(52, '
+                  f'"Variable already defined in GF")', indent)
+        self.emit(f'gt[{var.slot}] = None', indent)
+
+    def emit_MOVE(self, instr, indent):
+        self.check_exists(instr.args[0], indent)
+        src_type, src_value = self.read(instr.args[1], 1, indent)
+        self.emit(f'if {is_none(src_type)}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.write(instr.args[0], src_type, src_value, indent)
+
+    def emit_arithmetic(self, instr, operator, indent):
+        type1, value1 = self.read(instr.args[1], 1, indent)
+        type2, value2 = self.read(instr.args[2], 2, indent)
+        both_int = all_of(is_type(type1, INT), is_type(type2, INT))
+        both_float = all_of(is_type(type1, FLOAT), is_type(type2, FLOAT))
+        self.emit(f'if {any_of(both_int, both_float)}:', indent)
+        self.emit(f'r = {value1} {operator} {value2}', indent + 1)
+        self.write(instr.args[0], type1, 'r', indent + 1)
+        self.emit(f'elif {any_of(is_none(type1), is_none(type2))}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Both operands must be of type "int" or "float"', indent + 1)
+
+    def emit_ADD(self, instr, indent):
+        self.emit_arithmetic(instr, '+', indent)
+
+    def emit_SUB(self, instr, indent):
+        self.emit_arithmetic(instr, '-', indent)
+
+    def emit_MUL(self, instr, indent):
+        self.emit_arithmetic(instr, '*', indent)
+
+    def emit_division(self, instr, operand_type, operator, indent):
+        type1, value1 = self.read(instr.args[1], 1, indent)
+        type2, value2 = self.read(instr.args[2], 2, indent)
+        self.emit(f'if {all_of(is_type(type1, operand_type), is_type(type2, operand_type))}:',
+                  indent)
+        self.emit(f'if {value2} == 0:', indent + 1)
+        self.raise_error(57, 'Division by zero', indent + 2)
+        self.emit(f'r = {value1} {operator} {value2}', indent + 1)
+        self.write(instr.args[0], TAG_NAMES[operand_type], 'r', indent + 1)
+        self.emit(f'elif {any_of(is_none(type1), is_none(type2))}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, f'Both operands must be of type "{TYPE_NAMES[operand_type]}"',
+                         indent + 1)
+
+    def emit_IDIV(self, instr, indent):
+        self.emit_division(instr, INT, '//', indent)
+
+    def emit_DIV(self, instr, indent):
+        self.emit_division(instr, FLOAT, '/', indent)
+
+    # emits the code storing LT or GT of the last two operands to r as a python bool, the
+    # values of all the types but nil compare natively (false < true)
+    def emit_ordering(self, instr, operator, indent):
+        type1, value1 = self.read(instr.args[1], 1, indent)
+        type2, value2 = self.read(instr.args[2], 2, indent)
+        self.emit(f'if {any_of(is_none(type1), is_none(type2))}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit(f'elif {all_of(same_types(type1, type2), is_not_type(type1, NIL))}:',
+                  indent)
+        self.emit(f'r = {value1} {operator} {value2}', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Operands incompatible for comparison', indent + 1)
+
+    def emit_LT(self, instr, indent):
+        self.emit_ordering(instr, '<', indent)
+        self.write(instr.args[0], 'BOOL', 'r', indent)
+
+    def emit_GT(self, instr, indent):
+        self.emit_ordering(instr, '>', indent)
+        self.write(instr.args[0], 'BOOL', 'r', indent)
+
+    # emits the code storing the equality of the last two operands to r as a python bool
+    def emit_equality(self, instr, indent):
+        type1, value1 = self.read(instr.args[1], 1, indent)
+        type2, value2 = self.read(instr.args[2], 2, indent)
+        self.emit(f'if {any_of(is_none(type1), is_none(type2))}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit(f'elif {same_types(type1, type2)}:', indent)
+        self.emit(f'r = {value1} == {value2}', indent + 1)
+        self.emit(f'elif {any_of(is_type(type1, NIL), is_type(type2, NIL))}:', indent)
+        self.emit('r = False', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Operands incompatible for comparison', indent + 1)
+
+    def emit_EQ(self, instr, indent):
+        self.emit_equality(instr, indent)
+        self.write(instr.args[0], 'BOOL', 'r', indent)
+
+    def emit_logic(self, instr, operator, indent):
+        type1, value1 = self.read(instr.args[1], 1, indent)
+        type2, value2 = self.read(instr.args[2], 2, indent)
+        self.emit(f'if {all_of(is_type(type1, BOOL), is_type(type2, BOOL))}:', indent)
+        self.write(instr.args[0], 'BOOL', f'{value1} {operator} {value2}', indent + 1)
+        self.emit(f'elif {any_of(is_none(type1), is_none(type2))}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Operands incompatible for logical operation', indent + 1)
+
+    def emit_AND(self, instr, indent):
+        self.emit_logic(instr, 'and', indent)
+
+    def emit_OR(self, instr, indent):
+        self.emit_logic(instr, 'or', indent)
+
+    def emit_NOT(self, instr, indent):
+        op_type, op_value = self.read(instr.args[1], 1, indent)
+        self.emit(f'if {is_type(op_type, BOOL)}:', indent)
+        self.write(instr.args[0], 'BOOL', f'not {op_value}', indent + 1)
+        self.emit(f'elif {is_none(op_type)}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Operands incompatible for logical operation', indent + 1)
+
+    def emit_PUSHS(self, instr, indent):
+        src_type, src_value = self.read(instr.args[0], 1, indent)
+        self.emit(f'if {is_none(src_type)}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit(f'st.append({src_type})', indent)
+        self.emit(f'sv.append({src_value})', indent)
+
+    def emit_POPS(self, instr, indent):
+        self.emit('if not st:', indent)
+        self.raise_error(56, 'Data stack was empty', indent + 1)
+        self.write(instr.args[0], 'st.pop()', 'sv.pop()', indent)
+
+    # Pops the second operand of a stack instruction into t and v, the first operand
+    # stays on the top of the stack to be replaced by the result
+    def pop_stack_operand(self, indent):
+        self.emit('if len(st) < 2:', indent)
+        self.raise_error(56, 'Empty data stack', indent + 1)
+        self.emit('t = st.pop()', indent)
+
+    # ADDS, SUBS and MULS, a run of int operations never rewrites the type tags
+    def emit_stack_arithmetic(self, instr, operator, indent):
+        self.pop_stack_operand(indent)
+        self.emit('if t == INT == st[-1] or t == FLOAT == st[-1]:', indent)
+        self.emit('v = sv.pop()', indent + 1)
+        self.emit(f'sv[-1] = sv[-1] {operator} v', indent + 1)
+        self.emit('elif t is None or st[-1] is None:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Both operands must be of type "int" or "float"', indent + 1)
+
+    def emit_ADDS(self, instr, indent):
+        self.emit_stack_arithmetic(instr, '+', indent)
+
+    def emit_SUBS(self, instr, indent):
+        self.emit_stack_arithmetic(instr, '-', indent)
+
+    def emit_MULS(self, instr, indent):
+        self.emit_stack_arithmetic(instr, '*', indent)
+
+    # LTS and GTS
+    def emit_stack_relation(self, instr, operator, indent):
+        self.pop_stack_operand(indent)
+        self.emit('if t == st[-1] and t != NIL:', indent)
+        self.emit('v = sv.pop()', indent + 1)
+        self.emit('st[-1] = BOOL', indent + 1)
+        self.emit(f'sv[-1] = sv[-1] {operator} v', indent + 1)
+        self.emit('elif t is None or st[-1] is None:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Operands incompatible for comparison', indent + 1)
+
+    def emit_LTS(self, instr, indent):
+        self.emit_stack_relation(instr, '<', indent)
+
+    def emit_GTS(self, instr, indent):
+        self.emit_stack_relation(instr, '>', indent)
+
+    def emit_WRITE(self, instr, indent):
+        symbol = instr.args[0]
+        if symbol.type != 'var':
+            # the text form of a literal is known in advance
+            self.emit(f'write({to_text(symbol.type, symbol.value)!r})', indent)
+            return
+        op_type, op_value = self.read(symbol, 1, indent)
+        self.emit(f'if {is_none(op_type)}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit(f'write(to_text({op_type}, {op_value}))', indent)
+
+    def emit_CONCAT(self, instr, indent):
+        if instr.args[0] is instr.args[1]:
+            # appends to the variable in place
+            self.owner = None
+            return self.emit_generic(instr, indent)
+        type1, value1 = self.read(instr.args[1], 1, indent)
+        type2, value2 = self.read(instr.args[2], 2, indent)
+        self.emit(f'if {all_of(is_type(type1, STRING), is_type(type2, STRING))}:',
+                  indent)
+        self.write(instr.args[0], 'STRING', f'{value1} + {value2}', indent + 1)
+        self.emit(f'elif {any_of(is_none(type1), is_none(type2))}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Invalid operand type', indent + 1)
+
+    def emit_STRLEN(self, instr, indent):
+        op_type, op_value = self.read(instr.args[1], 1, indent, buffered=True)
+        self.emit(f'if {is_type(op_type, STRING)}:', indent)
+        self.write(instr.args[0], 'INT', f'len({op_value})', indent + 1)
+        self.emit(f'elif {is_none(op_type)}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Invalid operand type', indent + 1)
+
+    def emit_GETCHAR(self, instr, indent):
+        type1, value1 = self.read(instr.args[1], 1, indent, buffered=True)
+        type2, value2 = self.read(instr.args[2], 2, indent)
+        self.emit(f'if {all_of(is_type(type1, STRING), is_type(type2, INT))}:', indent)
+        self.emit(f'if not (0 <= {value2} < len({value1})):', indent + 1)
+        self.raise_error(58, 'Index out of range', indent + 2)
+        self.write(instr.args[0], 'STRING', f'{value1}[{value2}]', indent + 1)
+        self.emit(f'elif {any_of(is_none(type1), is_none(type2))}:', indent)
+        self.raise_error(56, 'Uninitialized symbol', indent + 1)
+        self.emit('else:', indent)
+        self.raise_error(53, 'Invalid operand type', indent + 1)
+
+    def emit_JUMP(self, instr, indent):
+        label = instr.args[0]
+        if label.target is None:
+            self.raise_error(52, f'Label "{label.name}" is undefined', indent)
+        else:
+            self.jump(label.target, indent)
+
+    def emit_conditional_jump(self, instr, condition, indent):
+        self.emit_equality(instr, indent)
+        label = instr.args[0]
+        if label.target is None:
+            self.raise_error(52, f'Label "{label.name}" is undefined', indent)
+        else:
+            self.jump(label.target, indent, condition)
+
+    def emit_JUMPIFEQ(self, instr, indent):
+        self.emit_conditional_jump(instr, 'r', indent)
+
+    def emit_JUMPIFNEQ(self, instr, indent):
+        self.emit_conditional_jump(instr, 'not r', indent)
+
+    # LT, GT and EQ fused with a conditional jump on their result (see optimizer.py), the
+    # result is still written to the destination
+    def emit_relation_jump(self, instr, operator, condition, indent):
+        if operator == '==':
+            self.emit_equality(instr, indent)
+        else:
+            self.emit_ordering(instr, operator, indent)
+        self.write(instr.args[0], 'BOOL', 'r', indent)
+        label = instr.args[3]
+        if label.target is None:
+            self.raise_error(52, f'Label "{label.name}" is undefined', indent)
+        else:
+            self.jump(label.target, indent, condition)
+
+    def emit_LT_JUMPIF(self, instr, indent):
+        self.emit_relation_jump(instr, '<', 'r', indent)
+
+    def emit_LT_JUMPIFNOT(self, instr, indent):
+        self.emit_relation_jump(instr, '<', 'not r', indent)
+
+    def emit_GT_JUMPIF(self, instr, indent):
+        self.emit_relation_jump(instr, '>', 'r', indent)
+
+    def emit_GT_JUMPIFNOT(self, instr, indent):
+        self.emit_relation_jump(instr, '>', 'not r', indent)
+
+    def emit_EQ_JUMPIF(self, instr, indent):
+        self.emit_relation_jump(instr, '==', 'r', indent)
+
+    def emit_EQ_JUMPIFNOT(self, instr, indent):
+        self.emit_relation_jump(instr, '==', 'not r', indent)
+
+    def emit_DEFVAR_MOVE(self, instr, indent):
+        if instr.args[0].frame != GF:
+            self.owner = None
+            return self.emit_generic(instr, indent)
+        self.owner = 'DEFVAR'
+        self.emit_DEFVAR(instr, indent)
+        self.owner = 'MOVE'
+        self.emit_MOVE(instr, indent)
+
+
+# Compiles the generated source code and returns the namespace it has been executed in
+def execute_source(source, filename, constants):
+    namespace = dict(constants, UNDEFINED=UNDEFINED, STRING_BUFFER=STRING_BUFFER,
+                     get_var=get_var_type_value, set_var=set_var_type_value,
+                     get_string=get_string_type_value, to_text=to_text, INT=INT,
+                     FLOAT=FLOAT, STRING=STRING, BOOL=BOOL, NIL=NIL)
+    exec(compile(source, filename, 'exec'), namespace)
+    return namespace
+
+
+# Returns an error raised by the generated code prefixed with the opcode of the instruction
+# whose code has failed, as the Operations handlers do. The owners are the opcodes of the
+# lines of the code (see Transpiler.owners)
+def prefix_error(e, filename, owners):
+    # find the line of the generated code that failed
+    line = None
+    tb = e.__traceback__
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == filename:
+            line = tb.tb_lineno
+        tb = tb.tb_next
+
+    if line is None or owners[line - 1] is None:
+        return e
+    retcode, msg = e.args
+    return Exception(retcode, f'{owners[line - 1]}: {msg}')
+
+
+# This processor executes the program translated to python by the Transpiler
+class CompiledProcessor(Processor):
+    def __init__(self, program, input_file, output):
+        super().__init__(program, input_file, output)
+
+        transpiler = Transpiler(program, self.blocks)
+        source = transpiler.generate()
+        self.line_owners = transpiler.owners
+        namespace = execute_source(source, FILENAME, transpiler.constants)
+        self.table = namespace['make_blocks'](self)
+        self.report['removed type checks'] = transpiler.removed_checks
+
+    def execute_program(self):
+        table = self.table
+        program_len = len(self.program)
+        ip = 0
+        try:
+            while ip < program_len:
+                ip = table[ip]()
+
+        except Exception as e:
+            raise prefix_error(e, FILENAME, self.line_owners)
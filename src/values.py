@@ -0,0 +1,26 @@
+##
+# @file   values.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module defines the representation of the IPPcode20 values
+
+# The type tags of the values. A value is stored as its type tag along with its python
+# value - an int, a float, a str, a bool or None for nil. The type of an uninitialized
+# variable is None
+INT, FLOAT, STRING, BOOL, NIL = range(5)
+
+# the names of the types as used in the source and by the TYPE instruction
+TYPE_NAMES = ('int', 'float', 'string', 'bool', 'nil')
+TYPE_TAGS = {name: tag for tag, name in enumerate(TYPE_NAMES)}
+
+
+# Returns the text form of a value as printed by WRITE
+def to_text(value_type, value):
+    if value_type == STRING:
+        return value
+    elif value_type == INT:
+        return str(value)
+    elif value_type == BOOL:
+        return 'true' if value else 'false'
+    elif value_type == FLOAT:
+        return float.hex(value)
+    return '' # nil
@@ -5,261 +5,165 @@
 #         input xml for the interpreter
 
 
-from xml.etree import ElementTree as ET
-import sys
 import re
 
-# check the syntax and lexical format of an instruction element
-def check_instructions(root):
-    for instr in root:
-        try:
-            check_instruction(instr)
-        except Exception as e:
-            sys.stderr.write(str(ET.tostring(instr)))
-            raise e
+VAR_NAME = re.compile(r'(GF|LF|TF)@[a-zA-Z_\-$&%*!?][a-zA-Z0-9_\-$&%*!?]*')
+LABEL_NAME = re.compile(r'[a-zA-Z_\-$&%*!?][a-zA-Z0-9_\-$&%*!?]*')
+ESCAPE = re.compile(r'\\[\S]{3}')
+
+# the kinds of the instruction operands and the argument types each of them accepts
+OPERAND_TYPES = {
+    'var': {'var'},
+    'symb': {'var', 'int', 'float', 'string', 'bool', 'nil'},
+    'label': {'label'},
+    'type': {'type'},
+}
+
+# the operand kinds of every instruction
+SIGNATURES = {}
+for opcodes, operands in (
+        (('CREATEFRAME', 'PUSHFRAME', 'POPFRAME', 'RETURN', 'BREAK', 'CLEARS',
+          'ADDS', 'SUBS', 'MULS', 'IDIVS', 'DIVS', 'LTS', 'GTS', 'EQS', 'ANDS', 'ORS',
+          'NOTS', 'INT2CHARS', 'STRI2INTS', 'INT2FLOATS', 'FLOAT2INTS'), ()),
+        (('DEFVAR', 'POPS'), ('var',)),
+        (('PUSHS', 'WRITE', 'EXIT', 'DPRINT'), ('symb',)),
+        (('CALL', 'LABEL', 'JUMP', 'JUMPIFEQS', 'JUMPIFNEQS'), ('label',)),
+        (('MOVE', 'NOT', 'INT2CHAR', 'STRLEN', 'TYPE', 'INT2FLOAT', 'FLOAT2INT'),
+         ('var', 'symb')),
+        (('READ',), ('var', 'type')),
+        (('ADD', 'SUB', 'MUL', 'IDIV', 'DIV', 'LT', 'GT', 'EQ', 'AND', 'OR',
+          'STRI2INT', 'CONCAT', 'GETCHAR', 'SETCHAR'), ('var', 'symb', 'symb')),
+        (('JUMPIFEQ', 'JUMPIFNEQ'), ('label', 'symb', 'symb'))):
+    for opcode in opcodes:
+        SIGNATURES[opcode] = operands
+
+# the positions of the arguments
+ARG_INDEXES = {'arg1': 0, 'arg2': 1, 'arg3': 2}
+
+
+# checks the root element of the program
+def check_root(program):
+    if (program.tag != 'program' or 'language' not in program.attrib or
+            program.attrib['language'] != 'IPPcode20' or
+            set(program.attrib.keys()) - {'language', 'name', 'description'} != set()):
+        raise Exception('Invalid root element', program.tag)
 
 
-# checks a single instruction format
+# checks a single instruction format and returns its order number, its opcode (in upper
+# case) and the list of its operands as (type, value) pairs. The values of the literals
+# are converted to their python representation
 def check_instruction(instr):
-    if (instr.tag != 'instruction' or
-            set(instr.attrib.keys()) != {'opcode', 'order'}):
+    attrib = instr.attrib
+    if instr.tag != 'instruction' or len(attrib) != 2 or 'opcode' not in attrib:
         raise Exception('Invalid top level element/instruction format', instr)
-    
+
     # check the order attribute format and value
     try:
-        order = int(instr.attrib['order'])
-        if order < 1:
-            raise Exception('Invalid order attribute value', order)
-    except ValueError:
-        raise Exception('Invalid order attribute format', instr.attrib['order'])
-
-    # now classify the instruction and then check its args according to the class
-    # of instructions it fits in based on the number of arguments. Additionally, if
-    # the original opcode was in mixed case, convert it to upper case..
-    opcode = instr.attrib['opcode'] = instr.attrib['opcode'].upper()
-
-    # before checking the arguments, sort the in ascending order (arg1, arg2, ...)
-    instr[:] = sorted(instr, key=lambda child: child.tag)
-
-    if opcode in ['MOVE', 'NOT', 'INT2CHAR', 'STRLEN', 'TYPE', 'INT2FLOAT',
-                  'FLOAT2INT']: # var, symb
-        if len(instr) == 2 and instr[0].tag == 'arg1' and instr[1].tag == 'arg2':
-            if ArgChecks.check_var(instr[0]) and ArgChecks.check_symbol(instr[1]):
-                return True
-        raise Exception(f'Invalid {opcode} attributes', instr.attrib['order'])
-
-    elif opcode in ['DEFVAR', 'POPS']: # var
-        if len(instr) == 1 and instr[0].tag == 'arg1':
-            if ArgChecks.check_var(instr[0]):
-                return True
-        raise Exception(f'Invalid {opcode} attributes', instr.attrib['order'])
-
-    elif opcode in ['PUSHS', 'WRITE', 'EXIT', 'DPRINT']: # symb
-        if len(instr) == 1 and instr[0].tag == 'arg1':
-            if ArgChecks.check_symbol(instr[0]):
-                return True
-        raise Exception(f'Invalid {opcode} attributes', instr.attrib['order'])
-
-    elif opcode in ['CALL', 'LABEL', 'JUMP', 'JUMPIFEQS', 'JUMPIFNEQS']: # label
-        if len(instr) == 1 and instr[0].tag == 'arg1':
-            if ArgChecks.check_label(instr[0]):
-                return True
-        raise Exception(f'Invalid {opcode} attributes', instr.attrib['order'])
-
-    elif opcode in ['ADD', 'SUB', 'MUL', 'IDIV', 'DIV','LT','GT', 'EQ',
-            'AND', 'OR', 'STRI2INT', 'CONCAT', 'GETCHAR', 'SETCHAR']: # var, symb, symb
-        if (len(instr) == 3 and instr[0].tag == 'arg1' and
-                instr[1].tag == 'arg2' and instr[2].tag == 'arg3'):
-            if (ArgChecks.check_var(instr[0]) and ArgChecks.check_symbol(instr[1]) and
-                    ArgChecks.check_symbol(instr[2])):
-                return True
-        raise Exception(f'Invalid {opcode} attributes', instr.attrib['order'])
-
-    elif opcode in ['READ']: # var, type
-        if len(instr) == 2 and instr[0].tag == 'arg1' and instr[1].tag == 'arg2':
-            if ArgChecks.check_var(instr[0]) and ArgChecks.check_arg_type(instr[1]):
-                return True
-        raise Exception(f'Invalid {opcode} attributes', instr.attrib['order'])
-
-    elif opcode in ['JUMPIFEQ', 'JUMPIFNEQ']: # label, symb, symb
-        if (len(instr) == 3 and instr[0].tag == 'arg1' and
-                instr[1].tag == 'arg2' and instr[2].tag == 'arg3'):
-            if (ArgChecks.check_label(instr[0]) and ArgChecks.check_symbol(instr[1]) and
-                    ArgChecks.check_symbol(instr[2])):
-                return True
-        raise Exception(f'Invalid {opcode} attributes', instr.attrib['order'])
-
-    elif opcode in ['CREATEFRAME', 'PUSHFRAME', 'POPFRAME', 'RETURN', 'BREAK', 'CLEARS',
-                    'ADDS', 'SUBS', 'MULS', 'IDIVS', 'DIVS', 'LTS', 'GTS', 'EQS', 'ANDS',
-                    'ORS', 'NOTS', 'INT2CHARS', 'STRI2INTS', 'INT2FLOATS',
-                    'FLOAT2INTS']: # ...
-        if len(instr) == 0:
-            return True
-        raise Exception(f'Invalid {opcode} attributes', instr.attrib['order'])
-
-    else:
+        order = int(attrib['order'])
+    except (KeyError, ValueError):
+        raise Exception('Invalid order attribute format', attrib.get('order'))
+    if order < 1:
+        raise Exception('Invalid order attribute value', order)
+
+    opcode = attrib['opcode'].upper()
+    signature = SIGNATURES.get(opcode)
+    if signature is None:
         raise Exception('Unknown opcode', opcode)
 
+    # place the arguments by their tags, so that they do not have to be sorted
+    args = [None] * len(signature)
+    for arg in instr:
+        index = ARG_INDEXES.get(arg.tag)
+        if index is None or index >= len(args) or args[index] is not None:
+            raise Exception(f'Invalid {opcode} attributes', order)
+        args[index] = arg
+    if len(instr) != len(args):
+        raise Exception(f'Invalid {opcode} attributes', order)
+
+    operands = []
+    for arg, kind in zip(args, signature):
+        arg_type = arg.get('type')
+        if len(arg.attrib) != 1 or arg_type not in OPERAND_TYPES[kind]:
+            raise Exception(f'Invalid {opcode} attributes', order)
+        try:
+            operands.append((arg_type, ARG_CHECKS[arg_type](arg.text)))
+        except Exception:
+            raise Exception(f'Invalid {opcode} attributes', order)
 
-# extracts all the labels and returns them in a dictionary along with their order numbers
-def get_labels(root):
-    labels = {}
-    for instr in root:
-        if instr.attrib['opcode'] == 'LABEL':
-
-            if instr[0].text in labels:
-                sys.stderr.write('Label redefinition\n')
-                sys.exit(52) #FIXME: proper exception propagation
-                raise Exception('Label redefinition', instr[0].text) # Label redefinition
-
-            labels[instr[0].text] = instr.attrib['order'] # add the new label to the dict
-    return labels
-
-
-# checks the order number integrity among the instructions and returns an ordered
-# list of instructions that can be iterated over and therefore executed as code
-def order_instructions(root):
-    # sort the instructions by order number
-    root[:] = sorted(root, key=lambda child: int(child.get('order')))
-    for instr in root:
-        instr[:] = sorted(instr, key=lambda child: child.tag)
-
-    # now check for duplicit order values
-    counter = 0
-    last = -1 
-    for instr in root:
-        order = int(instr.attrib['order'])
-        if order < counter + 1 or order == last :
-            raise Exception('Duplicit or invalid order attribute', order)
-
-        # now let's rewrite the order numbers so that they correspond to the indexes
-        # of the instructions in the ordered list
-        last = order 
-        instr.attrib['order'] = counter
-        counter += 1
-
-    return root
-
-
-# This function encapsulates the whole parsing process and is called from the main
-# interpreter module
-def check_syntax(program):
-    if (program.tag != 'program' or 'language' not in program.attrib or
-            program.attrib['language'] != 'IPPcode20' or
-            set(program.attrib.keys()) - {'language', 'name', 'description'} != set()):
-        sys.stderr.write('Invalid root element\n') 
-        sys.exit(XML_ERROR)
-    
-    try:
-        check_instructions(program) # check the instruction formats
-        ordered = order_instructions(program) # order the instructions
-        labels = get_labels(program) # extract the labels
+    return order, opcode, operands
 
-    except Exception as e:
-        raise e
 
-    return ordered, labels
+# Returns the character encoded by a matched escape sequence (\ddd)
+def decode_escape(match):
+    return chr(int(match.group()[1:]))
 
 
-# This class implements some methods used for checking the format of the individual
-# instruction arguments
+# This class implements the checks of the individual instruction arguments. Each check
+# takes the text of the argument and returns its value, or raises an exception if the
+# argument is not valid
 class ArgChecks:
 
-    # specific argument types
     @staticmethod
-    def check_arg_int(arg):
-        if (len(arg.attrib) == 1 and 'type' in arg.attrib and
-                arg.attrib['type'] == 'int'):
-            try: arg.text = int(arg.text)
-            except: return False # not a valid integer
-            return True
-        return False
+    def check_int(text):
+        return int(text)
 
     @staticmethod
-    def check_arg_float(arg):
-        if (len(arg.attrib) == 1 and 'type' in arg.attrib and
-                arg.attrib['type'] == 'float'):
-            try: arg.text = float.fromhex(arg.text)
-            except: return False # not a valid float
-            return True
-        return False
+    def check_float(text):
+        return float.fromhex(text)
 
     @staticmethod
-    def check_arg_string(arg):
-        if (len(arg.attrib) == 1 and 'type' in arg.attrib and
-                arg.attrib['type'] == 'string'):
-            if arg.text == None: # in case the text attribute is empty
-                arg.text = ''
-
-            if '#' in arg.text: return False
+    def check_string(text):
+        if text == None: # in case the text attribute is empty
+            return ''
 
-            # convert the escape sequences
-            esc_match = re.compile(r'\\[\S]{3}')
-            match = re.findall(esc_match, arg.text)
-            for esc in match:
-                try: arg.text = arg.text.replace(esc, chr(int(esc[1:])), 1)
-                except: return False # not a escape sequence
+        if '#' in text:
+            raise ValueError('Invalid character in a string')
 
-            try: arg.text = str(arg.text)
-            except:
-                return False # not a valid string
-            return True
-        return False
-
-    @staticmethod
-    def check_arg_bool(arg):
-        if (len(arg.attrib) == 1 and 'type' in arg.attrib and
-                arg.attrib['type'] == 'bool'):
-            if arg.text not in ['true', 'false']: return False # not a valid bool
-            return True
-        return False
+        # convert the escape sequences in a single pass, a malformed escape sequence
+        # makes int() raise a ValueError
+        if '\\' not in text:
+            return text
+        return ESCAPE.sub(decode_escape, text)
 
     @staticmethod
-    def check_arg_nil(arg):
-        if (len(arg.attrib) == 1 and 'type' in arg.attrib and
-                arg.attrib['type'] == 'nil'):
-            if arg.text != 'nil': return False # not a valid nil@nil
-            return True
-        return False
+    def check_bool(text):
+        if text not in ('true', 'false'):
+            raise ValueError('Invalid bool literal')
+        return text == 'true'
 
     @staticmethod
-    def check_arg_type(arg):
-        if (len(arg.attrib) == 1 and 'type' in arg.attrib and
-                arg.attrib['type'] == 'type'):
-            if arg.text not in ['int', 'string', 'bool', 'float']:
-                return False # not a valid type specification
-            return True
-        return False
+    def check_nil(text):
+        if text != 'nil':
+            raise ValueError('Invalid nil literal')
+        return None
 
-    # more general argument types
     @staticmethod
-    def check_var(var):
-        if (len(var.attrib) == 1 and 'type' in var.attrib and
-                var.attrib['type'] == 'var'):
-            var_name_match = re.compile(r'^((GF)|(LF)|(TF))@[a-zA-Z_\-$&%*!?][a-zA-Z0-9_\-$&%*!?]*$')
-            if re.fullmatch(var_name_match, var.text) == None:
-                return False # invalid variable name
-            return True
-        return False
+    def check_type(text):
+        if text not in ('int', 'string', 'bool', 'float'):
+            raise ValueError('Invalid type specification')
+        return text
 
     @staticmethod
-    def check_symbol(symbol):
-        # a symbol is a variable or a literal...
-        if (ArgChecks.check_var(symbol) or 
-                ArgChecks.check_arg_int(symbol) or
-                ArgChecks.check_arg_float(symbol) or
-                ArgChecks.check_arg_string(symbol) or
-                ArgChecks.check_arg_nil(symbol) or
-                ArgChecks.check_arg_bool(symbol)):
-            return True
-        return False
+    def check_var(text):
+        if VAR_NAME.fullmatch(text) == None:
+            raise ValueError('Invalid variable name')
+        return text
 
     @staticmethod
-    def check_label(label):
-        if (len(label.attrib) == 1 and 'type' in label.attrib and
-                label.attrib['type'] == 'label'):
-            label_name_match = re.compile(r'^[a-zA-Z_\-$&%*!?][a-zA-Z0-9_\-$&%*!?]*$')
-            if re.fullmatch(label_name_match, label.text) == None:
-                return False # invalid variable name
-            return True
-        return False
+    def check_label(text):
+        if LABEL_NAME.fullmatch(text) == None:
+            raise ValueError('Invalid label name')
+        return text
+
+
+# the check of each argument type
+ARG_CHECKS = {
+    'var': ArgChecks.check_var,
+    'int': ArgChecks.check_int,
+    'float': ArgChecks.check_float,
+    'string': ArgChecks.check_string,
+    'bool': ArgChecks.check_bool,
+    'nil': ArgChecks.check_nil,
+    'label': ArgChecks.check_label,
+    'type': ArgChecks.check_type,
+}
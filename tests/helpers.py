@@ -0,0 +1,103 @@
+##
+# @file   helpers.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  This module implements the helpers shared by the tests - running the
+#         interpreter on the test programs and assembling small programs for the tests
+#         of the single modules
+
+import io
+import os
+import subprocess
+import sys
+from xml.sax.saxutils import escape
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(TESTS_DIR), 'src')
+
+# the modules of the interpreter are imported from the src directory, like interpret.py does
+sys.path.insert(0, SRC_DIR)
+from loader import parse_program
+
+# the programs shared by the engine tests, in the format of test.php - the xml source,
+# the input, the expected output and the expected return code of every program
+PROGRAMS_DIR = os.path.join(TESTS_DIR, 'programs')
+
+# the instructions whose first argument is a label
+LABEL_OPCODES = {'LABEL', 'JUMP', 'CALL', 'JUMPIFEQ', 'JUMPIFNEQ', 'JUMPIFEQS',
+                 'JUMPIFNEQS'}
+
+
+# Returns the names of the test programs
+def program_names():
+    return sorted(name[:-len('.src')] for name in os.listdir(PROGRAMS_DIR)
+                  if name.endswith('.src'))
+
+
+# Runs the interpreter on a test program with the given options and returns its return
+# code, standard output and standard error
+def run_interpreter(name, *options):
+    path = os.path.join(PROGRAMS_DIR, name)
+    result = subprocess.run([sys.executable, os.path.join(SRC_DIR, 'interpret.py'),
+                             '--source=' + path + '.src', '--input=' + path + '.in',
+                             *options], capture_output=True)
+    return result.returncode, result.stdout, result.stderr
+
+
+# Runs the interpreter on the given xml source (bytes) stored in the given directory,
+# with the given data (bytes) on its standard input. Returns the return code, standard
+# output and standard error of the interpreter
+def run_source(directory, source, input_data, *options):
+    path = os.path.join(directory, 'program.src')
+    with open(path, 'wb') as f:
+        f.write(source)
+    result = subprocess.run([sys.executable, os.path.join(SRC_DIR, 'interpret.py'),
+                             '--source=' + path, *options], input=input_data,
+                            capture_output=True)
+    return result.returncode, result.stdout, result.stderr
+
+
+# Returns the expected return code and output of a test program
+def expected_result(name):
+    path = os.path.join(PROGRAMS_DIR, name)
+    with open(path + '.rc') as f:
+        retcode = int(f.read())
+    with open(path + '.out', 'rb') as f:
+        output = f.read()
+    return retcode, output
+
+
+# Converts a program written one instruction per line, like 'ADD GF@x int@1 GF@y', into
+# the xml source of the program (bytes). The arguments must not contain any whitespace
+def assemble(text):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode20">']
+    order = 0
+    for line in text.strip().splitlines():
+        opcode, *args = line.split()
+        xml_args = []
+        for i, arg in enumerate(args, 1):
+            if i == 1 and opcode in LABEL_OPCODES:
+                arg_type, value = 'label', arg
+            elif opcode == 'READ' and i == 2:
+                arg_type, value = 'type', arg
+            elif arg[:3] in ('GF@', 'LF@', 'TF@'):
+                arg_type, value = 'var', arg
+            else:
+                arg_type, value = arg.split('@', 1)
+            xml_args.append(f'<arg{i} type="{arg_type}">{escape(value)}</arg{i}>')
+        order += 1
+        lines.append(f'<instruction order="{order}" opcode="{opcode}">' +
+                     ''.join(xml_args) + '</instruction>')
+    lines.append('</program>')
+    return '\n'.join(lines).encode()
+
+
+# Returns the compiled program written one instruction per line (see assemble)
+def compile_program(text):
+    return parse_program(io.BytesIO(assemble(text)))
+
+
+# Returns the opcodes of a program with the values of the literals and the names of the
+# variables and labels they are given
+def listing(program):
+    return [(instr.opcode,) + tuple(arg.name if arg.type in ('var', 'label') else arg.value
+                                    for arg in instr.args) for instr in program]
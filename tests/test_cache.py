@@ -0,0 +1,65 @@
+##
+# @file   test_cache.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  The tests of the cache of the compiled programs
+
+import io
+import os
+
+from helpers import assemble, listing
+from loader import parse_program
+from cache import entry_path, load_program, store_program
+
+SOURCE = assemble('''
+    DEFVAR GF@x
+    MOVE GF@x float@0x1.8p+1
+    LABEL loop
+    WRITE GF@x
+    JUMPIFNEQ loop GF@x nil@nil
+    READ GF@x bool
+    WRITE string@a\\032b
+''')
+
+
+def test_round_trip(tmp_path):
+    program = parse_program(io.BytesIO(SOURCE))
+    store_program(tmp_path, SOURCE, program)
+    cached = load_program(tmp_path, SOURCE)
+    assert [instr.op_id for instr in cached] == [instr.op_id for instr in program]
+    assert listing(cached) == listing(program)
+    assert [arg.type for instr in cached for arg in instr.args] == \
+           [arg.type for instr in program for arg in instr.args]
+    assert cached[2].args[0] is cached[4].args[0] # the label is stored only once
+
+
+def test_variants(tmp_path):
+    program = parse_program(io.BytesIO(SOURCE))
+    store_program(tmp_path, SOURCE, program[:2], 'optimized')
+    assert load_program(tmp_path, SOURCE) is None
+    assert len(load_program(tmp_path, SOURCE, 'optimized')) == 2
+    assert load_program(tmp_path, SOURCE, 'optimized-nosuper') is None
+
+
+def test_report(tmp_path):
+    program = parse_program(io.BytesIO(SOURCE))
+    store_program(tmp_path, SOURCE, program, 'optimized', {'removed instructions': 3})
+    report = {'removed instructions': 1}
+    load_program(tmp_path, SOURCE, 'optimized', report)
+    assert report == {'removed instructions': 4}
+
+
+def test_other_source(tmp_path):
+    store_program(tmp_path, SOURCE, parse_program(io.BytesIO(SOURCE)))
+    assert load_program(tmp_path, SOURCE + b'\n') is None
+
+
+def test_corrupted_entry(tmp_path):
+    store_program(tmp_path, SOURCE, parse_program(io.BytesIO(SOURCE)))
+    path = entry_path(tmp_path, SOURCE, '')
+    with open(path, 'rb') as f:
+        entry = bytearray(f.read())
+    entry[-1] ^= 1
+    with open(path, 'wb') as f:
+        f.write(entry)
+    assert load_program(tmp_path, SOURCE) is None
+    assert not os.path.exists(path)
@@ -0,0 +1,46 @@
+##
+# @file   test_engines.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  The tests running every engine with and without the optimiser on the shared
+#         test programs. Every engine has to give the expected results, which are the
+#         results of the reference engine running the program as written
+
+import pytest
+
+from helpers import program_names, run_interpreter, expected_result
+
+ENGINES = ('reference', 'adaptive', 'threaded', 'compiled', 'tracing')
+
+# the optimisation options every engine is tested with
+OPTIMIZATIONS = ((), ('--no-optimize',), ('--no-superinstructions',))
+
+
+@pytest.mark.parametrize('options', OPTIMIZATIONS, ids=lambda options: ' '.join(options)
+                         or 'optimized')
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('name', program_names())
+def test_engine(name, engine, options):
+    retcode, output, error = run_interpreter(name, '--engine=' + engine, *options)
+    assert (retcode, output) == expected_result(name)
+
+    # the messages of the errors may only differ where the optimiser has replaced the
+    # failing instruction by another one
+    if '--no-optimize' in options:
+        assert error == run_interpreter(name, '--engine=reference', '--no-optimize')[2]
+
+
+# the second run uses the program stored to the cache by the first one
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('name', program_names())
+def test_cached(name, engine, tmp_path):
+    options = ('--engine=' + engine, '--cache=' + str(tmp_path))
+    first = run_interpreter(name, *options)
+    assert first[:2] == expected_result(name)
+    assert run_interpreter(name, *options) == first
+
+
+# the default engine runs the optimised program, --no-optimize turns the optimiser off
+def test_default_optimization():
+    __, __, error = run_interpreter('fold', '--optimizer-report')
+    assert b'optimizer: 14 removed instructions\n' in error
+    assert run_interpreter('fold', '--optimizer-report', '--no-optimize')[2] == b''
@@ -0,0 +1,298 @@
+##
+# @file   test_optimizer.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  The tests of the passes of the optimiser
+
+import io
+
+from helpers import compile_program, listing
+from execute import Processor
+from streams import TextInput, OutputSink
+from optimizer import convert_stack_sequences, fuse_superinstructions, fold_constants
+from optimizer import inline_calls, MAX_INLINED_BODY, eliminate_tail_calls
+
+
+def test_stack_sequences():
+    program = compile_program('''
+        DEFVAR GF@x
+        PUSHS int@1
+        PUSHS int@2
+        ADDS
+        POPS GF@x
+        PUSHS GF@x
+        PUSHS int@3
+        JUMPIFEQS end
+        PUSHS GF@x
+        INT2CHARS
+        POPS GF@x
+        PUSHS int@4
+        POPS GF@x
+        LABEL end
+    ''')
+    assert listing(convert_stack_sequences(program)) == [
+        ('DEFVAR', 'x'), ('ADD', 'x', 1, 2), ('JUMPIFEQ', 'end', 'x', 3),
+        ('INT2CHAR', 'x', 'x'), ('MOVE', 'x', 4), ('LABEL', 'end')]
+
+
+# PUSHS fails on an uninitialized variable before the second operand is read, so the
+# operands have to be known to exist unless the first one is a literal
+def test_stack_sequence_reading_unknown_variable():
+    program = compile_program('''
+        PUSHS GF@x
+        PUSHS GF@y
+        ADDS
+        POPS GF@z
+    ''')
+    assert listing(convert_stack_sequences(program)) == listing(program)
+
+
+# the GF variables defined in the entry block are known in the blocks after it
+def test_stack_sequence_after_entry_block():
+    program = compile_program('''
+        DEFVAR GF@x
+        DEFVAR GF@y
+        LABEL loop
+        PUSHS GF@x
+        PUSHS GF@y
+        ADDS
+        POPS GF@x
+        JUMP loop
+    ''')
+    assert listing(convert_stack_sequences(program))[3] == ('ADD', 'x', 'x', 'y')
+
+
+def test_stack_sequence_after_frame_change():
+    program = compile_program('''
+        CREATEFRAME
+        DEFVAR TF@x
+        DEFVAR TF@y
+        PUSHFRAME
+        PUSHS LF@x
+        PUSHS LF@y
+        ADDS
+        POPS LF@x
+    ''')
+    assert listing(convert_stack_sequences(program)) == listing(program)
+
+
+def test_superinstructions():
+    program = compile_program('''
+        CREATEFRAME
+        PUSHFRAME
+        DEFVAR LF@x
+        MOVE LF@x int@1
+        LABEL loop
+        LT GF@c LF@x int@5
+        JUMPIFEQ loop GF@c bool@true
+        GT GF@c LF@x int@5
+        JUMPIFNEQ loop bool@false GF@c
+        EQ GF@c LF@x int@5
+        JUMPIFEQ loop GF@c bool@false
+    ''')
+    assert listing(fuse_superinstructions(program)) == [
+        ('CREATEFRAME_PUSHFRAME',), ('DEFVAR_MOVE', 'x', 1), ('LABEL', 'loop'),
+        ('LT_JUMPIF', 'c', 'x', 5, 'loop'), ('GT_JUMPIF', 'c', 'x', 5, 'loop'),
+        ('EQ_JUMPIFNOT', 'c', 'x', 5, 'loop')]
+
+
+# the pairs that do not work on the same variable or that jump to an undefined label are
+# left alone, so that their errors are reported as before
+def test_superinstructions_not_fused():
+    program = compile_program('''
+        DEFVAR GF@x
+        MOVE GF@y int@1
+        LT GF@c GF@x int@5
+        JUMPIFEQ loop GF@d bool@true
+        LT GF@c GF@x int@5
+        JUMPIFEQ loop GF@c int@1
+        LT GF@c GF@x int@5
+        JUMPIFEQ undefined GF@c bool@true
+        LABEL loop
+    ''')
+    assert listing(fuse_superinstructions(program)) == listing(program)
+
+
+def test_fold_propagates_constants():
+    program = compile_program('''
+        DEFVAR GF@x
+        ADD GF@x int@1 int@2
+        MUL GF@x GF@x int@4
+        WRITE GF@x
+    ''')
+    assert listing(fold_constants(program, {})) == [
+        ('DEFVAR', 'x'), ('MOVE', 'x', 3), ('MOVE', 'x', 12), ('WRITE', 12)]
+
+
+def test_fold_removes_unreachable_code():
+    program = compile_program('''
+        JUMP end
+        WRITE string@dead
+        LABEL unused
+        WRITE string@dead
+        LABEL end
+        WRITE string@live
+    ''')
+    report = {}
+    assert listing(fold_constants(program, report)) == [('WRITE', 'live')]
+    assert report == {'removed instructions': 5}
+
+
+def test_fold_decides_conditional_jumps():
+    program = compile_program('''
+        JUMPIFEQ end int@1 int@2
+        WRITE string@taken
+        LABEL end
+    ''')
+    assert listing(fold_constants(program, {})) == [('WRITE', 'taken')]
+
+
+# the instructions raising an error are left for the interpreter to report
+def test_fold_keeps_failing_instructions():
+    program = compile_program('''
+        DEFVAR GF@x
+        ADD GF@x int@1 string@a
+        IDIV GF@x int@1 int@0
+        WRITE GF@y
+    ''')
+    report = {}
+    assert listing(fold_constants(program, report)) == listing(program)
+    assert report == {'removed instructions': 0}
+
+
+def test_inline_calls():
+    program = compile_program('''
+        CALL f
+        CALL f
+        EXIT int@0
+        LABEL f
+        CALL g
+        WRITE string@f
+        RETURN
+        LABEL g
+        WRITE string@g
+        RETURN
+    ''')
+    report = {}
+    optimized = inline_calls(program, report)
+    # g is inlined into f first, which makes f a leaf function inlined in the next round
+    assert listing(optimized[:5]) == [('WRITE', 'g'), ('WRITE', 'f'), ('WRITE', 'g'),
+                                      ('WRITE', 'f'), ('EXIT', 0)]
+    assert optimized[0] is not optimized[2] # every copy is linked on its own
+    assert report == {'inlined calls': 3}
+
+
+def test_calls_not_inlined():
+    program = compile_program('''
+        CALL loop
+        CALL long
+        CALL recursive
+        EXIT int@0
+        LABEL loop
+        JUMPIFEQ loop int@1 int@2
+        RETURN
+        LABEL recursive
+        CALL recursive
+        RETURN
+        LABEL long
+    ''' + 'WRITE int@1\n' * (MAX_INLINED_BODY + 1) + 'RETURN')
+    report = {}
+    assert inline_calls(program, report) is program
+    assert report == {'inlined calls': 0}
+
+
+def test_tail_call():
+    program = compile_program('''
+        CALL f
+        EXIT int@0
+        LABEL f
+        CALL g
+        RETURN
+        LABEL g
+        RETURN
+    ''')
+    report = {}
+    assert listing(eliminate_tail_calls(program, report)) == [
+        ('CALL', 'f'), ('EXIT', 0), ('LABEL', 'f'), ('TAILCALL', 'g'), ('LABEL', 'g'),
+        ('RETURN',)]
+    assert report == {'eliminated tail calls': 1}
+
+
+def test_tail_call_popping_frame():
+    program = compile_program('''
+        CALL f
+        EXIT int@0
+        LABEL f
+        PUSHFRAME
+        CALL g
+        POPFRAME
+        RETURN
+        LABEL g
+        PUSHFRAME
+        POPFRAME
+        RETURN
+    ''')
+    report = {}
+    optimized = listing(eliminate_tail_calls(program, report))
+    assert optimized[4:7] == [('TAILCALL_POPFRAME', 'g'), ('POPFRAME',), ('RETURN',)]
+    assert report == {'eliminated tail calls': 1}
+
+
+# g returns without popping the frame pushed by f, so the frame of f cannot be popped
+# before the call
+def test_tail_call_breaking_frame_convention():
+    program = compile_program('''
+        CALL f
+        EXIT int@0
+        LABEL f
+        PUSHFRAME
+        CALL g
+        POPFRAME
+        RETURN
+        LABEL g
+        RETURN
+    ''')
+    report = {}
+    assert eliminate_tail_calls(program, report) is program
+    assert report == {'eliminated tail calls': 0}
+
+
+# the recursion runs in a constant space - with the return addresses of the first CALL of
+# f and of its first tail call, which has been called by CALL, and the LFs of these two
+# calls of f
+def test_deep_tail_recursion():
+    program = eliminate_tail_calls(compile_program('''
+        CREATEFRAME
+        DEFVAR TF@n
+        MOVE TF@n int@10000
+        CALL f
+        JUMP end
+        LABEL f
+        PUSHFRAME
+        JUMPIFNEQ recurse LF@n int@0
+        WRITE string@done
+        POPFRAME
+        RETURN
+        LABEL recurse
+        CREATEFRAME
+        DEFVAR TF@n
+        SUB TF@n LF@n int@1
+        CALL f
+        POPFRAME
+        RETURN
+        LABEL end
+    '''), {})
+    output = io.BytesIO()
+    processor = Processor(program, TextInput(io.StringIO('')), OutputSink(output))
+
+    depths = []
+    base_case = program[8]
+    handler = base_case.handler
+    def record_depth(data):
+        depths.append((len(data.ip_stack), len(data.frame_stack)))
+        return handler(data)
+    base_case.handler = record_depth
+
+    processor.execute_program()
+    processor.output.flush()
+    assert output.getvalue() == b'done'
+    assert depths == [(2, 2)]
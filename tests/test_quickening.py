@@ -0,0 +1,61 @@
+##
+# @file   test_quickening.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  The tests of the runtime specialisation of the instructions by the adaptive
+#         engine
+
+import io
+
+from helpers import compile_program
+from program import OPCODE_IDS
+from execute import handler_table
+from streams import TextInput, OutputSink
+from quickening import AdaptiveProcessor, WARMUP, MAX_DEOPTIMIZATIONS
+
+ADD = OPCODE_IDS['ADD']
+
+# the number of times the function is called in every phase, enough to specialise the
+# ADD even after it has lost its specialisation the maximal number of times
+PHASE_CALLS = WARMUP * 2 ** (MAX_DEOPTIMIZATIONS + 1)
+
+
+# Runs a program calling the same ADD of GF@y to itself in phases, every phase with the
+# value of GF@y given by the corresponding symbol. Returns the output of the program and
+# the handler the ADD is left with
+def run_phases(symbols):
+    lines = ['DEFVAR GF@r', 'DEFVAR GF@y', 'DEFVAR GF@i']
+    for phase, symbol in enumerate(symbols):
+        lines += [f'MOVE GF@y {symbol}', 'MOVE GF@i int@0', f'LABEL phase{phase}',
+                  'CALL add', 'ADD GF@i GF@i int@1',
+                  f'JUMPIFNEQ phase{phase} GF@i int@{PHASE_CALLS}', 'WRITE GF@r']
+    lines += ['JUMP end', 'LABEL add', 'ADD GF@r GF@y GF@y', 'RETURN', 'LABEL end']
+
+    program = compile_program('\n'.join(lines))
+    output = io.BytesIO()
+    processor = AdaptiveProcessor(program, TextInput(io.StringIO('')), OutputSink(output))
+    processor.execute_program()
+    processor.output.flush()
+    add = program[-3]
+    assert add.op_id == ADD
+    return output.getvalue(), add.handler
+
+
+def test_specialized():
+    output, handler = run_phases(['int@1', 'int@2'])
+    assert output == b'24'
+    assert handler is not handler_table[ADD]
+
+
+# every change of the type of GF@y undoes the specialisation of the ADD, after the
+# maximal number of changes it keeps its generic handler
+def test_deoptimization_limit():
+    symbols = ['int@1', 'float@0x1p+0'] * (MAX_DEOPTIMIZATIONS + 2)
+    output, handler = run_phases(symbols)
+    assert output == b'20x1.0000000000000p+1' * (MAX_DEOPTIMIZATIONS + 2)
+    assert handler is handler_table[ADD]
+
+
+def test_within_deoptimization_limit():
+    output, handler = run_phases(['int@1', 'float@0x1p+0'])
+    assert output == b'20x1.0000000000000p+1'
+    assert handler is not handler_table[ADD]
@@ -0,0 +1,52 @@
+##
+# @file   test_streams.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  The tests of reading the standard input ahead by a background thread. The
+#         lines have to be the same as the ones read from the standard input directly,
+#         where a '\r' before the newline is a part of the line
+
+import sys
+
+import pytest
+
+from helpers import assemble, run_source
+from streams import READ_AHEAD_BLOCK_SIZE
+
+# writes the type and the value of every line of the input until READ gives nil, and
+# then the type of one more READ after the end of the input
+ECHO = assemble('''
+    DEFVAR GF@line
+    DEFVAR GF@type
+    LABEL loop
+    READ GF@line string
+    TYPE GF@type GF@line
+    WRITE GF@type
+    WRITE string@:
+    WRITE GF@line
+    WRITE string@\\010
+    JUMPIFNEQ loop GF@type string@nil
+    READ GF@line int
+    TYPE GF@type GF@line
+    WRITE GF@type
+''')
+
+# a line filling the first block read by the thread up to the last byte
+LONG_LINE = 'x' * (READ_AHEAD_BLOCK_SIZE - 1)
+
+
+@pytest.mark.parametrize('input_data, output', (
+    ('', 'nil:\nnil'),
+    ('a\nb\n', 'string:a\nstring:b\nnil:\nnil'),
+    ('a\r\nb\r\n', 'string:a\r\nstring:b\r\nnil:\nnil'),
+    ('\n\nlast', 'string:\nstring:\nstring:last\nnil:\nnil'),
+    ('žluťoučký\n', 'string:žluťoučký\nnil:\nnil'),
+    (LONG_LINE + '\r\n' + LONG_LINE, f'string:{LONG_LINE}\r\nstring:{LONG_LINE}\nnil:\nnil'),
+    (LONG_LINE + 'ž\n', f'string:{LONG_LINE}ž\nnil:\nnil'),
+), ids=('empty', 'newlines', 'crlf', 'no final newline', 'utf-8', 'split crlf',
+        'split character'))
+@pytest.mark.skipif(sys.platform == 'win32', reason='the standard input translates newlines')
+def test_read_ahead(tmp_path, input_data, output):
+    result = run_source(tmp_path, ECHO, input_data.encode(), '--read-ahead')
+    assert result == (0, output.encode(), b'')
+    # the same as without reading ahead
+    assert run_source(tmp_path, ECHO, input_data.encode()) == result
@@ -0,0 +1,84 @@
+##
+# @file   test_tracing.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  The tests of the tracing engine compiling the hot loops of a program
+
+import io
+
+from helpers import compile_program
+from execute import Processor
+from streams import TextInput, OutputSink
+from tracing import TracingProcessor, HOT_LOOP
+from values import INT
+
+# adds GF@y to itself in a loop, the type of GF@y changes from int to float once the loop
+# has been traced
+LOOP = f'''
+    DEFVAR GF@i
+    MOVE GF@i int@0
+    DEFVAR GF@y
+    MOVE GF@y int@1
+    DEFVAR GF@t
+    DEFVAR GF@c
+    LABEL loop
+    ADD GF@t GF@y GF@y
+    ADD GF@i GF@i int@1
+    JUMPIFNEQ same GF@i int@{HOT_LOOP * 2}
+    MOVE GF@y float@0x1p+0
+    LABEL same
+    WRITE GF@t
+    LT GF@c GF@i int@{HOT_LOOP * 3}
+    JUMPIFEQ loop GF@c bool@true
+'''
+
+
+# Runs a program by the given engine and returns the processor and the program output
+def run(engine, text):
+    output = io.BytesIO()
+    processor = engine(compile_program(text), TextInput(io.StringIO('')),
+                       OutputSink(output))
+    processor.execute_program()
+    processor.output.flush()
+    return processor, output.getvalue()
+
+
+def test_hot_loop_traced():
+    processor, output = run(TracingProcessor, LOOP)
+    assert processor.traced == {6}
+    assert output == run(Processor, LOOP)[1]
+    assert output.endswith(b'0x1.0000000000000p+1')
+
+
+# the trace is specialised for the types recorded for GF@y, which is guarded at the start
+# of the loop, the guard fails once GF@y is a float
+def test_failed_guard():
+    processor = TracingProcessor(compile_program(LOOP), TextInput(io.StringIO('')),
+                                 OutputSink(io.BytesIO()))
+    proven, guards = processor.specialize([6, 11], {(7, 1): INT, (7, 2): INT})
+    assert proven[7] == (None, INT, INT)
+    assert [(var.name, tag) for var, tag in guards[6]] == [('y', INT)]
+    assert guards[11] == []
+
+    __, output = run(TracingProcessor, LOOP)
+    assert output.count(b'2') == HOT_LOOP * 2
+    assert output.count(b'0x1.0000000000000p+1') == HOT_LOOP
+
+
+# an operand recorded with different types is not specialised
+def test_mixed_types_not_guarded():
+    processor = TracingProcessor(compile_program(LOOP), TextInput(io.StringIO('')),
+                                 OutputSink(io.BytesIO()))
+    proven, guards = processor.specialize([6, 11], {(7, 1): None, (7, 2): None})
+    assert proven[7] == (None, None, None)
+    assert guards[6] == []
+
+
+# a loop calling a function cannot be traced, the target of RETURN is only known when it
+# is executed
+def test_untraceable_loop():
+    text = LOOP.replace('LABEL same', 'LABEL same\n CALL f').replace(
+            'JUMPIFEQ loop GF@c bool@true',
+            'JUMPIFEQ loop GF@c bool@true\n JUMP end\n LABEL f\n RETURN\n LABEL end')
+    processor, output = run(TracingProcessor, text)
+    assert processor.traced == set()
+    assert output == run(Processor, LOOP)[1]
@@ -0,0 +1,72 @@
+##
+# @file   test_transpiler.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  The tests of the engine transpiling the whole program to python
+
+import io
+
+import pytest
+
+from helpers import compile_program
+from optimizer import optimize_program
+from transpiler import CompiledProcessor
+from streams import TextInput, OutputSink
+
+
+# Runs a program transpiled to python and returns its output, or the output and the
+# arguments of the error that has ended it
+def run(text, input_data='', optimize=False):
+    program = compile_program(text)
+    if optimize:
+        program = optimize_program(program)
+    output = io.BytesIO()
+    processor = CompiledProcessor(program, TextInput(io.StringIO(input_data)),
+                                  OutputSink(output))
+    try:
+        processor.execute_program()
+    except Exception as e:
+        processor.output.flush()
+        return output.getvalue(), e.args
+    processor.output.flush()
+    return output.getvalue()
+
+
+def test_program():
+    assert run('''
+        DEFVAR GF@n
+        READ GF@n int
+        DEFVAR GF@s
+        MOVE GF@s string@
+        CREATEFRAME
+        DEFVAR TF@i
+        MOVE TF@i int@0
+        PUSHFRAME
+        LABEL loop
+        CALL append
+        ADD LF@i LF@i int@1
+        JUMPIFNEQ loop LF@i GF@n
+        POPFRAME
+        WRITE GF@s
+        WRITE TF@i
+        JUMP end
+        LABEL append
+        CONCAT GF@s GF@s string@ab
+        RETURN
+        LABEL end
+    ''', '3\n') == b'ababab3'
+
+
+# the errors are reported under the opcode of the instruction that has failed, even if
+# it has been fused with the next one (see optimizer.py)
+@pytest.mark.parametrize('text, error', (
+    ('DEFVAR GF@x\nWRITE GF@x', (56, 'WRITE: Uninitialized symbol')),
+    ('DEFVAR GF@x\nMOVE GF@x int@1\nIDIV GF@x GF@x int@0', (57, 'IDIV: Division by zero')),
+    ('DEFVAR GF@x\nMOVE GF@x string@a\nDEFVAR GF@c\nLABEL l\nLT GF@c GF@x int@1\n'
+     'JUMPIFEQ l GF@c bool@true', (53, 'LT: Operands incompatible for comparison')),
+    ('DEFVAR GF@x\nMOVE GF@x string@a\nCREATEFRAME\nPUSHFRAME\nDEFVAR LF@y\n'
+     'MOVE LF@y GF@z', (54, 'MOVE: Nonexistent variable "z" in GF')),
+    ('JUMP nowhere', (52, 'JUMP: Label "nowhere" is undefined')),
+))
+@pytest.mark.parametrize('optimize', (False, True))
+def test_errors(text, error, optimize):
+    assert run(text, optimize=optimize) == (b'', error)
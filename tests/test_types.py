@@ -0,0 +1,68 @@
+##
+# @file   test_types.py
+# @author Simon Sedlacek, xsedla1h
+# @brief  The tests of the static type inference and of the check-free handlers of the
+#         instructions with proven operand types
+
+import io
+
+import pytest
+
+from helpers import compile_program
+from optimizer import infer_types
+from program import OPCODE_IDS
+from execute import Processor, handler_table
+from threaded import ThreadedProcessor
+from quickening import AdaptiveProcessor
+from streams import TextInput, OutputSink
+from values import INT, FLOAT
+
+# the types of GF@i and GF@f are proven in the loop, GF@x is never initialized and the
+# type of GF@r depends on the input
+PROGRAM = '''
+    DEFVAR GF@i
+    MOVE GF@i int@0
+    DEFVAR GF@f
+    MOVE GF@f float@0x1p+0
+    DEFVAR GF@x
+    DEFVAR GF@r
+    DEFVAR GF@c
+    READ GF@r int
+    LABEL loop
+    ADD GF@i GF@i int@1
+    MUL GF@f GF@f float@0x1p+1
+    LT GF@c GF@i int@10
+    JUMPIFNEQ end GF@c bool@true
+    JUMP loop
+    LABEL end
+    WRITE GF@i
+    WRITE GF@f
+    ADD GF@r GF@r int@1
+    JUMP skip
+    ADD GF@x GF@x int@1
+    LABEL skip
+'''
+
+
+def test_infer_types():
+    proven = infer_types(compile_program(PROGRAM))
+    assert proven[9:12] == [(INT, INT, None), (FLOAT, FLOAT, None), (None, INT, None)]
+    assert proven[17] == (None, None, None) # GF@r may be nil
+    assert proven[19] is None # unreachable
+
+
+@pytest.mark.parametrize('engine', (Processor, AdaptiveProcessor, ThreadedProcessor))
+def test_check_free_handlers(engine):
+    program = compile_program(PROGRAM)
+    output = io.BytesIO()
+    processor = engine(program, TextInput(io.StringIO('41\n')), OutputSink(output))
+    if engine is Processor:
+        processor.select_proven_handlers()
+    assert processor.report['check-free handlers'] == 3
+    assert [instr.handler is handler_table[instr.op_id] for instr in program[9:12]] == \
+           [False] * 3
+    assert program[17].handler is handler_table[OPCODE_IDS['ADD']]
+
+    processor.execute_program()
+    processor.output.flush()
+    assert output.getvalue() == b'100x1.0000000000000p+10'